@@ -0,0 +1,299 @@
+"""
+Throughput and peak memory of every cipher across input sizes and key shapes, plus the K4 sweeps end to end.
+Each measurement runs in a fresh interpreter so peak memory is not inherited from earlier measurements.
+
+    python benchmarks/run.py --sizes 1K,1M,100M --output results.json
+    python benchmarks/run.py --compare results.json  # exit status 1 on a regression
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import runpy
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ciphers.bifid import Bifid, PolybiusSquare
+from ciphers.caesar import Caesar
+from ciphers.one_time_pad import OneTimePad
+from ciphers.scytale import Scytale
+from ciphers.trifid import Trifid, Cube
+from ciphers.vigenere import Vigenere, VigenereTableau
+from ciphers.xor import Xor
+
+KRYPTOS_ALPHABET = "KRYPTOSABCDEFGHIJLMNQUVWXZ"
+LETTERS = string.ascii_lowercase
+ALPHABET_64 = (string.ascii_lowercase + string.digits + string.punctuation)[:64]
+SIZE_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+DEFAULT_SIZES = "1K,64K,1M"
+
+
+def _vigenere(alphabet, col_fill=0):
+    return lambda: Vigenere(VigenereTableau(alphabet=alphabet, col_fill=col_fill))
+
+
+# name -> (cipher factory, key (or function of the text size), plaintext characters)
+WORKLOADS = {
+    'caesar': (Caesar, 3, LETTERS + ' '),
+    'vigenere/period-8': (_vigenere(LETTERS), "abscissa", LETTERS + ' '),
+    'vigenere/period-256': (_vigenere(LETTERS), "abscissa" * 32, LETTERS + ' '),
+    'vigenere/kryptos-tableau': (_vigenere(KRYPTOS_ALPHABET, col_fill=4), "palimpsest", LETTERS + ' '),
+    'vigenere/alphabet-64': (_vigenere(ALPHABET_64), "kryptos", ALPHABET_64),
+    'one_time_pad/period-8': (OneTimePad, "abscissa", LETTERS + ' '),
+    'one_time_pad/full-pad': (OneTimePad, lambda size: _random_text(LETTERS, size, seed=1), LETTERS + ' '),
+    'xor/period-8': (Xor, "abscissa", LETTERS + ' '),
+    'scytale/key-192': (Scytale, 192, LETTERS),
+    'bifid/period-7': (lambda: Bifid(PolybiusSquare()), 7, LETTERS.replace('j', '')),
+    'bifid/period-97': (lambda: Bifid(PolybiusSquare()), 97, LETTERS.replace('j', '')),
+    'trifid/period-5': (lambda: Trifid(Cube()), 5, LETTERS + '?'),
+    'trifid/period-97': (lambda: Trifid(Cube()), 97, LETTERS + '?'),
+}
+
+# end to end workloads: scripts run as __main__ from their own directory, each run with a fresh temporary directory
+SCRIPTS = {
+    'kryptos/k4-bifid-sweep': os.path.join(ROOT, 'projects', 'kryptos', 'decrypt_k4_bifid.py'),
+    'kryptos/k4-trifid-sweep': os.path.join(ROOT, 'projects', 'kryptos', 'decrypt_k4_trifid.py'),
+}
+
+
+def parse_size(size):
+    """
+    Parameters:
+        size (string): number of characters, optionally suffixed with K, M or G (binary multiples)
+
+    Returns:
+        (int): number of characters
+    """
+
+    size = size.strip().upper().rstrip('B')
+    if size[-1:] in SIZE_UNITS:
+        return int(float(size[:-1]) * SIZE_UNITS[size[-1]])
+    return int(size)
+
+
+def peak_memory():
+    """
+    Returns:
+        (int): peak resident set size of this process in bytes
+    """
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # kilobytes on linux
+
+
+def measure_cipher(name, operation, size, repeat):
+    """
+    Time one cipher operation (in the worker process)
+
+    Parameters:
+        name (string): workload name
+        operation (string): encrypt or decrypt
+        size (int): number of characters
+        repeat (int): number of timed runs (the fastest is reported)
+
+    Returns:
+        (dict): result record
+    """
+
+    factory, key, chars = WORKLOADS[name]
+    cipher = factory()
+    if callable(key):
+        key = key(size)
+    text = _random_text(chars, size)
+    if operation == 'decrypt':
+        text = _encrypt_in_child(cipher, text, key)
+
+    baseline = peak_memory()
+    seconds = []
+    for _ in xrange(repeat):
+        start = time.time()
+        getattr(cipher, operation)(text, key)
+        seconds.append(time.time() - start)
+
+    return _record(name, operation, len(text), min(seconds), peak_memory() - baseline)
+
+
+def measure_script(name, repeat):
+    """
+    Time one end to end script (in the worker process)
+
+    Parameters:
+        name (string): workload name
+        repeat (int): number of timed runs (the fastest is reported)
+
+    Returns:
+        (dict): result record
+    """
+
+    path = SCRIPTS[name]
+    os.chdir(os.path.dirname(path))
+    baseline = peak_memory()
+    seconds = []
+    stdout, argv = sys.stdout, sys.argv
+    with open(os.devnull, 'w') as devnull:
+        for _ in xrange(repeat):
+            # what a script saves to the temporary directory (e.g., a resumable job store) must not carry over
+            # to the next run
+            scratch = tempfile.mkdtemp()
+            tempfile.tempdir = scratch
+            sys.stdout, sys.argv = devnull, [path]
+            start = time.time()
+            try:
+                runpy.run_path(path, run_name='__main__')
+            finally:
+                sys.stdout, sys.argv = stdout, argv
+                tempfile.tempdir = None
+                shutil.rmtree(scratch)
+            seconds.append(time.time() - start)
+
+    return _record(name, 'run', None, min(seconds), peak_memory() - baseline)
+
+
+def run(workloads, scripts, sizes, repeat):
+    """
+    Parameters:
+        workloads (list of string): cipher workload names
+        scripts (list of string): end to end workload names
+        sizes (list of int): numbers of characters
+        repeat (int): timed runs per measurement
+
+    Returns:
+        (list of dict): result records
+    """
+
+    jobs = [['cipher', name, operation, str(size)] for name in workloads for size in sizes
+            for operation in ('encrypt', 'decrypt')]
+    jobs += [['script', name] for name in scripts]
+
+    results = []
+    for job in jobs:
+        command = [sys.executable, os.path.abspath(__file__), '--worker', '--repeat', str(repeat)] + job
+        result = json.loads(subprocess.check_output(command))
+        sys.stderr.write("%(workload)s %(operation)s %(size)s: %(seconds).4fs\n" % result)
+        results.append(result)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Parameters:
+        results (list of dict): new result records
+        baseline (list of dict): earlier result records
+        tolerance (float): allowed fractional slowdown
+
+    Returns:
+        (list of string): description of each regression
+    """
+
+    earlier = dict((_result_key(result), result) for result in baseline)
+    regressions = []
+    for result in results:
+        before = earlier.get(_result_key(result))
+        if before is not None and result['seconds'] > before['seconds'] * (1 + tolerance):
+            regressions.append("%s %s %s: %.4fs -> %.4fs" % (result['workload'], result['operation'],
+                                                              result['size'], before['seconds'], result['seconds']))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ciphers and write the results as JSON")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="comma separated text sizes, e.g., 1K,1M,100M")
+    parser.add_argument('--workloads', default=None, help="comma separated name prefixes (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per measurement (the fastest counts)")
+    parser.add_argument('--output', default=None, help="JSON file to write (default: stdout)")
+    parser.add_argument('--compare', default=None, help="JSON file of earlier results to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown when comparing")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('job', nargs='*', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        if args.job[0] == 'cipher':
+            result = measure_cipher(args.job[1], args.job[2], int(args.job[3]), args.repeat)
+        else:
+            result = measure_script(args.job[1], args.repeat)
+        sys.stdout.write(json.dumps(result))
+        return 0
+
+    prefixes = args.workloads.split(',') if args.workloads else ['']
+    selected = lambda names: sorted(name for name in names if any(name.startswith(p) for p in prefixes))
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    report = dict(
+        python=platform.python_version(),
+        numpy=np.__version__,
+        platform=platform.platform(),
+        timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'),
+        results=run(selected(WORKLOADS), selected(SCRIPTS), sizes, args.repeat),
+    )
+
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            regressions = compare(report['results'], json.load(f)['results'], args.tolerance)
+        for regression in regressions:
+            sys.stderr.write("REGRESSION %s\n" % regression)
+        return 1 if regressions else 0
+
+    return 0
+
+
+def _encrypt_in_child(cipher, text, key):
+    """
+    Encrypt in a forked child, so that encrypting the input does not count towards the peak memory of decrypt
+    """
+
+    descriptor, path = tempfile.mkstemp()
+    try:
+        pid = os.fork()
+        if pid == 0:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(cipher.encrypt(text, key))
+            os._exit(0)
+        os.close(descriptor)
+        os.waitpid(pid, 0)
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def _random_text(chars, size, seed=0):
+    rng = np.random.RandomState(seed)
+    codes = np.frombuffer(chars, dtype=np.uint8)
+    return codes[rng.randint(0, len(codes), size)].tostring()
+
+
+def _record(name, operation, size, seconds, peak_bytes):
+    return dict(
+        workload=name,
+        operation=operation,
+        size=size,
+        seconds=seconds,
+        chars_per_sec=size / seconds if size and seconds > 0 else None,
+        peak_memory_bytes=max(peak_bytes, 0),
+    )
+
+
+def _result_key(result):
+    return result['workload'], result['operation'], result['size']
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+from functools import partial
+import multiprocessing
+import threading
+
+try:
+    import asyncio
+except ImportError:
+    import trollius as asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    StopAsyncIteration = StopAsyncIteration
+except NameError:
+    class StopAsyncIteration(Exception):
+        """
+        Raised by the future of __anext__ when an asynchronous iterator is exhausted
+        """
+
+INLINE_MAX_CHARS = 1 << 14  # inputs up to this length run on the event loop thread
+
+_END = object()  # end of a key search
+
+
+class CipherService(object):
+    """
+    Runs cipher operations without blocking the event loop: small inputs run inline, larger ones in an executor,
+    with at most max_concurrency operations in the executor at a time.
+    Operations return futures, which asyncio coroutines await and trollius coroutines (python 2) yield From
+    """
+
+    def __init__(self, executor=None, max_concurrency=None, inline_max_chars=INLINE_MAX_CHARS, loop=None):
+        """
+        Parameters
+        ----------
+        executor (concurrent.futures.Executor): pool to offload to (default: a thread pool, which numpy bound
+            ciphers can use in parallel); a process pool needs picklable ciphers and keys
+        max_concurrency (int): maximum number of offloaded operations in flight (default: every core)
+        inline_max_chars (int): inputs up to this length are transformed inline
+        loop (asyncio event loop): loop the futures belong to (default: the current event loop)
+        """
+
+        self.max_concurrency = max_concurrency or multiprocessing.cpu_count()
+        self.executor = executor if executor is not None else ThreadPoolExecutor(self.max_concurrency)
+        self.inline_max_chars = inline_max_chars
+        self.loop = loop or asyncio.get_event_loop()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency, loop=self.loop)
+
+    def encrypt(self, cipher, text, key, **kwargs):
+        """
+        Parameters
+        ----------
+        cipher (Cipher): any cipher
+        text (string): plaintext
+        key: key for encrypt
+        kwargs: extra arguments for encrypt
+
+        Returns
+        -------
+        (asyncio.Future): ciphertext
+        """
+
+        return self.call(cipher, 'encrypt', text, key, **kwargs)
+
+    def decrypt(self, cipher, text, key, **kwargs):
+        """
+        Parameters
+        ----------
+        cipher (Cipher): any cipher
+        text (string): ciphertext
+        key: key for decrypt
+        kwargs: extra arguments for decrypt
+
+        Returns
+        -------
+        (asyncio.Future): plaintext
+        """
+
+        return self.call(cipher, 'decrypt', text, key, **kwargs)
+
+    def call(self, cipher, method, text, *args, **kwargs):
+        """
+        Parameters
+        ----------
+        cipher (Cipher): any cipher
+        method (string): name of the cipher method, e.g., decrypt_many or encrypt_batch
+        text (string or sequence): first argument of the method, whose length decides whether to offload
+        args, kwargs: other arguments of the method
+
+        Returns
+        -------
+        (asyncio.Future): result of the method
+        """
+
+        func = partial(_apply, cipher, method, (text,) + args, kwargs)
+        if len(text) > self.inline_max_chars:
+            return self._offload(func)
+
+        result = asyncio.Future(loop=self.loop)
+        try:
+            result.set_result(func())
+        except Exception as e:
+            result.set_exception(e)
+
+        return result
+
+    def search(self, search, ciphertext, scorer=None, stop_on_first=False):
+        """
+        Parameters
+        ----------
+        search (search.KeySearch): key search to run in a background thread (it shards across its own processes)
+        ciphertext (string): ciphertext to decrypt
+        scorer (scoring.NgramTable): ranks the hits (optional)
+        stop_on_first (boolean): stop the search after the first hit
+
+        Returns
+        -------
+        (AsyncKeySearch): asynchronous iterator of the hits as they are found
+        """
+
+        return AsyncKeySearch(search, ciphertext, scorer, stop_on_first, self.loop)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def _offload(self, func):
+        """
+        Parameters
+        ----------
+        func (function): work to run in the executor once a concurrency slot is free
+
+        Returns
+        -------
+        (asyncio.Future): result of func
+        """
+
+        result = asyncio.Future(loop=self.loop)
+
+        def acquired(acquire):
+            if result.cancelled():
+                self._semaphore.release()
+                return
+            work = self.loop.run_in_executor(self.executor, func)
+            work.add_done_callback(finished)
+
+        def finished(work):
+            self._semaphore.release()
+            _transfer(work, result)
+
+        asyncio.ensure_future(self._semaphore.acquire(), loop=self.loop).add_done_callback(acquired)
+        return result
+
+
+class AsyncKeySearch(object):
+    """
+    Asynchronous iterator over the hits of a key search, running the search in a background thread.
+    Each item is a (score, hit) pair (score is None without a scorer); ranking holds the hits found so far,
+    best first. Use `async for` (or yield the futures of __anext__ until StopAsyncIteration), and close to stop
+    early
+    """
+
+    def __init__(self, search, ciphertext, scorer, stop_on_first, loop):
+        """
+        Parameters
+        ----------
+        search (search.KeySearch): key search
+        ciphertext (string): ciphertext to decrypt
+        scorer (scoring.NgramTable): ranks the hits, or None
+        stop_on_first (boolean): stop the search after the first hit
+        loop (asyncio event loop): loop the futures belong to
+        """
+
+        self.scorer = scorer
+        self.ranking = []
+        self.loop = loop
+        self._queue = asyncio.Queue(loop=loop)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(search, ciphertext, stop_on_first))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        """
+        Returns
+        -------
+        (asyncio.Future): next (score, hit) pair; raises StopAsyncIteration once the search is over
+        """
+
+        result = asyncio.Future(loop=self.loop)
+
+        def received(get):
+            if result.cancelled():
+                return
+            if get.exception() is not None:
+                result.set_exception(get.exception())
+                return
+            item = get.result()
+            if item is _END:
+                self._queue.put_nowait(_END)  # later calls end too
+                result.set_exception(StopAsyncIteration())
+            elif isinstance(item, Exception):
+                result.set_exception(item)
+            else:
+                self._rank(item)
+                result.set_result(item)
+
+        asyncio.ensure_future(self._queue.get(), loop=self.loop).add_done_callback(received)
+        return result
+
+    def close(self):
+        """
+        Stop the search after the unit of work in progress
+        """
+
+        self._stopped.set()
+
+    def _run(self, search, ciphertext, stop_on_first):
+        hits = search.run(ciphertext, stop_on_first)
+        try:
+            for hit in hits:
+                if self._stopped.is_set():
+                    break
+                score = float(self.scorer.score(hit.plaintext)[0]) if self.scorer is not None else None
+                self.loop.call_soon_threadsafe(self._queue.put_nowait, (score, hit))
+        except Exception as e:
+            self.loop.call_soon_threadsafe(self._queue.put_nowait, e)
+        finally:
+            hits.close()  # terminates the worker pool
+            self.loop.call_soon_threadsafe(self._queue.put_nowait, _END)
+
+    def _rank(self, item):
+        self.ranking.append(item)
+        if self.scorer is not None:
+            self.ranking.sort(key=lambda ranked: -ranked[0])
+
+
+def _apply(cipher, method, args, kwargs):
+    """
+    Call a cipher method (module level, so process pools can pickle it)
+    """
+
+    return getattr(cipher, method)(*args, **kwargs)
+
+
+def _transfer(source, target):
+    """
+    Copy the outcome of a finished future to another future, unless that was cancelled
+    """
+
+    if target.cancelled():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
@@ -0,0 +1,225 @@
+import string
+
+import numpy as np
+
+import engine
+
+DENSE_MAX_CODE = 1 << 16  # alphabets of larger code points map characters to indices through a dict
+
+
+class Alphabet(object):
+    """
+    The ordered characters a cipher works on, with constant time lookups of their indices whatever the alphabet size.
+    Every alphabet has a 256 entry table for bytes; alphabets of characters below DENSE_MAX_CODE (e.g., printable
+    ASCII, cyrillic, greek) index texts through a table with an entry per code point, others through a dict
+    looked up once per distinct character of the text. Alphabets are immutable, so ciphers can share them
+    """
+
+    def __init__(self, characters=None, aliases=None):
+        """
+        Parameters
+        ----------
+        characters (string): alphabet characters (fewer than 255); duplicates resolve to their first index,
+            like str.index. Default: the lowercase english letters
+        aliases (dict or iterable of character pairs): extra character -> alphabet character it is read as,
+            e.g., {'j': 'i'} for a polybius square
+        """
+
+        if characters is None:
+            characters = str(string.ascii_lowercase)
+        if len(characters) >= engine.NOT_IN_ALPHABET:
+            raise ValueError("alphabet is too large for uint8 indices")
+
+        self.characters = characters
+        self.aliases = dict(aliases or {})
+        self.codes = engine.to_codes(characters)
+        self.codes.flags.writeable = False
+
+        self._code_index = {}  # character code -> alphabet index
+        for i, code in enumerate(self.codes.tolist()):
+            self._code_index.setdefault(code, i)
+        for alias, character in self.aliases.items():
+            i = self._code_index.get(_code(character))
+            if i is not None:
+                self._code_index[_code(alias)] = i
+
+        codes = np.fromiter(self._code_index.keys(), dtype=np.int64, count=len(self._code_index))
+        indices = np.fromiter(self._code_index.values(), dtype=np.uint8, count=len(self._code_index))
+        # byte -> alphabet index, for bytes-like data and the str.translate tables
+        self.byte_lookup = np.full(engine.LOOKUP_SIZE, engine.NOT_IN_ALPHABET, dtype=np.uint8)
+        self.byte_lookup[codes[codes < engine.LOOKUP_SIZE]] = indices[codes < engine.LOOKUP_SIZE]
+        self.byte_lookup.flags.writeable = False
+        # code point -> alphabet index, or None when the table would be too large
+        self.lookup = None
+        if not len(codes) or codes.max() < DENSE_MAX_CODE:
+            self.lookup = np.full(max(engine.LOOKUP_SIZE, int(codes.max()) + 1 if len(codes) else 0),
+                                  engine.NOT_IN_ALPHABET, dtype=np.uint8)
+            self.lookup[codes] = indices
+            self.lookup.flags.writeable = False
+
+    def __len__(self):
+        return len(self.characters)
+
+    def __iter__(self):
+        return iter(self.characters)
+
+    def __getitem__(self, i):
+        return self.characters[i]
+
+    def __eq__(self, other):
+        if not isinstance(other, Alphabet):
+            return NotImplemented
+        return self is other or (self.characters == other.characters and self._code_index == other._code_index)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self.characters)
+
+    def __contains__(self, c):
+        """
+        Parameters
+        ----------
+        c (char): character (aliases included)
+        """
+
+        return len(c) == 1 and _code(c) in self._code_index
+
+    def index(self, c):
+        """
+        Parameters
+        ----------
+        c (char): character (aliases included)
+
+        Returns
+        -------
+        i (int): index of the character in the alphabet
+        """
+
+        if c not in self:
+            raise ValueError("character is not in the alphabet")
+        return self._code_index[_code(c)]
+
+    def indices(self, codes):
+        """
+        Map character codes to alphabet indices
+
+        Parameters
+        ----------
+        codes (np.ndarray): character codes (see engine.to_codes)
+
+        Returns
+        -------
+        indices (np.ndarray): uint8 alphabet indices, engine.NOT_IN_ALPHABET for foreign characters
+        """
+
+        if codes.dtype == np.uint8:
+            return self.byte_lookup[codes]
+        if self.lookup is not None:
+            return engine.lookup_indices(codes, self.lookup)
+
+        distinct, inverse = np.unique(codes, return_inverse=True)
+        distinct_indices = [self._code_index.get(code, engine.NOT_IN_ALPHABET) for code in distinct.tolist()]
+        return np.asarray(distinct_indices, dtype=np.uint8)[inverse]
+
+    def encode(self, text):
+        """
+        Map a whole text to alphabet indices in one pass
+
+        Parameters
+        ----------
+        text (string): text to index
+
+        Returns
+        -------
+        codes (np.ndarray): writable character codes of the text
+        indices (np.ndarray): alphabet index of each character
+        mask (np.ndarray): True where the character is in the alphabet
+        """
+
+        codes = engine.to_codes(text)
+        indices = self.indices(codes)
+
+        return codes, indices, indices != engine.NOT_IN_ALPHABET
+
+    def key_indices(self, key):
+        """
+        Map the characters of a key to alphabet indices
+
+        Parameters
+        ----------
+        key (string): key characters
+
+        Returns
+        -------
+        indices (np.ndarray): int64 alphabet indices of the key characters
+
+        Raises
+        ------
+        ValueError: if the key is empty or contains characters outside the alphabet
+        """
+
+        indices = self.indices(engine.to_codes(key))
+        if len(indices) == 0:
+            raise ValueError("key is empty")
+        if np.any(indices == engine.NOT_IN_ALPHABET):
+            raise ValueError("key contains characters outside the alphabet")
+
+        return indices.astype(np.int64)
+
+    def is_bytes(self):
+        """
+        Returns
+        -------
+        (bool): whether every alphabet character is a byte, so substitutions keep byte strings within bytes
+        """
+
+        return not len(self.codes) or int(self.codes.max()) < engine.LOOKUP_SIZE
+
+    def lowercased(self):
+        """
+        Returns
+        -------
+        (Alphabet): the alphabet with lowercase characters and aliases (itself when they already are)
+
+        Raises
+        ------
+        ValueError: if distinct characters become the same once lowercased (e.g., printable ASCII), as a cipher
+            lowercasing its texts could not tell them apart
+        """
+
+        characters = self.characters.lower()
+        aliases = dict((alias.lower(), character.lower()) for alias, character in self.aliases.items())
+        if characters == self.characters and aliases == self.aliases:
+            return self
+        if len(set(characters)) < len(set(self.characters)):
+            raise ValueError("alphabet has characters that only differ in case")
+
+        return Alphabet(characters, aliases)
+
+
+def _code(c):
+    return int(engine.to_codes(c)[0])
+
+
+def to_alphabet(alphabet):
+    """
+    The ciphers lowercase their texts, so the alphabet of a cipher is lowercased too, whether given as characters
+    or as an Alphabet; an alphabet with characters that only differ in case (e.g., string.printable) is rejected
+    rather than left with duplicates that would make the cipher lose information
+
+    Parameters:
+        alphabet (string, Alphabet or None): alphabet characters, or None for the lowercase english letters
+
+    Returns:
+        (Alphabet): lowercase alphabet
+
+    Raises:
+        ValueError: if distinct characters of the alphabet become the same once lowercased
+    """
+
+    if not isinstance(alphabet, Alphabet):
+        alphabet = Alphabet(alphabet)
+    return alphabet.lowercased()
@@ -0,0 +1,121 @@
+import numpy as np
+
+import engine
+
+
+class Batch(object):
+    """
+    Many texts packed into one buffer of character codes, with the offset of each text (record) in the buffer
+    """
+
+    def __init__(self, texts, lower=False):
+        """
+        Parameters
+        ----------
+        texts (iterable of string): records (all byte strings, or all unicode)
+        lower (bool): lowercase the records
+        """
+
+        texts = list(texts)
+        self.text = texts[0][:0].join(texts) if texts else ''
+        if lower:
+            self.text = self.text.lower()
+        self.codes = engine.to_codes(self.text)
+        self.lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+        self.offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(self.lengths, out=self.offsets[1:])
+        self.record_ids = np.repeat(np.arange(len(texts)), self.lengths)  # record of each character
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def positions(self, mask=None):
+        """
+        Parameters
+        ----------
+        mask (np.ndarray): characters to count (default: all)
+
+        Returns
+        -------
+        positions (np.ndarray): position of each character within its record, counting only the masked
+            characters (meaningful where the mask is set)
+        """
+
+        if mask is None:
+            return np.arange(len(self.codes)) - self.offsets[self.record_ids]
+
+        counts = np.zeros(len(self.codes) + 1, dtype=np.int64)
+        np.cumsum(mask, out=counts[1:])
+        return counts[1:] - 1 - counts[self.offsets[self.record_ids]]
+
+    def unpack(self, codes, mask=None):
+        """
+        Parameters
+        ----------
+        codes (np.ndarray): transformed character codes of the whole buffer, or of the masked characters only
+        mask (np.ndarray): characters that were kept, when codes only hold those
+
+        Returns
+        -------
+        texts (list of string): the records, of the same type as the input
+        """
+
+        offsets = self.offsets
+        if mask is not None:
+            kept = np.zeros(len(self.codes) + 1, dtype=np.int64)
+            np.cumsum(mask, out=kept[1:])
+            offsets = kept[offsets]
+
+        text = engine.render(codes, self.text)
+        offsets = offsets.tolist()
+        return [text[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def record_keys(keys, num_records):
+    """
+    Parameters:
+        keys: one key (string or int) shared by every record, or a sequence of one key per record
+        num_records (int): number of records
+
+    Returns:
+        keys (list): key of each record
+    """
+
+    if isinstance(keys, (basestring, int, long, np.integer)):
+        return [keys] * num_records
+
+    keys = list(keys)
+    if len(keys) != num_records:
+        raise ValueError("expected a key for every text")
+    return keys
+
+
+def key_stream(keys, num_records, records, positions, key_ids):
+    """
+    Key id applied to each character of a batch
+
+    Parameters:
+        keys (string or sequence of string): one key shared by every record, or one key per record
+        num_records (int): number of records
+        records (np.ndarray): record of each character (see Batch.record_ids)
+        positions (np.ndarray): key position of each character within its record (see Batch.positions)
+        key_ids (function): maps a key (or the concatenation of the keys) to an array of key ids, raising
+            ValueError for invalid characters
+
+    Returns:
+        ids (np.ndarray): key id of each character
+    """
+
+    if isinstance(keys, basestring):
+        ids = key_ids(keys)
+        if len(ids) == 0:
+            raise ValueError("key is empty")
+        return ids[positions % len(ids)]
+
+    keys = Batch(record_keys(keys, num_records))
+    if np.any(keys.lengths == 0):
+        raise ValueError("key is empty")
+    if not len(keys):
+        return np.zeros(0, dtype=np.int64)
+
+    return key_ids(keys.text)[keys.offsets[records] + positions % keys.lengths[records]]
@@ -1,12 +1,11 @@
 import string
-from copy import copy
-import numpy as np
-import re
 
-from cipher import Cipher
+import fractionation
+import normalize
+from alphabet import Alphabet
 
 
-class Bifid(Cipher):
+class Bifid(fractionation.FractionationCipher):
     """
     Bifid is a cipher which combines the Polybius square with transposition, and uses fractionation to achieve diffusion
     It was invented by Felix Delastelle. Delastelle was a Frenchman who invented several ciphers including the bifid,
@@ -14,83 +13,17 @@ class Bifid(Cipher):
     """
 
     def __init__(self, tableau):
-        super(Bifid, self).__init__()
-        self.tableau = tableau
-
-    def encrypt(self, text, key):
-        """
-        Parameters:
-            text (string): plaintext
-            key (int): period for encryption
-
-        Note: foreign characters are removed
-
-        Returns:
-            ciphertext (string)
-        """
-
-        plaintext = copy(text).lower()
-        plaintext = re.sub('[^%s]' % self.tableau.alphabet, '', plaintext)
-        ciphertext = list(plaintext)
-
-        block_char_indices = np.zeros([2, key], dtype=np.uint8)
-        block_chars = 0  # intra-block characters
-        for i, pc in enumerate(plaintext):
-            i_polybius, j_polybius = self.tableau.get_coordinates(pc)
-            block_char_indices[0, block_chars] = i_polybius
-            block_char_indices[1, block_chars] = j_polybius
-            block_chars += 1
-
-            if block_chars == key or i == len(plaintext) - 1:
-                # we're at the end of a block or message; dump the existing buffer to ciphertext
-                i_fractioned = block_char_indices[:,:block_chars].flatten()
-                i_fractioned = np.asarray([i_fractioned[::2], i_fractioned[1::2]])
-                for i_block_char in xrange(block_chars):
-                    i_pc = i - block_chars + i_block_char + 1
-                    ciphertext[i_pc] = self.tableau.get_character(
-                        i_fractioned[0, i_block_char],
-                        i_fractioned[1, i_block_char]
-                    )
-            block_chars %= key
-
-        return ''.join(ciphertext)
-
-    def decrypt(self, text, key):
         """
-        Parameters:
-            text (string): ciphertext
-            key (int): rotation value for alphabet
-
-        Note: foreign characters are removed
-
-        Returns:
-            plaintext (string)
+        Parameters
+        ----------
+        tableau (PolybiusSquare): tableau of the cipher
         """
 
-        ciphertext = copy(text).lower()
-        ciphertext = re.sub('[^%s]' % self.tableau.alphabet, '', ciphertext)
-        plaintext = list(ciphertext)
+        super(Bifid, self).__init__(tableau)
 
-        block_char_indices = np.zeros(2*key, dtype=np.uint8)
-        block_chars = 0  # intra-block characters
-        for i, cc in enumerate(ciphertext):
-            i_polybius, j_polybius = self.tableau.get_coordinates(cc)
-            block_char_indices[2*block_chars] = i_polybius
-            block_char_indices[2*block_chars+1] = j_polybius
-            block_chars += 1
-
-            if block_chars == key or i == len(plaintext) - 1:
-                i_unfractionated = block_char_indices[:2*block_chars].reshape([2, block_chars])
-                # we're at the end of a block or message; dump the existing buffer to plaintext
-                for i_block_char in xrange(block_chars):
-                    i_cc = i - block_chars + i_block_char + 1
-                    plaintext[i_cc] = self.tableau.get_character(
-                        i_unfractionated[0, i_block_char],
-                        i_unfractionated[1, i_block_char]
-                    )
-            block_chars %= key
-
-        return ''.join(plaintext)
+    @property
+    def tableau(self):
+        return self._tableau
 
 
 class PolybiusSquare(object):
@@ -102,10 +35,12 @@ class PolybiusSquare(object):
         """
         Parameters
         ----------
-        alphabet (string): 25 character string (row ordered) to form 5 x 5 grid
+        alphabet (string or Alphabet): 25 character string (row ordered) to form 5 x 5 grid
         char_map (character pair): map char [0] -> [1]
         """
 
+        if isinstance(alphabet, Alphabet):
+            alphabet = alphabet.characters
         if alphabet is None:
             self.alphabet = string.ascii_lowercase
             self.tableau_alphabet = ''.join(sorted(list(set(self.alphabet) - set(char_map[0]))))
@@ -115,6 +50,37 @@ class PolybiusSquare(object):
 
         self.height = self.width = 5
         self.char_map = (char_map[0].lower(), char_map[1].lower())
+        self._alphabet, self._cell_coordinates, self.cell_codes = fractionation.build_cell_lookup(
+            self.tableau_alphabet, (self.height, self.width), self.char_map
+        )
+        # lowercases and drops characters outside the square (char_map[0] is kept)
+        self.normalizer = normalize.Normalizer(self._alphabet)
+
+    def encode(self, text):
+        """
+        Parameters
+        ----------
+        text (string): characters within the square (after the char_map substitution)
+
+        Returns
+        -------
+        coords (np.ndarray): n x 2 array of (row, col) indices of the characters in the polybius square
+        """
+
+        return fractionation.encode(text, self._alphabet, self._cell_coordinates)
+
+    def decode(self, coords):
+        """
+        Parameters
+        ----------
+        coords (np.ndarray): n x 2 array of (row, col) indices into the polybius square
+
+        Returns
+        -------
+        text (string): characters at the coordinates
+        """
+
+        return fractionation.decode(coords, self.cell_codes)
 
     def get_coordinates(self, c):
         """
@@ -127,12 +93,9 @@ class PolybiusSquare(object):
             j (int): col index of character in polybius square
         """
 
-        c = self.char_map[1] if c == self.char_map[0] else c
-        c_id = self.tableau_alphabet.index(c)
-        i = int(c_id / self.width)
-        j = c_id % self.width
+        i, j = self.encode(c)[0]
 
-        return i, j
+        return int(i), int(j)
 
     def get_character(self, i, j):
         """
@@ -0,0 +1,186 @@
+import multiprocessing
+import random
+
+import numpy as np
+
+import fractionation
+import scoring
+from bifid import Bifid, PolybiusSquare
+
+
+class BifidAnnealer(object):
+    """
+    Simulated annealing over keyed polybius squares for a Bifid ciphertext of known period.
+    Squares are mutated by swapping two cells (rescored incrementally), swapping two rows or two columns, or
+    reversing the square, and scored with an n-gram fitness function
+    """
+
+    def __init__(self, ciphertext, period, scorer, alphabet=None, char_map=('j','i'), iterations=200000, restarts=1,
+                 start_temperature=20., end_temperature=1., swap_probability=0.9):
+        """
+        Parameters
+        ----------
+        ciphertext (string): ciphertext
+        period (int): period of the cipher
+        scorer (scoring.NgramTable): n-gram fitness
+        alphabet (string): 25 characters of the square, in any order (see PolybiusSquare)
+        char_map (character pair): map char [0] -> [1] (see PolybiusSquare)
+        iterations (int): mutations per restart
+        restarts (int): independent random starts per chain
+        start_temperature (float): initial temperature (in log10 score units)
+        end_temperature (float): final temperature, reached geometrically; 0 anneals as a pure hill climb
+        swap_probability (float): probability of a cell swap; the other moves share the remainder
+        """
+
+        self.period = period
+        self.scorer = scorer
+        self.char_map = char_map
+        self.iterations = iterations
+        self.restarts = restarts
+        self.start_temperature = start_temperature
+        self.end_temperature = end_temperature
+        self.swap_probability = swap_probability
+
+        template = PolybiusSquare(alphabet=alphabet, char_map=char_map)
+        self.symbols = template.tableau_alphabet
+        self.ciphertext = Bifid(template)._normalize(ciphertext)
+        self._symbol_ids = template.encode(self.ciphertext).dot([template.width, 1])
+        self._symbol_letters = scoring.letter_indices(self.symbols)[0]
+        self._shape = (template.height, template.width)
+
+    def run(self, seed=None):
+        """
+        Anneal one chain of restarts
+
+        Parameters
+        ----------
+        seed (int): random seed of the chain
+
+        Returns
+        -------
+        score (float): best fitness found
+        tableau (PolybiusSquare): best square found
+        plaintext (string): decryption with the best square
+        """
+
+        rng = random.Random(seed)
+        num_cells = len(self.symbols)
+        best_score, best_layout = -np.inf, None
+        for _ in xrange(self.restarts):
+            layout = range(num_cells)
+            rng.shuffle(layout)
+            state = fractionation.IncrementalDecryption(self._symbol_ids, self._shape, self.period, self.scorer,
+                                                        self._symbol_letters, layout)
+            score, layout = self._anneal(state, rng)
+            if score > best_score:
+                best_score, best_layout = score, layout
+
+        tableau = self.tableau(best_layout)
+        return best_score, tableau, Bifid(tableau).decrypt(self.ciphertext, self.period)
+
+    def run_parallel(self, chains, processes=None):
+        """
+        Anneal independent chains in worker processes
+
+        Parameters
+        ----------
+        chains (int or iterable of int): number of chains, or the seed of each chain
+        processes (int): number of worker processes (default: every core)
+
+        Returns
+        -------
+        list of (score, tableau, plaintext), best first
+        """
+
+        seeds = range(chains) if isinstance(chains, (int, long)) else list(chains)
+        pool = multiprocessing.Pool(processes or multiprocessing.cpu_count())
+        try:
+            results = pool.map(_run_chain, [(self, seed) for seed in seeds])
+        finally:
+            pool.terminate()
+            pool.join()
+
+        return sorted(results, key=lambda result: -result[0])
+
+    def tableau(self, layout):
+        """
+        Parameters
+        ----------
+        layout (sequence of int): symbol id at each cell
+
+        Returns
+        -------
+        (PolybiusSquare)
+        """
+
+        return PolybiusSquare(alphabet=''.join(self.symbols[i] for i in layout), char_map=self.char_map)
+
+    def _anneal(self, state, rng):
+        """
+        Parameters
+        ----------
+        state (fractionation.IncrementalDecryption): decryption under the starting layout
+        rng (random.Random): random source
+
+        Returns
+        -------
+        score (float): best fitness found
+        layout (list of int): best layout found
+        """
+
+        num_cells = len(self.symbols)
+        best_score, best_layout = state.score, list(state.symbol_at)
+        cooling = (max(self.end_temperature, 1e-9) / self.start_temperature) ** (1. / max(self.iterations - 1, 1))
+        temperature = self.start_temperature
+        for _ in xrange(self.iterations):
+            if rng.random() < self.swap_probability:
+                cell_a, cell_b = rng.sample(xrange(num_cells), 2)
+                score = state.propose_swap(cell_a, cell_b)
+                if scoring.accept_move(score - state.score, temperature, rng):
+                    state.commit()
+            else:
+                layout = self._mutate(state.symbol_at, rng)
+                previous_layout, previous_score = state.symbol_at, state.score
+                state.set_layout(layout)
+                if not scoring.accept_move(state.score - previous_score, temperature, rng):
+                    state.set_layout(previous_layout)
+
+            if state.score > best_score:
+                best_score, best_layout = state.score, list(state.symbol_at)
+            temperature *= cooling
+
+        return best_score, best_layout
+
+    def _mutate(self, layout, rng):
+        """
+        Parameters
+        ----------
+        layout (np.ndarray): symbol id at each cell
+        rng (random.Random): random source
+
+        Returns
+        -------
+        layout (np.ndarray): layout with two rows or two columns swapped, or reversed
+        """
+
+        square = layout.reshape(self._shape).copy()
+        move = rng.randrange(3)
+        if move == 0:
+            i, j = rng.sample(xrange(self._shape[0]), 2)
+            square[[i, j]] = square[[j, i]]
+        elif move == 1:
+            i, j = rng.sample(xrange(self._shape[1]), 2)
+            square[:, [i, j]] = square[:, [j, i]]
+        else:
+            square = square[::-1, ::-1]
+
+        return square.ravel()
+
+
+def _run_chain(args):
+    """
+    Run one annealing chain (in a worker process)
+    """
+
+    annealer, seed = args
+    return annealer.run(seed)
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from functools import wraps
+import threading
+
+
+class LRUCache(object):
+    """
+    Size bounded mapping that evicts the least recently used entry, with hit and miss counters.
+    Safe to share between threads: entries are looked up and inserted under a lock, while values are built outside
+    of it (two threads missing the same key at once may both build it)
+    """
+
+    def __init__(self, maxsize=128):
+        """
+        Parameters
+        ----------
+        maxsize (int): maximum number of entries
+        """
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Parameters
+        ----------
+        key (hashable): cache key
+        build (function): called without arguments to build the value on a miss
+
+        Returns
+        -------
+        value cached under the key
+        """
+
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries[key] = value  # most recently used last
+                return value
+
+        value = build()
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.maxsize:
+                self._entries.popitem(last=False)
+            self._entries[key] = value
+
+        return value
+
+    def stats(self):
+        """
+        Returns
+        -------
+        (dict): hits, misses, size and maxsize of the cache
+        """
+
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, size=len(self._entries), maxsize=self.maxsize)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']  # locks do not pickle; ciphers holding a cache are sent to worker processes
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+def lru_cache(maxsize=128):
+    """
+    Memoize a function of hashable positional arguments in an LRUCache (available as the `cache` attribute)
+
+    Parameters:
+        maxsize (int): maximum number of cached results
+
+    Returns:
+        decorator
+    """
+
+    def decorator(func):
+        cache = LRUCache(maxsize)
+
+        @wraps(func)
+        def wrapper(*args):
+            return cache.get(args, lambda: func(*args))
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
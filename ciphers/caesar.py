@@ -1,6 +1,11 @@
-import string
-from copy import copy
+import numpy as np
 
+import batch
+import compiled
+import engine
+import normalize
+from alphabet import to_alphabet
+from ciphertext import transformed
 from cipher import Cipher
 
 
@@ -9,51 +14,144 @@ class Caesar(Cipher):
     A caesar cipher that involves rotating the alphabet to [d]encrypt
     """
 
-    def __init__(self):
+    def __init__(self, alphabet=None):
+        """
+        Parameters
+        ----------
+        alphabet (string or Alphabet): characters to rotate (default: the lowercase english letters)
+        """
+
         super(Caesar, self).__init__()
 
-        self._alphabet = str(string.ascii_lowercase)
+        self._alphabet = to_alphabet(alphabet)
+        self._normalizer = normalize.Normalizer(self._alphabet)
 
     def encrypt(self, text, key, include_foreign_chars=True):
         """
         Parameters:
-            text (string): plaintext
+            text (string or CipherText): plaintext
             key (int): rotation value for alphabet
             include_foreign_chars (boolean): include chars outside the alphabet
 
         Returns:
-            ciphertext (string)
+            ciphertext (string, or CipherText for a CipherText text)
         """
 
-        plaintext = copy(text).lower()
-        ciphertext = list(plaintext)
-        for i, pc in enumerate(plaintext):
-            if pc not in self._alphabet:
-                if include_foreign_chars:
-                    ciphertext[i] = pc
-                continue
-            ciphertext[i] = self._alphabet[(self._alphabet.index(pc) + key) % len(self._alphabet)]
-
-        return ''.join(ciphertext)
+        return self._rotate(text, key, include_foreign_chars)
 
     def decrypt(self, text, key, include_foreign_chars=True):
         """
         Parameters:
-            text (string): ciphertext
+            text (string or CipherText): ciphertext
             key (int): rotation value for alphabet
             include_foreign_chars (boolean): include chars outside the alphabet
 
         Returns:
-            plaintext (string)
+            plaintext (string, or CipherText for a CipherText text)
+        """
+
+        return self._rotate(text, -key, include_foreign_chars)
+
+    def encrypt_batch(self, texts, keys, include_foreign_chars=True):
+        """
+        Encrypt many texts in one array operation
+
+        Parameters:
+            texts (iterable of string): plaintexts
+            keys (int or sequence of int): rotation value shared by every text, or one per text
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            ciphertexts (list of string)
+        """
+
+        return self._rotate_batch(texts, keys, 1, include_foreign_chars)
+
+    def decrypt_batch(self, texts, keys, include_foreign_chars=True):
+        """
+        Decrypt many texts in one array operation
+
+        Parameters:
+            texts (iterable of string): ciphertexts
+            keys (int or sequence of int): rotation value shared by every text, or one per text
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            plaintexts (list of string)
+        """
+
+        return self._rotate_batch(texts, keys, -1, include_foreign_chars)
+
+    def decrypt_many(self, text, keys=None, include_foreign_chars=True):
+        """
+        Decrypt one ciphertext under many rotations, indexing the ciphertext once
+
+        Parameters:
+            text (string or CipherText): ciphertext
+            keys (iterable of int): rotation values for alphabet (default: every rotation)
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            candidates (np.ndarray): num_keys x num_chars array of plaintext character codes
+        """
+
+        if keys is None:
+            keys = xrange(len(self._alphabet))
+        shifts = np.asarray(list(keys), dtype=np.int64)
+
+        ciphertext = self._normalizer(text)
+        rotated = (ciphertext.indices.astype(np.int64)[np.newaxis, :] - shifts[:, np.newaxis]) % len(self._alphabet)
+        candidates = self._alphabet.codes[rotated]
+        if include_foreign_chars:
+            candidates = ciphertext.expand(candidates)
+
+        return candidates
+
+    def _translation_tables(self, key):
+        num_alphabet_chars = len(self._alphabet)
+        return compiled.translation_tables(
+            self._alphabet,
+            lambda indices: self._alphabet.codes[(indices + key) % num_alphabet_chars],
+            lambda indices: self._alphabet.codes[(indices - key) % num_alphabet_chars]
+        )
+
+    def _rotate_batch(self, texts, keys, direction, include_foreign_chars):
+        """
+        Parameters:
+            texts (iterable of string): texts
+            keys (int or sequence of int): rotation values
+            direction (int): 1 to encrypt, -1 to decrypt
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            rotated texts (list of string), lowercased
+        """
+
+        texts = batch.Batch(texts, lower=True)
+        indices = self._alphabet.indices(texts.codes)
+        mask = indices != engine.NOT_IN_ALPHABET
+        shifts = np.asarray(batch.record_keys(keys, len(texts)), dtype=np.int64)[texts.record_ids[mask]]
+        codes = texts.codes
+        codes[mask] = self._alphabet.codes[(indices[mask] + direction * shifts) % len(self._alphabet)]
+        if not include_foreign_chars:
+            return texts.unpack(codes[mask], mask)
+
+        return texts.unpack(codes)
+
+    def _rotate(self, text, shift, include_foreign_chars):
+        """
+        Rotate every alphabet character of the text in one array operation
+
+        Parameters:
+            text (string): text
+            shift (int): rotation value for alphabet
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            rotated text (string), lowercased
         """
 
-        ciphertext = copy(text).lower()
-        plaintext = list(ciphertext)
-        for i, cc in enumerate(ciphertext):
-            if cc not in self._alphabet:
-                if include_foreign_chars:
-                    plaintext[i] = cc
-                continue
-            plaintext[i] = self._alphabet[(self._alphabet.index(cc) - key) % len(self._alphabet)]
+        normalized = self._normalizer(text)
+        indices = (normalized.indices.astype(np.int64) + shift) % len(self._alphabet)
 
-        return ''.join(plaintext)
+        return transformed(text, normalized, self._alphabet, indices, include_foreign_chars)
@@ -1,4 +1,17 @@
 from abc import abstractmethod, ABCMeta
+from itertools import islice
+
+import numpy as np
+
+import batch
+import engine
+from cache import LRUCache
+from ciphertext import as_text
+from compiled import CompiledKey
+
+CHUNK_SIZE = 1 << 16  # characters read at a time when streaming
+MAX_COMPILED_KEYS = 64  # compiled keys kept by each cipher
+TABLE_KWARGS = frozenset(['include_foreign_chars'])  # extra arguments accounted for by translation tables
 
 
 class Cipher(object):
@@ -9,7 +22,7 @@ class Cipher(object):
     __metaclass__ = ABCMeta
 
     def __init__(self):
-        pass
+        self._compiled_keys = LRUCache(MAX_COMPILED_KEYS)
 
     @abstractmethod
     def encrypt(self, text, key):
@@ -17,4 +30,234 @@ class Cipher(object):
 
     @abstractmethod
     def decrypt(self, text, key):
-        pass
\ No newline at end of file
+        pass
+
+    @staticmethod
+    def instrument(profile=False, trace_memory=False):
+        """
+        Count calls, time, characters processed and per-phase time (normalize, index, transform, render) of every
+        cipher while the returned context manager is active; nothing is instrumented outside of it
+
+        Parameters:
+            profile (bool): also run a cProfile session
+            trace_memory (bool): also record peak memory
+
+        Returns:
+            (instrument.Session): context manager with snapshot(), reset() and profile_stats()
+        """
+
+        import instrument
+        return instrument.Session(profile, trace_memory)
+
+    def compile(self, key, **kwargs):
+        """
+        Bind a key for repeated use; compiled keys are cached, so compiling the same key again is cheap.
+        Substitution keys are tabulated up to a period of compiled.MAX_TABLE_PHASES; longer keys (e.g., a one time
+        pad as long as the message) are bound without tables, so the cache does not hold a table per pad
+
+        Parameters:
+            key: key for encrypt and decrypt
+            kwargs: extra arguments for encrypt and decrypt
+
+        Returns:
+            (compiled.CompiledKey): object with encrypt(text) and decrypt(text)
+        """
+
+        cache_key = (key, tuple(sorted(kwargs.items())))
+        # other arguments (e.g., a one time pad's func) change the substitution: those keys call encrypt and decrypt
+        build_tables = lambda: self._translation_tables(key) if TABLE_KWARGS.issuperset(kwargs) else None
+        return self._compiled_keys.get(cache_key, lambda: CompiledKey(self, key, kwargs, build_tables()))
+
+    def _translation_tables(self, key):
+        """
+        Parameters:
+            key: key for encrypt and decrypt
+
+        Returns:
+            (compiled.TranslationTables): per-phase byte tables of the key, or None when the cipher is not a
+                character substitution (compiled keys then call encrypt and decrypt)
+        """
+
+        return None
+
+    def _permutation(self, num_chars, key, decrypt, **kwargs):
+        """
+        Parameters:
+            num_chars (int): length of the text
+            key: key for encrypt and decrypt
+            decrypt (boolean): permutation of decrypt rather than encrypt
+            kwargs: extra arguments for encrypt and decrypt
+
+        Returns:
+            sources (np.ndarray): input index of each output character, or None when the cipher is not a
+                transposition of the whole text
+        """
+
+        return None
+
+    def _transform_codes(self, codes, key, decrypt, **kwargs):
+        """
+        Parameters:
+            codes (np.ndarray): lowercased character codes of a byte string
+            key: key for encrypt and decrypt
+            decrypt (boolean): decrypt rather than encrypt
+            kwargs: extra arguments for encrypt and decrypt
+
+        Returns:
+            codes (np.ndarray): character codes of the output, or None when the cipher only transforms text
+        """
+
+        return None
+
+    def encrypt_stream(self, reader, writer, key, chunk_size=CHUNK_SIZE, **kwargs):
+        """
+        Encrypt a stream with memory bounded by the chunk size
+
+        Parameters:
+            reader (file-like or iterable): plaintext, read chunk by chunk (or an iterable of text chunks)
+            writer (file-like): ciphertext is written here
+            key: key for encrypt
+            chunk_size (int): number of characters read at a time
+            kwargs: extra arguments for encrypt
+        """
+
+        for chunk in self._stream(self.encrypt, read_chunks(reader, chunk_size), key, kwargs):
+            writer.write(chunk)
+
+    def decrypt_stream(self, reader, writer, key, chunk_size=CHUNK_SIZE, **kwargs):
+        """
+        Decrypt a stream with memory bounded by the chunk size
+
+        Parameters:
+            reader (file-like or iterable): ciphertext, read chunk by chunk (or an iterable of text chunks)
+            writer (file-like): plaintext is written here
+            key: key for decrypt
+            chunk_size (int): number of characters read at a time
+            kwargs: extra arguments for decrypt
+        """
+
+        for chunk in self._stream(self.decrypt, read_chunks(reader, chunk_size), key, kwargs):
+            writer.write(chunk)
+
+    def _stream(self, func, chunks, key, kwargs):
+        """
+        Transform text chunk by chunk. Each chunk is transformed independently; ciphers whose state depends on
+        the text already seen (e.g., the key position) override this to carry that state across chunk boundaries
+
+        Parameters:
+            func (function): encrypt or decrypt
+            chunks (iterable): text chunks
+            key: key for func
+            kwargs (dict): extra arguments for func
+
+        Returns:
+            generator of transformed chunks
+        """
+
+        for chunk in chunks:
+            yield func(chunk, key, **kwargs)
+
+    def encrypt_batch(self, texts, keys, **kwargs):
+        """
+        Encrypt many texts
+
+        Parameters:
+            texts (iterable of string): plaintexts
+            keys: one key shared by every text, or a sequence of one key per text
+            kwargs: extra arguments for encrypt
+
+        Returns:
+            ciphertexts (list of string)
+
+        Note: subclasses override this to transform the whole batch in one pass
+        """
+
+        texts = list(texts)
+        return [self.encrypt(text, key, **kwargs) for text, key in zip(texts, batch.record_keys(keys, len(texts)))]
+
+    def decrypt_batch(self, texts, keys, **kwargs):
+        """
+        Decrypt many texts
+
+        Parameters:
+            texts (iterable of string): ciphertexts
+            keys: one key shared by every text, or a sequence of one key per text
+            kwargs: extra arguments for decrypt
+
+        Returns:
+            plaintexts (list of string)
+
+        Note: subclasses override this to transform the whole batch in one pass
+        """
+
+        texts = list(texts)
+        return [self.decrypt(text, key, **kwargs) for text, key in zip(texts, batch.record_keys(keys, len(texts)))]
+
+    def decrypt_many(self, text, keys, **kwargs):
+        """
+        Decrypt one ciphertext under many keys
+
+        Parameters:
+            text (string or CipherText): ciphertext
+            keys (iterable): keys to decrypt with
+            kwargs: extra arguments for decrypt
+
+        Returns:
+            candidates (np.ndarray): num_keys x num_chars array of plaintext character codes (one row per key)
+
+        Note: subclasses override this to preprocess the ciphertext once for all keys
+        """
+
+        text = as_text(text)
+        rows = [engine.to_codes(self.decrypt(text, key, **kwargs)) for key in keys]
+        if not rows:
+            return np.zeros([0, 0], dtype=engine.to_codes(text).dtype)
+
+        return np.vstack(rows)
+
+    def iter_decrypt_many(self, text, keys, chunk_size=1024, **kwargs):
+        """
+        Stream the decryptions of one ciphertext under many keys
+
+        Parameters:
+            text (string or CipherText): ciphertext
+            keys (iterable): keys to decrypt with
+            chunk_size (int): number of keys passed to decrypt_many at a time
+            kwargs: extra arguments for decrypt_many
+
+        Returns:
+            generator of (key, plaintext) pairs
+        """
+
+        text = as_text(text)
+        keys = iter(keys)
+        while True:
+            chunk = list(islice(keys, chunk_size))
+            if not chunk:
+                return
+            candidates = self.decrypt_many(text, chunk, **kwargs)
+            for key, candidate in zip(chunk, candidates):
+                yield key, engine.render(candidate, text)
+
+
+def read_chunks(reader, chunk_size):
+    """
+    Parameters:
+        reader (file-like or iterable): object with a read method, or an iterable of text chunks
+        chunk_size (int): number of characters read at a time from a file-like reader
+
+    Returns:
+        generator of non-empty text chunks
+    """
+
+    if not hasattr(reader, 'read'):
+        for chunk in reader:
+            if chunk:
+                yield chunk
+        return
+
+    while True:
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
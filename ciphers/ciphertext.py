@@ -0,0 +1,272 @@
+from functools import wraps
+
+import numpy as np
+
+import engine
+from alphabet import to_alphabet
+
+_NO_POSITIONS = np.zeros(0, dtype=np.int64)  # side table shared by texts without foreign characters
+_NO_POSITIONS.flags.writeable = False
+
+
+class IndexedText(object):
+    """
+    A text split into the alphabet indices of its alphabet characters and a side table of its foreign characters.
+    Implementations provide indices, foreign_positions, foreign_codes, length and like
+    (an empty string of the type the text renders to)
+    """
+
+    __slots__ = ()
+
+    def expand(self, codes):
+        """
+        Put the foreign characters back between transformed alphabet characters
+
+        Parameters:
+            codes (np.ndarray): character codes for the alphabet characters, along the last axis
+                (e.g., num_keys x len(indices) candidates)
+
+        Returns:
+            codes (np.ndarray): character codes of the full length text(s)
+        """
+
+        if not len(self.foreign_positions):
+            return codes
+
+        codes = np.asarray(codes)
+        dtype = np.promote_types(codes.dtype, self.foreign_codes.dtype)
+        expanded = np.empty(codes.shape[:-1] + (self.length,), dtype=dtype)
+        kept = np.ones(self.length, dtype=bool)
+        kept[self.foreign_positions] = False
+        expanded[..., kept] = codes
+        expanded[..., self.foreign_positions] = self.foreign_codes
+
+        return expanded
+
+    def restore(self, codes):
+        """
+        Parameters:
+            codes (np.ndarray): character codes for the alphabet characters
+
+        Returns:
+            text (string): the full length text, of the type of the indexed text
+        """
+
+        return engine.render(self.expand(codes), self.like)
+
+    def render(self, codes):
+        """
+        Parameters:
+            codes (np.ndarray): character codes for the alphabet characters
+
+        Returns:
+            text (string): the alphabet characters only, of the type of the indexed text
+        """
+
+        return engine.render(codes, self.like)
+
+    def alphabet_positions(self):
+        """
+        Returns:
+            positions (np.ndarray): position of each alphabet character in the full length text
+        """
+
+        if not len(self.foreign_positions):
+            return np.arange(self.length)
+
+        kept = np.ones(self.length, dtype=bool)
+        kept[self.foreign_positions] = False
+        return np.flatnonzero(kept)
+
+
+class CipherText(IndexedText):
+    """
+    A lowercased text held as the uint8 alphabet indices of its alphabet characters, with a reference to the
+    alphabet and a side table of its foreign characters, rendered to a string only on demand.
+    Ciphers given a CipherText return one, so chained operations work on the indices without rendering and
+    re-indexing the text in between. Arrays are read-only, so texts can share them
+    """
+
+    __slots__ = ('alphabet', 'indices', 'foreign_positions', 'foreign_codes', 'length', 'like')
+
+    def __init__(self, alphabet, indices, foreign_positions=None, foreign_codes=None, length=None, like=b''):
+        """
+        Parameters
+        ----------
+        alphabet (Alphabet): alphabet the indices refer to
+        indices (np.ndarray): alphabet index of each alphabet character (stored as uint8)
+        foreign_positions (np.ndarray): position of each foreign character in the full length text
+        foreign_codes (np.ndarray): character code of each foreign character
+        length (int): length of the full text (default: alphabet and foreign characters together)
+        like (string): empty byte string or unicode, the type the text renders to
+        """
+
+        if foreign_positions is None or not len(foreign_positions):
+            foreign_positions = foreign_codes = _NO_POSITIONS
+        self.alphabet = alphabet
+        self.indices = _read_only(np.asarray(indices, dtype=np.uint8))
+        self.foreign_positions = _read_only(foreign_positions)
+        self.foreign_codes = _read_only(foreign_codes)
+        self.length = length if length is not None else len(self.indices) + len(self.foreign_positions)
+        self.like = like[:0]
+
+    @classmethod
+    def from_text(cls, text, alphabet=None):
+        """
+        Parameters
+        ----------
+        text (string): text to index (lowercased, like the ciphers)
+        alphabet (string or Alphabet): alphabet of the text (default: the lowercase english letters)
+
+        Returns
+        -------
+        (CipherText)
+        """
+
+        import normalize
+        alphabet = to_alphabet(alphabet)
+        return cls.from_normalized(normalize.Normalizer(alphabet)(text), alphabet)
+
+    @classmethod
+    def from_normalized(cls, normalized, alphabet, indices=None, include_foreign_chars=True):
+        """
+        Parameters
+        ----------
+        normalized (IndexedText): normalized text (or CipherText)
+        alphabet (Alphabet): alphabet of the indices
+        indices (np.ndarray): transformed alphabet indices (default: those of the normalized text)
+        include_foreign_chars (boolean): keep the foreign characters of the normalized text
+
+        Returns
+        -------
+        (CipherText)
+        """
+
+        if indices is None:
+            indices = normalized.indices
+        if not include_foreign_chars:
+            return cls(alphabet, indices, like=normalized.like)
+
+        return cls(alphabet, indices, normalized.foreign_positions, normalized.foreign_codes, normalized.length,
+                   normalized.like)
+
+    @property
+    def text(self):
+        """
+        (string): the alphabet characters only, like Normalized.text
+        """
+
+        return self.render(self.alphabet.codes[self.indices])
+
+    @property
+    def nbytes(self):
+        """
+        (int): bytes held by the arrays (the side table is shared between texts transformed from one another)
+        """
+
+        return self.indices.nbytes + self.foreign_positions.nbytes + self.foreign_codes.nbytes
+
+    def codes(self):
+        """
+        Returns:
+            codes (np.ndarray): character codes of the full length text
+        """
+
+        return self.expand(self.alphabet.codes[self.indices])
+
+    def to_text(self):
+        """
+        Returns:
+            text (string): the full length text, a byte string or unicode like the text it was indexed from
+        """
+
+        return self.restore(self.alphabet.codes[self.indices])
+
+    def __str__(self):
+        text = self.to_text()
+        return text if isinstance(text, bytes) else text.encode('utf-8')
+
+    def __unicode__(self):
+        text = self.to_text()
+        return text if not isinstance(text, bytes) else text.decode('latin-1')
+
+    def __len__(self):
+        return self.length
+
+    def __eq__(self, other):
+        if not isinstance(other, CipherText):
+            return NotImplemented
+        return (type(self.like) is type(other.like) and self.length == other.length and self.alphabet == other.alphabet
+                and np.array_equal(self.indices, other.indices)
+                and np.array_equal(self.foreign_positions, other.foreign_positions)
+                and np.array_equal(self.foreign_codes, other.foreign_codes))
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash((self.alphabet, self.indices.tostring(), self.foreign_positions.tostring()))
+
+    def __repr__(self):
+        return 'CipherText(%r)' % self.to_text()
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in state.iteritems():
+            setattr(self, name, value)
+
+
+def as_text(text):
+    """
+    Parameters:
+        text (string or CipherText): text
+
+    Returns:
+        text (string): the text, rendered if it is a CipherText
+    """
+
+    return text.to_text() if isinstance(text, CipherText) else text
+
+
+def transformed(text, normalized, alphabet, indices, include_foreign_chars=True):
+    """
+    Parameters:
+        text (string or CipherText): input of a cipher operation
+        normalized (IndexedText): the normalized input
+        alphabet (Alphabet): alphabet of the transformed indices
+        indices (np.ndarray): transformed alphabet indices of the alphabet characters
+        include_foreign_chars (boolean): put the foreign characters back
+
+    Returns:
+        output (CipherText if the input was one, else string)
+    """
+
+    if isinstance(text, CipherText):
+        return CipherText.from_normalized(normalized, alphabet, indices, include_foreign_chars)
+
+    codes = alphabet.codes[indices]
+    return normalized.restore(codes) if include_foreign_chars else normalized.render(codes)
+
+
+def accepts_ciphertext(method):
+    """
+    Let a cipher method without an index form (e.g., transpositions, XOR) take a CipherText: it is rendered,
+    transformed as text, and indexed again in its alphabet
+    """
+
+    @wraps(method)
+    def wrapper(cipher, text, *args, **kwargs):
+        if not isinstance(text, CipherText):
+            return method(cipher, text, *args, **kwargs)
+        return CipherText.from_text(method(cipher, text.to_text(), *args, **kwargs), text.alphabet)
+
+    return wrapper
+
+
+def _read_only(array):
+    if array.flags.writeable:
+        array.flags.writeable = False
+    return array
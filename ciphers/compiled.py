@@ -0,0 +1,148 @@
+from collections import namedtuple
+
+import numpy as np
+
+import engine
+
+MAX_STRIDED_PHASES = 64  # longest key translated phase by phase with strided slices
+MAX_TABLE_PHASES = 1 << 12  # longest key period tabulated (2 x period x 256 bytes); longer keys are not compiled
+
+# per-phase translation tables of a keyed cipher:
+#   encrypt, decrypt (np.ndarray): period x 256 uint8 output byte for each input byte at each key phase
+#   in_alphabet (np.ndarray): 256 booleans, whether a byte (lowercased) is within the alphabet
+#   alphabet_phases (boolean): the key phase only advances on characters within the alphabet (else on every one)
+TranslationTables = namedtuple('TranslationTables', ['encrypt', 'decrypt', 'in_alphabet', 'alphabet_phases'])
+
+
+class CompiledKey(object):
+    """
+    A cipher bound to one key, with the key resolved ahead of time.
+    Byte strings are substituted through precomputed tables: str.translate for one phase, a translate of each
+    strided slice for short periodic keys, and a single gather from the period x 256 table otherwise.
+    Other text, ciphers without tables and keys of a period above MAX_TABLE_PHASES (e.g., a one time pad as long as
+    the message) go through the cipher itself
+    """
+
+    def __init__(self, cipher, key, kwargs, tables=None):
+        """
+        Parameters
+        ----------
+        cipher (Cipher): cipher to bind
+        key: key for encrypt and decrypt
+        kwargs (dict): extra arguments for encrypt and decrypt (e.g., include_foreign_chars)
+        tables (TranslationTables): per-phase tables, or None
+        """
+
+        self.cipher = cipher
+        self.key = key
+        self.kwargs = kwargs
+        self._tables = tables
+        if tables is None:
+            return
+
+        self._include_foreign_chars = kwargs.get('include_foreign_chars', True)
+        self._encrypt_strings = [row.tostring() for row in tables.encrypt]
+        self._decrypt_strings = [row.tostring() for row in tables.decrypt]
+        all_bytes = np.arange(engine.LOOKUP_SIZE, dtype=np.uint8)
+        self._alphabet_chars = all_bytes[tables.in_alphabet].tostring()
+        self._foreign_chars = all_bytes[~tables.in_alphabet].tostring()
+
+    def encrypt(self, text):
+        """
+        Parameters:
+            text (string): plaintext
+
+        Returns:
+            ciphertext (string)
+        """
+
+        if self._tables is None or not isinstance(text, bytes):
+            return self.cipher.encrypt(text, self.key, **self.kwargs)
+        return self._translate(text, self._tables.encrypt, self._encrypt_strings)
+
+    def decrypt(self, text):
+        """
+        Parameters:
+            text (string): ciphertext
+
+        Returns:
+            plaintext (string)
+        """
+
+        if self._tables is None or not isinstance(text, bytes):
+            return self.cipher.decrypt(text, self.key, **self.kwargs)
+        return self._translate(text, self._tables.decrypt, self._decrypt_strings)
+
+    def _translate(self, text, table, strings):
+        """
+        Parameters:
+            text (bytes): input
+            table (np.ndarray): period x 256 translation table
+            strings (list of bytes): the rows of the table, for str.translate
+
+        Returns:
+            output (bytes)
+        """
+
+        period = len(strings)
+        if period == 1:
+            if self._include_foreign_chars:
+                return text.translate(strings[0])
+            return text.translate(strings[0], self._foreign_chars)
+
+        # the phase of each character is its position unless foreign characters hold the key
+        positional = not self._tables.alphabet_phases or not text.translate(None, self._alphabet_chars)
+        if positional and self._include_foreign_chars and period <= MAX_STRIDED_PHASES:
+            output = bytearray(text)
+            for phase in xrange(min(period, len(text))):
+                output[phase::period] = text[phase::period].translate(strings[phase])
+            return bytes(output)
+
+        codes = np.frombuffer(text, dtype=np.uint8)
+        in_alphabet = self._tables.in_alphabet[codes]
+        if positional:
+            phases = np.arange(len(codes)) % period
+        else:
+            # foreign characters translate the same in every phase
+            phases = (np.cumsum(in_alphabet) - 1) % period
+        output = table[phases, codes]
+        if not self._include_foreign_chars:
+            output = output[in_alphabet]
+
+        return output.tostring()
+
+
+def translation_tables(alphabet, encrypt, decrypt, alphabet_phases=False, period=1):
+    """
+    Tabulate a keyed substitution over every byte (lowercased, like the ciphers do)
+
+    Parameters:
+        alphabet (Alphabet): alphabet of the cipher
+        encrypt (function): maps the alphabet indices of the bytes within the alphabet to a period x num_bytes
+            (or 1-d, for one phase) array of output character codes
+        decrypt (function): the same for decryption
+        alphabet_phases (boolean): the key phase only advances on characters within the alphabet
+        period (int): number of key phases
+
+    Returns:
+        (TranslationTables): or None if an output character is not a byte, or the period is above MAX_TABLE_PHASES
+    """
+
+    if period > MAX_TABLE_PHASES:
+        return None
+
+    lowered = engine.LOWER_TABLE
+    indices = alphabet.byte_lookup[lowered]
+    in_alphabet = indices != engine.NOT_IN_ALPHABET
+    tables = []
+    for substitute in (encrypt, decrypt):
+        output = np.atleast_2d(substitute(indices[in_alphabet].astype(np.int64)))
+        if output.size and output.max() >= engine.LOOKUP_SIZE:
+            return None
+        table = np.tile(lowered, [len(output), 1])
+        table[:, in_alphabet] = output
+        table.flags.writeable = False
+        tables.append(table)
+    in_alphabet.flags.writeable = False
+
+    return TranslationTables(tables[0], tables[1], in_alphabet, alphabet_phases)
@@ -0,0 +1,293 @@
+from abc import abstractmethod, ABCMeta
+
+import numpy as np
+
+import batch
+import engine
+from bifid import Bifid
+from caesar import Caesar
+from ciphertext import as_text
+from one_time_pad import OneTimePad
+from trifid import Trifid
+from vigenere import Vigenere
+
+
+class KeyConstraint(object):
+    """
+    What a crib at a known position implies about the keys of a cipher for one ciphertext.
+    Keys are checked against it without decrypting: a key it rejects cannot produce the crib, while a key it admits
+    still has to be confirmed on its decryption (see search.Crib)
+    """
+
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def admits(self, keys):
+        """
+        Parameters
+        ----------
+        keys (sequence): keys to check
+
+        Returns
+        -------
+        (np.ndarray): boolean array, True where the key is consistent with the crib
+        """
+
+        pass
+
+    def filter(self, keys):
+        """
+        Parameters
+        ----------
+        keys (sequence): keys to check
+
+        Returns
+        -------
+        keys (list): the keys consistent with the crib, in order
+        """
+
+        keys = list(keys)
+        return [key for key, admitted in zip(keys, self.admits(keys)) if admitted]
+
+
+class ShiftConstraint(KeyConstraint):
+    """
+    The rotation of a caesar cipher implied by a crib: every crib character gives it directly
+    """
+
+    def __init__(self, alphabet, ciphertext, crib):
+        """
+        Parameters
+        ----------
+        alphabet (Alphabet): alphabet of the cipher
+        ciphertext (string): ciphertext
+        crib (search.Crib): known plaintext at a known position of the decryption
+        """
+
+        self.num_alphabet_chars = len(alphabet)
+        self.shift = None  # the rotation implied by the crib, None if there is none
+        self._any_shift = False  # the crib has no alphabet characters, but matches
+        aligned = _aligned_indices(alphabet, ciphertext, crib)
+        if aligned is None:
+            return
+
+        c_ids, p_ids = aligned[:2]
+        shifts = np.unique((c_ids.astype(np.int64) - p_ids) % self.num_alphabet_chars)
+        self.shift = int(shifts[0]) if len(shifts) == 1 else None
+        self._any_shift = not len(shifts)
+
+    def admits(self, keys):
+        shifts = np.asarray(list(keys), dtype=np.int64)
+        if self._any_shift:
+            return np.ones(len(shifts), dtype=bool)
+        if self.shift is None:
+            return np.zeros(len(shifts), dtype=bool)
+
+        return shifts % self.num_alphabet_chars == self.shift
+
+
+class KeywordConstraint(KeyConstraint):
+    """
+    The key characters of a periodic polyalphabetic cipher (Vigenere, one time pad) implied by a crib.
+    Each crib character allows a set of key characters at its key phase (a single one for a latin square
+    tableau), so a key is checked with one lookup per crib character, and the crib fixes part of every key of
+    a given length (see partial_key)
+    """
+
+    def __init__(self, alphabet, ciphertext, crib, allowed, alphabet_phases, lower_keys):
+        """
+        Parameters
+        ----------
+        alphabet (Alphabet): alphabet of the text and the key
+        ciphertext (string): ciphertext
+        crib (search.Crib): known plaintext at a known position of the decryption
+        allowed (function): maps the alphabet indices of aligned ciphertext and crib characters to a
+            num_chars x len(alphabet) boolean array of the key characters decrypting one to the other
+        alphabet_phases (boolean): the key only advances on characters within the alphabet
+        lower_keys (boolean): the cipher lowercases its keys
+        """
+
+        self.alphabet = alphabet
+        self.lower_keys = lower_keys
+        self.phases = None  # key phase of each crib character within the alphabet, None if the crib cannot match
+        self.allowed = None  # num_chars x len(alphabet), allowed key characters at each of those phases
+
+        aligned = _aligned_indices(alphabet, ciphertext, crib)
+        if aligned is None:
+            return
+
+        c_ids, p_ids, positions, mask = aligned
+        self.phases = np.cumsum(mask)[positions] - 1 if alphabet_phases else positions
+        self.allowed = allowed(c_ids.astype(np.int64), p_ids.astype(np.int64))
+
+    @property
+    def key_stream(self):
+        """
+        (string): the key character implied at each crib character within the alphabet ('?' where several or none
+            are), e.g., the keystream under the crib
+        """
+
+        if self.allowed is None:
+            return None
+        return ''.join(self.alphabet[i] if n == 1 else '?'
+                       for i, n in zip(np.argmax(self.allowed, axis=1), self.allowed.sum(axis=1)))
+
+    def partial_key(self, period, fill='?'):
+        """
+        Parameters
+        ----------
+        period (int): key length
+        fill (char): placeholder for the key characters the crib does not determine
+
+        Returns
+        -------
+        key (string): the key characters the crib determines for this period, or None if no key of this
+            length is consistent with the crib
+        """
+
+        if self.allowed is None:
+            return None
+
+        allowed = np.ones([period, len(self.alphabet)], dtype=bool)
+        np.logical_and.at(allowed, self.phases % period, self.allowed)
+        if not np.all(np.any(allowed, axis=1)):
+            return None
+
+        return ''.join(self.alphabet[i] if n == 1 else fill for i, n in zip(np.argmax(allowed, axis=1),
+                                                                             allowed.sum(axis=1)))
+
+    def admits(self, keys):
+        keys = list(keys)
+        if self.allowed is None:
+            return np.zeros(len(keys), dtype=bool)
+        if not keys:
+            return np.zeros(0, dtype=bool)
+
+        keys = batch.Batch(keys, lower=self.lower_keys)
+        ids = self.alphabet.indices(keys.codes)
+        # keys that are empty or have characters outside the alphabet do not decrypt at all
+        invalid_counts = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(ids == engine.NOT_IN_ALPHABET, out=invalid_counts[1:])
+        valid = (np.diff(invalid_counts[keys.offsets]) == 0) & (keys.lengths > 0)
+        if not len(self.phases) or not len(ids):
+            return valid
+
+        lengths = np.maximum(keys.lengths, 1)[:, np.newaxis]
+        key_positions = np.minimum(keys.offsets[:-1, np.newaxis] + self.phases % lengths, max(len(ids) - 1, 0))
+        key_ids = np.minimum(ids[key_positions], len(self.alphabet) - 1)
+        consistent = self.allowed[np.arange(len(self.phases)), key_ids]
+
+        return valid & np.all(consistent, axis=1)
+
+
+class FractionationConstraint(KeyConstraint):
+    """
+    The periods of a Delastelle cipher (bifid, trifid) consistent with a crib for a fixed tableau.
+    Each coordinate of a plaintext character is read from one ciphertext character, so a period is checked by
+    comparing only the coordinates that feed the crib slice with those of the crib characters
+    """
+
+    def __init__(self, cells, cell_coordinates, ciphertext, crib):
+        """
+        Parameters
+        ----------
+        cells (Alphabet): maps characters to flat cell indices (see fractionation.build_cell_lookup)
+        cell_coordinates (np.ndarray): num_cells x depth table of the coordinates of each cell
+        ciphertext (string): ciphertext (characters outside the tableau are removed, like the ciphers do)
+        crib (search.Crib): known plaintext at a known position of the decryption
+        """
+
+        cell_ids = cells.indices(engine.to_codes(as_text(ciphertext).lower()))
+        self.coords = cell_coordinates[cell_ids[cell_ids != engine.NOT_IN_ALPHABET]]
+        crib_ids = cells.indices(engine.to_codes(crib.text))
+        self.positions = crib.position + np.arange(len(crib_ids))
+        self.crib_coords = None  # None if the crib cannot match whatever the period
+        if not np.any(crib_ids == engine.NOT_IN_ALPHABET) and crib.position + len(crib_ids) <= len(self.coords):
+            self.crib_coords = cell_coordinates[crib_ids]
+
+    def admits(self, keys):
+        periods = np.asarray(list(keys), dtype=np.int64)
+        if self.crib_coords is None:
+            return np.zeros(len(periods), dtype=bool)
+
+        num_chars, depth = self.coords.shape
+        # the block of each crib character under each period, as in fractionation.unfractionate: coordinate d of
+        # the character at offset o of a block of length n is flat coordinate d*n + o of the block
+        period = np.maximum(periods, 1)[:, np.newaxis, np.newaxis]
+        positions = self.positions[np.newaxis, :, np.newaxis]
+        axes = np.arange(depth)[np.newaxis, np.newaxis, :]
+        block_start = positions // period * period
+        block_len = np.minimum(period, num_chars - block_start)
+        sources = block_start * depth + axes * block_len + positions - block_start
+        consistent = self.coords[sources // depth, sources % depth] == self.crib_coords
+
+        return (periods >= 1) & np.all(consistent.reshape(len(periods), -1), axis=1)
+
+
+def key_constraint(cipher, ciphertext, crib):
+    """
+    Parameters:
+        cipher (Cipher): cipher the keys are for, decrypting with its default arguments
+        ciphertext (string or CipherText): ciphertext
+        crib (search.Crib): known plaintext
+
+    Returns:
+        (KeyConstraint): constraint of the crib on the keys, or None if the crib has no fixed position or the
+            cipher has no constraint
+    """
+
+    if crib.position is None:
+        return None
+    ciphertext = as_text(ciphertext)
+
+    if isinstance(cipher, Caesar):
+        return ShiftConstraint(cipher._alphabet, ciphertext, crib)
+    if isinstance(cipher, Vigenere):
+        tableau = cipher.vtableau
+        num_alphabet_chars = len(tableau._alphabet)
+        # decrypt_indices(c, k) for every key character k, compared with the crib
+        allowed = lambda c_ids, p_ids: tableau._inverse[:num_alphabet_chars, c_ids].T == p_ids[:, np.newaxis]
+        return KeywordConstraint(tableau._alphabet, ciphertext, crib, allowed, alphabet_phases=True, lower_keys=True)
+    if isinstance(cipher, OneTimePad):
+        num_alphabet_chars = len(cipher._alphabet)
+        key_ids = np.arange(num_alphabet_chars)
+        allowed = lambda c_ids, p_ids: (c_ids - p_ids)[:, np.newaxis] % num_alphabet_chars == key_ids
+        return KeywordConstraint(cipher._alphabet, ciphertext, crib, allowed, alphabet_phases=False,
+                                 lower_keys=False)
+    if isinstance(cipher, Bifid):
+        return FractionationConstraint(cipher.tableau._alphabet, cipher.tableau._cell_coordinates, ciphertext, crib)
+    if isinstance(cipher, Trifid):
+        return FractionationConstraint(cipher.cube._alphabet, cipher.cube._cell_coordinates, ciphertext, crib)
+
+    return None
+
+
+def _aligned_indices(alphabet, ciphertext, crib):
+    """
+    Align the crib with the ciphertext characters under it, for substitutions that keep every character in place
+
+    Parameters:
+        alphabet (Alphabet): alphabet of the cipher
+        ciphertext (string): ciphertext
+        crib (search.Crib): known plaintext at a known position
+
+    Returns:
+        None if the crib cannot match (it runs past the end, or a foreign character differs), else
+        c_ids, p_ids (np.ndarray): alphabet indices of the ciphertext and crib characters within the alphabet
+        positions (np.ndarray): position of those characters in the text
+        mask (np.ndarray): True where a ciphertext character is within the alphabet
+    """
+
+    codes, indices, mask = alphabet.encode(ciphertext.lower())
+    crib_codes = engine.to_codes(crib.text)
+    crib_ids = alphabet.indices(crib_codes)
+    crib_mask = crib_ids != engine.NOT_IN_ALPHABET
+    window = slice(crib.position, crib.position + len(crib_codes))
+
+    # foreign characters decrypt to themselves, alphabet characters to alphabet characters
+    if (crib.position + len(crib_codes) > len(codes) or not np.array_equal(mask[window], crib_mask)
+            or not np.array_equal(codes[window][~crib_mask], crib_codes[~crib_mask])):
+        return None
+
+    positions = np.arange(crib.position, crib.position + len(crib_codes))[crib_mask]
+    return indices[window][crib_mask], crib_ids[crib_mask], positions, mask
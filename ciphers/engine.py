@@ -0,0 +1,164 @@
+import numpy as np
+
+NOT_IN_ALPHABET = 255  # lookup table sentinel for characters outside the alphabet
+LOOKUP_SIZE = 256
+BLOCK_SIZE = 1 << 20  # bytes transformed at a time by keyed_blocks
+
+# lowercases ASCII letters and leaves every other byte alone, like str.lower
+LOWER_TABLE = np.arange(LOOKUP_SIZE, dtype=np.uint8)
+LOWER_TABLE[ord('A'):ord('Z') + 1] += ord('a') - ord('A')
+LOWER_TABLE.flags.writeable = False
+
+
+def to_codes(text):
+    """
+    Convert text to a writable array of character codes
+
+    Parameters:
+        text (string): byte string or unicode text
+
+    Returns:
+        codes (np.ndarray): uint8 codes for byte strings, uint32 code points for unicode
+    """
+
+    if isinstance(text, bytes):
+        return np.frombuffer(text, dtype=np.uint8).copy()
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).copy()
+
+
+def render(codes, like):
+    """
+    Convert an array of character codes back to text
+
+    Parameters:
+        codes (np.ndarray): character codes
+        like (string): text whose type (byte string or unicode) the result should have
+
+    Returns:
+        text (string)
+    """
+
+    if isinstance(like, bytes):
+        return codes.astype(np.uint8).tostring()
+    return codes.astype(np.uint32).tostring().decode('utf-32-le')
+
+
+def build_lookup(alphabet):
+    """
+    Build a table mapping character codes to alphabet indices
+
+    Parameters:
+        alphabet (string): alphabet characters (fewer than 255)
+
+    Returns:
+        lookup (np.ndarray): uint8 table of alphabet indices, NOT_IN_ALPHABET for foreign characters.
+            Covers at least the 256 byte values. Duplicate characters resolve to their first index, like str.index
+    """
+
+    if len(alphabet) >= NOT_IN_ALPHABET:
+        raise ValueError("alphabet is too large for a uint8 lookup table")
+
+    alphabet_codes = to_codes(alphabet)
+    size = max(LOOKUP_SIZE, int(alphabet_codes.max()) + 1 if len(alphabet_codes) else 0)
+    lookup = np.full(size, NOT_IN_ALPHABET, dtype=np.uint8)
+    # assign in reverse so the first occurrence of a duplicated character wins
+    lookup[alphabet_codes[::-1]] = np.arange(len(alphabet_codes), dtype=np.uint8)[::-1]
+    lookup.flags.writeable = False
+
+    return lookup
+
+
+def lookup_indices(codes, lookup):
+    """
+    Map character codes to alphabet indices
+
+    Parameters:
+        codes (np.ndarray): character codes
+        lookup (np.ndarray): table from build_lookup
+
+    Returns:
+        indices (np.ndarray): uint8 alphabet indices, NOT_IN_ALPHABET for foreign characters
+    """
+
+    if codes.dtype == np.uint8 and len(lookup) == LOOKUP_SIZE:
+        return lookup[codes]
+
+    in_range = codes < len(lookup)
+    indices = np.full(len(codes), NOT_IN_ALPHABET, dtype=np.uint8)
+    indices[in_range] = lookup[codes[in_range]]
+
+    return indices
+
+
+def rotate(key, offset):
+    """
+    Parameters:
+        key (string): periodic key
+        offset (int): number of key characters already used
+
+    Returns:
+        key (string): key starting at the character that follows `offset` characters of use
+    """
+
+    offset %= len(key)
+    return key[offset:] + key[:offset]
+
+
+def buffer_codes(data):
+    """
+    View a bytes-like object as an array without copying
+
+    Parameters:
+        data (bytes, bytearray, memoryview, mmap or np.ndarray): binary data
+
+    Returns:
+        codes (np.ndarray): uint8 view of the data (writable when the data is)
+    """
+
+    if isinstance(data, (memoryview, np.ndarray)):
+        return np.asarray(data, dtype=np.uint8).reshape(-1)
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def prepare_output(src, out):
+    """
+    Parameters:
+        src (np.ndarray): input codes
+        out (writable bytes-like or None): caller supplied output buffer
+
+    Returns:
+        out (writable bytes-like): the supplied buffer, or a new bytearray of the input length
+        dst (np.ndarray): writable uint8 view of out
+    """
+
+    if out is None:
+        out = bytearray(len(src))
+    dst = buffer_codes(out)
+    if len(dst) != len(src):
+        raise ValueError("output buffer length does not match the input")
+    if not dst.flags.writeable:
+        raise ValueError("output buffer is read-only")
+
+    return out, dst
+
+
+def keyed_blocks(src, dst, key_codes):
+    """
+    Split a buffer and its output into blocks paired with the repeating key, so large buffers never need a key
+    tiled to their full length
+
+    Parameters:
+        src (np.ndarray): input codes
+        dst (np.ndarray): output codes, same length as src (may be src itself)
+        key_codes (np.ndarray): codes of the repeating key
+
+    Returns:
+        generator of (src block, dst block, key block) with the key aligned to each block's position
+    """
+
+    key_len = len(key_codes)
+    block_len = max(1, BLOCK_SIZE // key_len) * key_len  # whole key repetitions keep blocks aligned
+    key_block = np.tile(key_codes, min(block_len, len(src) + key_len) // key_len)
+    for start in xrange(0, len(src), block_len):
+        stop = min(start + block_len, len(src))
+        yield src[start:stop], dst[start:stop], key_block[:stop - start]
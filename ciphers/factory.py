@@ -0,0 +1,96 @@
+import numpy as np
+
+from alphabet import Alphabet
+from bifid import PolybiusSquare
+from cache import LRUCache
+from trifid import Cube
+from vigenere import VigenereTableau
+
+MAX_TABLEAUS = 256  # tableaus, squares and cubes kept built
+
+_tableaus = LRUCache(MAX_TABLEAUS)
+
+
+def vigenere_tableau(alphabet=None, row_fill=0, col_fill=0):
+    """
+    Parameters:
+        alphabet (string or Alphabet): alphabet characters
+        row_fill (int): number of extra rows to append (cycling through alphabet)
+        col_fill (int): number of extra cols to append (cycling through alphabet)
+
+    Returns:
+        (VigenereTableau): shared, read-only tableau (see VigenereTableau)
+    """
+
+    key = (VigenereTableau, _lower(alphabet), row_fill, col_fill)
+    return _tableaus.get(key, lambda: _freeze(VigenereTableau(alphabet, row_fill, col_fill)))
+
+
+def polybius_square(alphabet=None, char_map=('j','i')):
+    """
+    Parameters:
+        alphabet (string): 25 character string (row ordered) to form 5 x 5 grid
+        char_map (character pair): map char [0] -> [1]
+
+    Returns:
+        (PolybiusSquare): shared, read-only square (see PolybiusSquare)
+    """
+
+    char_map = (char_map[0].lower(), char_map[1].lower())
+    key = (PolybiusSquare, _lower(alphabet), char_map)
+    return _tableaus.get(key, lambda: _freeze(PolybiusSquare(alphabet, char_map)))
+
+
+def cube(alphabet=None):
+    """
+    Parameters:
+        alphabet (string): character string (layer-row-column ordered) with length a cube of the size
+
+    Returns:
+        (Cube): shared, read-only cube (see Cube)
+    """
+
+    key = (Cube, _lower(alphabet))
+    return _tableaus.get(key, lambda: _freeze(Cube(alphabet)))
+
+
+def stats():
+    """
+    Returns:
+        (dict): hits, misses, size and maxsize of the tableau cache
+    """
+
+    return _tableaus.stats()
+
+
+def clear():
+    _tableaus.clear()
+
+
+def _lower(alphabet):
+    """
+    Returns:
+        cache key of an alphabet: lowercased characters, or an Alphabet as is (Alphabets compare by their characters)
+    """
+
+    if alphabet is None or isinstance(alphabet, Alphabet):
+        return alphabet
+    return alphabet.lower()
+
+
+def _freeze(tableau):
+    """
+    Make the arrays of a tableau read-only, as it is shared by every caller with the same parameters
+
+    Parameters:
+        tableau (object): built tableau, square or cube
+
+    Returns:
+        tableau (object): the same tableau
+    """
+
+    for value in vars(tableau).itervalues():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+
+    return tableau
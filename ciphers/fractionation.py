@@ -0,0 +1,403 @@
+import numpy as np
+
+import engine
+from alphabet import Alphabet
+from cipher import Cipher
+from ciphertext import CipherText
+
+
+def fractionate(coords, period):
+    """
+    Fractionate a whole message at once as in the Delastelle ciphers (bifid, trifid)
+
+    Within each block of `period` characters, the coordinates of the plaintext characters are written as `depth`
+    rows of the block length and read out row by row; each consecutive group of `depth` values gives the
+    coordinates of a ciphertext character. The final block may be shorter than the period.
+
+    Parameters:
+        coords (np.ndarray): num_chars x depth coordinates of the plaintext characters
+        period (int): period of the cipher
+
+    Returns:
+        coords (np.ndarray): num_chars x depth coordinates of the ciphertext characters
+    """
+
+    num_chars, depth = coords.shape
+    num_block_chars = (num_chars // period) * period  # characters within complete blocks
+
+    cipher_coords = np.empty_like(coords)
+    blocks = coords[:num_block_chars].reshape([-1, period, depth])
+    cipher_coords[:num_block_chars] = blocks.transpose([0, 2, 1]).reshape([num_block_chars, depth])
+    tail = coords[num_block_chars:]
+    cipher_coords[num_block_chars:] = tail.T.reshape([-1, depth])
+
+    return cipher_coords
+
+
+def unfractionate(coords, period):
+    """
+    Undo the fractionation of the Delastelle ciphers (bifid, trifid) for a whole message at once
+
+    Within each block of `period` characters, the coordinates of the ciphertext characters are read out in
+    order and laid back down as `depth` rows of the block length; column t of those rows holds the coordinates
+    of plaintext character t. The final block may be shorter than the period.
+
+    Parameters:
+        coords (np.ndarray): num_chars x depth coordinates of the ciphertext characters
+        period (int): period of the cipher
+
+    Returns:
+        coords (np.ndarray): num_chars x depth coordinates of the plaintext characters
+    """
+
+    num_chars, depth = coords.shape
+    num_block_chars = (num_chars // period) * period  # characters within complete blocks
+    flat_coords = coords.ravel()
+
+    plain_coords = np.empty_like(coords)
+    blocks = flat_coords[:num_block_chars*depth].reshape([-1, depth, period])
+    plain_coords[:num_block_chars] = blocks.transpose([0, 2, 1]).reshape([num_block_chars, depth])
+    tail = flat_coords[num_block_chars*depth:].reshape([depth, -1])
+    plain_coords[num_block_chars:] = tail.T
+
+    return plain_coords
+
+
+def build_cell_lookup(alphabet, shape, char_map=None):
+    """
+    Build the immutable lookup tables of a tableau (polybius square, cube) laid out row-major from its alphabet
+
+    Parameters:
+        alphabet (string): characters of the tableau cells in row-major order
+        shape (tuple of int): dimensions of the tableau
+        char_map (character pair): map char [0] -> [1] before lookup
+
+    Returns:
+        alphabet (Alphabet): maps characters to flat cell indices
+        cell_coordinates (np.ndarray): num_cells x depth table of the coordinates of each cell
+        cell_codes (np.ndarray): table of shape `shape` holding the character code of each cell
+    """
+
+    cells = Alphabet(alphabet, [char_map] if char_map is not None else None)
+
+    cell_coordinates = np.column_stack(np.unravel_index(np.arange(len(alphabet)), shape)).astype(np.uint8)
+    cell_coordinates.flags.writeable = False
+    cell_codes = engine.to_codes(alphabet).reshape(shape)
+    cell_codes.flags.writeable = False
+
+    return cells, cell_coordinates, cell_codes
+
+
+def encode(text, cells, cell_coordinates):
+    """
+    Parameters:
+        text (string): characters to look up
+        cells (Alphabet): maps characters to flat cell indices
+        cell_coordinates (np.ndarray): num_cells x depth table of the coordinates of each cell
+
+    Returns:
+        coords (np.ndarray): num_chars x depth coordinates of the characters within the tableau
+    """
+
+    cell_ids = cells.indices(engine.to_codes(text))
+    if np.any(cell_ids == engine.NOT_IN_ALPHABET):
+        raise ValueError("text contains characters outside the tableau")
+
+    return cell_coordinates[cell_ids]
+
+
+def decode(coords, cell_codes, like=None):
+    """
+    Parameters:
+        coords (np.ndarray): num_chars x depth coordinates of characters within the tableau
+        cell_codes (np.ndarray): table holding the character code of each cell
+        like (string): text whose type (byte string or unicode) the result should have (default: the type of the
+            tableau characters); a byte string when a cell is not a byte gives unicode
+
+    Returns:
+        text (string): characters at the coordinates
+    """
+
+    coords = np.asarray(coords)
+    if like is None:
+        like = b'' if cell_codes.dtype == np.uint8 else u''
+    elif isinstance(like, bytes) and cell_codes.size and int(cell_codes.max()) >= engine.LOOKUP_SIZE:
+        like = u''  # a cell of the tableau is not a byte
+    return engine.render(cell_codes[tuple(coords.T)], like)
+
+
+def transform_codes(codes, period, decrypt, cells, cell_coordinates, cell_codes):
+    """
+    Fractionate (or unfractionate) a text held as character codes, without rendering it
+
+    Parameters:
+        codes (np.ndarray): lowercased character codes; characters outside the tableau are removed
+        period (int): period of the cipher
+        decrypt (boolean): unfractionate rather than fractionate
+        cells (Alphabet): maps characters to flat cell indices (see build_cell_lookup)
+        cell_coordinates (np.ndarray): num_cells x depth table of the coordinates of each cell
+        cell_codes (np.ndarray): table holding the character code of each cell
+
+    Returns:
+        codes (np.ndarray): character codes of the output
+    """
+
+    cell_ids = cells.indices(codes)
+    coords = cell_coordinates[cell_ids[cell_ids != engine.NOT_IN_ALPHABET]]
+    coords = unfractionate(coords, period) if decrypt else fractionate(coords, period)
+
+    return cell_codes[tuple(coords.T)]
+
+
+def cell_text(text, normalized, coords, cells, cell_codes):
+    """
+    Parameters:
+        text (string or CipherText): input of a cipher operation
+        normalized (IndexedText): the normalized input
+        coords (np.ndarray): num_chars x depth coordinates of the output characters within the tableau
+        cells (Alphabet): maps characters to flat cell indices (see build_cell_lookup)
+        cell_codes (np.ndarray): table holding the character code of each cell
+
+    Returns:
+        output (CipherText if the input was one, else string of the type of the input): characters at the
+            coordinates
+    """
+
+    if isinstance(text, CipherText):
+        cell_ids = np.ravel_multi_index(tuple(np.asarray(coords, dtype=np.intp).T), cell_codes.shape)
+        return CipherText.from_normalized(normalized, cells, cell_ids, include_foreign_chars=False)
+
+    return decode(coords, cell_codes, text[:0])
+
+
+class FractionationCipher(Cipher):
+    """
+    Base of the Delastelle ciphers (bifid, trifid): the characters of the text are replaced by their coordinates in
+    a tableau, which are fractionated by blocks of the period (the key) and read back as characters.
+    The tableau (PolybiusSquare, Cube) provides normalizer, _alphabet, _cell_coordinates and cell_codes
+    """
+
+    def __init__(self, tableau):
+        super(FractionationCipher, self).__init__()
+        self._tableau = tableau
+
+    def encrypt(self, text, key):
+        """
+        Parameters:
+            text (string or CipherText): plaintext
+            key (int): period for encryption
+
+        Note: foreign characters are removed
+
+        Returns:
+            ciphertext (string, or CipherText for a CipherText text)
+        """
+
+        plaintext = self._tableau.normalizer(text)
+        coords = fractionate(self._tableau._cell_coordinates[plaintext.indices], key)
+
+        return cell_text(text, plaintext, coords, self._tableau._alphabet, self._tableau.cell_codes)
+
+    def decrypt(self, text, key):
+        """
+        Parameters:
+            text (string or CipherText): ciphertext
+            key (int): period for decryption
+
+        Note: foreign characters are removed
+
+        Returns:
+            plaintext (string, or CipherText for a CipherText text)
+        """
+
+        ciphertext = self._tableau.normalizer(text)
+        coords = unfractionate(self._tableau._cell_coordinates[ciphertext.indices], key)
+
+        return cell_text(text, ciphertext, coords, self._tableau._alphabet, self._tableau.cell_codes)
+
+    def decrypt_many(self, text, keys=None):
+        """
+        Decrypt one ciphertext under many periods, looking up the ciphertext coordinates once
+
+        Parameters:
+            text (string or CipherText): ciphertext
+            keys (iterable of int): periods for decryption (default: every period up to the message length)
+
+        Note: foreign characters are removed
+
+        Returns:
+            candidates (np.ndarray): num_keys x num_chars array of plaintext character codes
+        """
+
+        ciphertext = self._tableau.normalizer(text)
+        if keys is None:
+            keys = xrange(1, len(ciphertext.indices) + 1)
+        keys = list(keys)
+
+        coords = self._tableau._cell_coordinates[ciphertext.indices]
+        candidates = np.empty([len(keys), len(coords)], dtype=self._tableau.cell_codes.dtype)
+        for i_key, period in enumerate(keys):
+            plain_coords = unfractionate(coords, period)
+            candidates[i_key] = self._tableau.cell_codes[tuple(plain_coords.T)]
+
+        return candidates
+
+    def _transform_codes(self, codes, key, decrypt):
+        tableau = self._tableau
+        return transform_codes(codes, key, decrypt, tableau._alphabet, tableau._cell_coordinates, tableau.cell_codes)
+
+    def _stream(self, func, chunks, key, kwargs):
+        """
+        Only transform complete period blocks, carrying the partial block over to the next chunk
+        """
+
+        pending = ''
+        for chunk in chunks:
+            pending += self._normalize(chunk)
+            num_block_chars = (len(pending) // key) * key
+            if num_block_chars:
+                yield func(pending[:num_block_chars], key, **kwargs)
+                pending = pending[num_block_chars:]
+        if pending:
+            yield func(pending, key, **kwargs)
+
+    def _normalize(self, text):
+        """
+        Parameters:
+            text (string): text to normalize
+
+        Returns:
+            text (string): lowercased text with foreign characters removed
+        """
+
+        return self._tableau.normalizer(text).text
+
+
+class IncrementalDecryption(object):
+    """
+    Decryption of a fixed ciphertext under a changing tableau layout, rescored incrementally.
+    Swapping two cells only changes the plaintext characters that read a coordinate of either symbol, or that land
+    on either cell, so a swap recomputes those positions and the n-gram windows covering them
+    """
+
+    def __init__(self, symbol_ids, shape, period, scorer, symbol_letters, symbol_at):
+        """
+        Parameters:
+            symbol_ids (np.ndarray): ciphertext as symbol ids (0 to num_cells - 1)
+            shape (tuple of int): dimensions of the tableau
+            period (int): period of the cipher
+            scorer (scoring.NgramTable): n-gram fitness; windows with a symbol that is not a letter score the floor
+            symbol_letters (np.ndarray): letter index of each symbol for the scorer
+                (engine.NOT_IN_ALPHABET for symbols that are not letters)
+            symbol_at (np.ndarray): symbol id at each flat cell index (initial layout)
+        """
+
+        self.shape = shape
+        self.period = period
+        self.scorer = scorer
+        self.symbol_letters = np.asarray(symbol_letters, dtype=np.uint8)
+        self._symbol_ids = np.asarray(symbol_ids, dtype=np.intp)
+        self._cell_coordinates = np.column_stack(np.unravel_index(np.arange(len(symbol_letters)), shape))
+        self._strides = np.asarray([int(np.prod(shape[d + 1:])) for d in xrange(len(shape))], dtype=np.intp)
+
+        num_chars, depth = len(self._symbol_ids), len(shape)
+        # flat coordinate index read for coordinate d of plaintext character t, and the ciphertext char it belongs to
+        self._sources = unfractionate(np.arange(num_chars * depth).reshape([num_chars, depth]), period)
+        self._source_symbols = self._symbol_ids[self._sources // depth]
+        self._source_axes = self._sources % depth
+        # plaintext positions reading a coordinate of each symbol
+        symbols = np.arange(len(symbol_letters))
+        self._dependents = np.any(self._source_symbols[np.newaxis, :, :] == symbols[:, np.newaxis, np.newaxis], axis=2)
+
+        self._pending = None
+        self.set_layout(symbol_at)
+
+    def set_layout(self, symbol_at):
+        """
+        Replace the whole layout and rescore from scratch
+
+        Parameters:
+            symbol_at (np.ndarray): symbol id at each flat cell index
+        """
+
+        self.symbol_at = np.array(symbol_at, dtype=np.intp)
+        self.cell_of = np.argsort(self.symbol_at)
+        self.plain_cells = self._plain_cells(np.arange(len(self._symbol_ids)), self.cell_of)
+        self.plain_letters = self.symbol_letters[self.symbol_at[self.plain_cells]]
+        self.window_scores = self.scorer.window_scores(self.plain_letters[np.newaxis, :], self.scorer.floor)[0]
+        self.score = float(self.window_scores.sum())
+        self._pending = None
+
+    def propose_swap(self, cell_a, cell_b):
+        """
+        Score the layout with two cells swapped without applying it (see commit)
+
+        Parameters:
+            cell_a (int): flat cell index
+            cell_b (int): flat cell index
+
+        Returns:
+            score (float): fitness of the proposed layout
+        """
+
+        symbol_a, symbol_b = self.symbol_at[cell_a], self.symbol_at[cell_b]
+        symbol_at = self.symbol_at.copy()
+        symbol_at[cell_a], symbol_at[cell_b] = symbol_b, symbol_a
+        cell_of = self.cell_of.copy()
+        cell_of[symbol_a], cell_of[symbol_b] = cell_b, cell_a
+
+        affected_mask = self._dependents[symbol_a] | self._dependents[symbol_b]
+        affected_mask |= (self.plain_cells == cell_a) | (self.plain_cells == cell_b)
+        affected = np.flatnonzero(affected_mask)
+        plain_cells = self._plain_cells(affected, cell_of)
+        plain_letters = self.plain_letters.copy()
+        plain_letters[affected] = self.symbol_letters[symbol_at[plain_cells]]
+
+        # rescore the n-gram windows overlapping an affected position
+        num_windows = len(self.window_scores)
+        window_mask = np.zeros(num_windows, dtype=bool)
+        for offset in xrange(self.scorer.n):
+            window_mask |= affected_mask[offset:offset + num_windows]
+        windows = np.flatnonzero(window_mask)
+        window_letters = plain_letters[windows[:, np.newaxis] + np.arange(self.scorer.n)[np.newaxis, :]]
+        window_scores = np.zeros(0)
+        if len(windows):
+            window_scores = self.scorer.window_scores(window_letters, self.scorer.floor)[:, 0]
+        score = self.score + float(window_scores.sum() - self.window_scores[windows].sum())
+
+        self._pending = (symbol_at, cell_of, affected, plain_cells, plain_letters, windows, window_scores, score)
+        return score
+
+    def commit(self):
+        """
+        Apply the last proposed swap
+        """
+
+        symbol_at, cell_of, affected, plain_cells, plain_letters, windows, window_scores, score = self._pending
+        self.symbol_at, self.cell_of, self.plain_letters, self.score = symbol_at, cell_of, plain_letters, score
+        self.plain_cells[affected] = plain_cells
+        self.window_scores[windows] = window_scores
+        self._pending = None
+
+    def plain_symbols(self):
+        """
+        Returns:
+            symbol_ids (np.ndarray): plaintext as symbol ids under the current layout
+        """
+
+        return self.symbol_at[self.plain_cells]
+
+    def _plain_cells(self, positions, cell_of):
+        """
+        Parameters:
+            positions (np.ndarray): plaintext positions
+            cell_of (np.ndarray): flat cell index of each symbol
+
+        Returns:
+            cells (np.ndarray): flat cell index of the plaintext character at each position
+        """
+
+        source_cells = cell_of[self._source_symbols[positions]]
+        coords = self._cell_coordinates[source_cells, self._source_axes[positions]]
+
+        return coords.dot(self._strides)
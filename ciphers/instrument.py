@@ -0,0 +1,242 @@
+import cProfile
+from functools import wraps
+import pstats
+import sys
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import compiled
+import engine
+import fractionation
+import normalize
+from alphabet import Alphabet
+from cipher import Cipher
+
+# cipher entry points that are counted per call
+METHODS = ('encrypt', 'decrypt', 'decrypt_many', 'encrypt_bytes', 'decrypt_bytes')
+
+# phase -> (owner, attribute) of the functions doing that work; transform is the rest of a cipher call
+PHASES = (
+    ('normalize', ((normalize.Normalizer, '__call__'),)),
+    ('index', ((engine, 'to_codes'), (engine, 'lookup_indices'), (engine, 'buffer_codes'), (Alphabet, 'indices'),
+               (Alphabet, 'encode'), (Alphabet, 'key_indices'), (fractionation, 'encode'))),
+    ('render', ((engine, 'render'), (fractionation, 'decode'))),
+)
+
+_active = []  # the session currently patched in, if any
+
+
+class Session(object):
+    """
+    Opt-in instrumentation of the ciphers, used as a context manager.
+    While a session is active, the cipher entry points and the functions of each phase are replaced by timing
+    wrappers, which are removed again on exit, so nothing is added to the calls of an uninstrumented program.
+    Sessions are not thread safe and only one can be active at a time
+    """
+
+    def __init__(self, profile=False, trace_memory=False):
+        """
+        Parameters
+        ----------
+        profile (bool): also run a cProfile session (see profile_stats)
+        trace_memory (bool): record peak memory with tracemalloc, or the peak resident set size where
+            tracemalloc is not available
+        """
+
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.profiler = None
+        self._patched = []  # (owner, attribute, original)
+        self.reset()
+
+    def __enter__(self):
+        if _active:
+            raise RuntimeError("an instrumentation session is already active")
+        _active.append(self)
+
+        for cls in _cipher_classes():
+            for name in METHODS:
+                if name in vars(cls):
+                    self._patch(cls, name, self._wrap_call(name, vars(cls)[name]))
+        for phase, functions in PHASES:
+            for owner, name in functions:
+                self._patch(owner, name, self._wrap_phase(phase, vars(owner)[name]))
+
+        if self.trace_memory:
+            self._start_memory()
+        if self.profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.trace_memory:
+            self._stop_memory()
+        for owner, name, original in reversed(self._patched):
+            setattr(owner, name, original)
+        del self._patched[:]
+        _active.remove(self)
+
+    def reset(self):
+        """
+        Clear the counters
+        """
+
+        self._calls = {}  # 'Class.method' -> [calls, seconds, chars]
+        self._phases = dict((phase, [0, 0.]) for phase in ('normalize', 'index', 'transform', 'render'))
+        self._call_depth = 0
+        self._phase_depth = 0
+        self._phase_seconds = 0.  # phase time within the outermost cipher call in progress
+        self._peak_memory = None
+        self._memory_baseline = 0
+
+    def snapshot(self):
+        """
+        Returns
+        -------
+        (dict): calls: 'Class.method' -> dict of calls, seconds and chars (characters or bytes processed);
+            phases: phase -> dict of calls and seconds, for normalize, index, transform and render;
+            peak_memory_bytes: peak memory above the start of the session (None unless tracing memory)
+        """
+
+        calls = dict((name, dict(calls=calls, seconds=seconds, chars=chars))
+                     for name, (calls, seconds, chars) in self._calls.iteritems())
+        phases = dict((phase, dict(calls=calls, seconds=seconds))
+                      for phase, (calls, seconds) in self._phases.iteritems())
+        peak_memory = self._peak_memory
+        if self.trace_memory and _active and _active[0] is self:
+            peak_memory = self._memory_peak()
+
+        return dict(calls=calls, phases=phases, peak_memory_bytes=peak_memory)
+
+    def profile_stats(self, sort='cumulative'):
+        """
+        Parameters
+        ----------
+        sort (string): pstats sort key
+
+        Returns
+        -------
+        (pstats.Stats): statistics of the cProfile session
+        """
+
+        if self.profiler is None:
+            raise ValueError("the session was not created with profile=True")
+        return pstats.Stats(self.profiler).sort_stats(sort)
+
+    def _patch(self, owner, name, wrapper):
+        self._patched.append((owner, name, vars(owner)[name]))
+        setattr(owner, name, wrapper)
+
+    def _wrap_call(self, method, func):
+        """
+        Count the calls, time and input length of a cipher method, and attribute the time its outermost calls
+        spend outside the other phases to the transform phase
+        """
+
+        @wraps(func)
+        def wrapper(cipher, text, *args, **kwargs):
+            outermost = self._call_depth == 0
+            if outermost:
+                self._phase_seconds = 0.
+            self._call_depth += 1
+            start = default_timer()
+            try:
+                return func(cipher, text, *args, **kwargs)
+            finally:
+                seconds = default_timer() - start
+                self._call_depth -= 1
+                counter = self._calls.setdefault('%s.%s' % (type(cipher).__name__, method), [0, 0., 0])
+                counter[0] += 1
+                counter[1] += seconds
+                counter[2] += _length(text)
+                if outermost:
+                    transform = self._phases['transform']
+                    transform[0] += 1
+                    transform[1] += max(seconds - self._phase_seconds, 0.)
+
+        return wrapper
+
+    def _wrap_phase(self, phase, func):
+        """
+        Count the calls and time of a phase function; calls nested within another phase count towards the outer one
+        """
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if self._phase_depth:
+                return func(*args, **kwargs)
+            self._phase_depth += 1
+            start = default_timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = default_timer() - start
+                self._phase_depth -= 1
+                counter = self._phases[phase]
+                counter[0] += 1
+                counter[1] += seconds
+                if self._call_depth:
+                    self._phase_seconds += seconds
+
+        return wrapper
+
+    def _start_memory(self):
+        if tracemalloc is not None:
+            self._started_tracemalloc = not tracemalloc.is_tracing()
+            if self._started_tracemalloc:
+                tracemalloc.start()
+            self._memory_baseline = tracemalloc.get_traced_memory()[0]
+        elif resource is not None:
+            self._memory_baseline = _peak_rss()
+
+    def _stop_memory(self):
+        self._peak_memory = self._memory_peak()
+        if tracemalloc is not None and self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def _memory_peak(self):
+        if tracemalloc is not None:
+            return max(tracemalloc.get_traced_memory()[1] - self._memory_baseline, 0)
+        if resource is not None:
+            return max(_peak_rss() - self._memory_baseline, 0)
+        return None
+
+
+def _cipher_classes():
+    """
+    Returns:
+        (list of type): Cipher, every loaded subclass, and CompiledKey
+    """
+
+    classes, pending = [], [Cipher]
+    while pending:
+        cls = pending.pop()
+        if cls not in classes:
+            classes.append(cls)
+            pending.extend(cls.__subclasses__())
+
+    return classes + [compiled.CompiledKey]
+
+
+def _length(text):
+    try:
+        return len(text)
+    except TypeError:
+        return 0
+
+
+def _peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # kilobytes except on macOS
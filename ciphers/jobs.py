@@ -0,0 +1,311 @@
+import cPickle as pickle
+from collections import namedtuple
+import sqlite3
+import time
+
+import numpy as np
+
+import engine
+from keyspace import KeySpace
+from search import KeySearch
+from trifid import Trifid
+
+CHECKPOINT_KEYS = 1 << 16  # keys a search job searches between checkpoints
+CHECKPOINT_SECONDS = 60.  # seconds an annealing job runs between checkpoints
+
+Result = namedtuple('Result', ['job', 'score', 'params', 'key', 'plaintext', 'crib'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    progress BLOB NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    job TEXT NOT NULL,
+    score REAL,
+    key TEXT NOT NULL,
+    params TEXT,
+    data BLOB NOT NULL,
+    plaintext TEXT NOT NULL,
+    crib TEXT
+);
+CREATE INDEX IF NOT EXISTS results_job_score ON results (job, score);
+CREATE INDEX IF NOT EXISTS results_score ON results (score);
+CREATE INDEX IF NOT EXISTS results_key ON results (key);
+CREATE INDEX IF NOT EXISTS results_crib ON results (crib);
+"""
+
+_RANKING = " ORDER BY score IS NULL, score DESC, id"  # best score first, unscored results last, then as found
+
+
+class JobStore(object):
+    """
+    A SQLite file holding the progress of long running searches and an indexed table of their results.
+    A job's progress and the results found since its last checkpoint are written in one transaction, so a job
+    resumed after a crash or preemption neither repeats searched keys nor loses results.
+    Keys and params are stored as their repr (to query by) alongside a pickle of the objects
+    """
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path (string): database file, created if missing (':memory:' for a store that is not persisted)
+        """
+
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.text_factory = str  # plaintexts are byte strings, not necessarily utf-8
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def progress(self, job):
+        """
+        Parameters
+        ----------
+        job (string): job name
+
+        Returns
+        -------
+        progress (object): progress saved by the last checkpoint of the job, or None if it has not started
+        """
+
+        row = self._connection.execute("SELECT progress FROM jobs WHERE name = ?", (job,)).fetchone()
+        return pickle.loads(str(row[0])) if row is not None else None
+
+    def checkpoint(self, job, progress, results=(), replace=False, top_k=None):
+        """
+        Save the progress of a job and its new results atomically
+
+        Parameters
+        ----------
+        job (string): job name
+        progress (object): picklable progress to resume from
+        results (iterable of Result): results found since the last checkpoint
+        replace (boolean): the results replace those of the job (e.g., an updated top-K list) instead of adding up
+        top_k (int): keep only the job's best scored results, or None to keep all
+        """
+
+        rows = [(job, result.score, repr(result.key), repr(result.params) if result.params is not None else None,
+                 sqlite3.Binary(pickle.dumps((result.params, result.key), pickle.HIGHEST_PROTOCOL)),
+                 result.plaintext, result.crib) for result in results]
+        with self._connection:
+            if replace:
+                self._connection.execute("DELETE FROM results WHERE job = ?", (job,))
+            self._connection.executemany("INSERT INTO results (job, score, key, params, data, plaintext, crib) "
+                                         "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            if top_k is not None:
+                self._connection.execute("DELETE FROM results WHERE job = ? AND id NOT IN "
+                                         "(SELECT id FROM results WHERE job = ?" + _RANKING + " LIMIT ?)",
+                                         (job, job, top_k))
+            self._connection.execute("INSERT OR REPLACE INTO jobs (name, progress, updated) VALUES (?, ?, ?)",
+                                     (job, sqlite3.Binary(pickle.dumps(progress, pickle.HIGHEST_PROTOCOL)),
+                                      time.time()))
+
+    def results(self, job=None, min_score=None, key=None, crib=None, contains=None, limit=None):
+        """
+        Query the stored results, best score first
+
+        Parameters
+        ----------
+        job (string): only the results of this job
+        min_score (float): only results scoring at least this
+        key: only results with this key (compared by repr)
+        crib (string): only results that matched this crib (case insensitive)
+        contains (string): only results whose plaintext contains this text (case insensitive)
+        limit (int): maximum number of results
+
+        Returns
+        -------
+        list of Result
+        """
+
+        clauses, args = [], []
+        for clause, value in (("job = ?", job), ("score >= ?", min_score),
+                              ("key = ?", repr(key) if key is not None else None),
+                              ("crib = ?", crib.lower() if crib is not None else None),
+                              ("instr(plaintext, ?) > 0", contains.lower() if contains is not None else None)):
+            if value is not None:
+                clauses.append(clause)
+                args.append(value)
+
+        query = "SELECT job, score, data, plaintext, crib FROM results"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += _RANKING
+        if limit is not None:
+            query += " LIMIT ?"
+            args.append(limit)
+
+        results = []
+        for job_name, score, data, plaintext, crib_text in self._connection.execute(query, args):
+            params, result_key = pickle.loads(str(data))
+            results.append(Result(job_name, score, params, result_key, plaintext, crib_text))
+
+        return results
+
+    def reset(self, job):
+        """
+        Forget the progress and results of a job, so that it starts over
+
+        Parameters
+        ----------
+        job (string): job name
+        """
+
+        with self._connection:
+            self._connection.execute("DELETE FROM results WHERE job = ?", (job,))
+            self._connection.execute("DELETE FROM jobs WHERE name = ?", (job,))
+
+    def close(self):
+        self._connection.close()
+
+
+class SearchJob(object):
+    """
+    A key search (see search.KeySearch) run in blocks of its key space, checkpointing the key index reached after
+    each block together with the hits of the block; running the job again resumes from that index
+    """
+
+    def __init__(self, store, name, search, ciphertext, scorer=None, checkpoint_keys=CHECKPOINT_KEYS, top_k=None):
+        """
+        Parameters
+        ----------
+        store (JobStore): where progress and hits are saved
+        name (string): job name, unique within the store
+        search (search.KeySearch): search over a sliceable key space (a KeySpace, or a sequence)
+        ciphertext (string): ciphertext to decrypt
+        scorer (scoring.NgramTable): scores the hits (optional)
+        checkpoint_keys (int): keys searched between checkpoints
+        top_k (int): keep only the best scored hits, or None to keep every hit
+        """
+
+        self.store = store
+        self.name = name
+        self.search = search
+        self.ciphertext = ciphertext
+        self.scorer = scorer
+        self.checkpoint_keys = checkpoint_keys
+        self.top_k = top_k
+
+    @property
+    def size(self):
+        """
+        (int): number of keys in the key space
+        """
+
+        keyspace = self.search.keyspace
+        return keyspace.size if isinstance(keyspace, KeySpace) else len(keyspace)
+
+    @property
+    def position(self):
+        """
+        (int): index of the first key not searched yet
+        """
+
+        progress = self.store.progress(self.name)
+        return progress['position'] if progress is not None else 0
+
+    def run(self, max_seconds=None):
+        """
+        Search from the last checkpoint until the key space is exhausted or the time is up
+
+        Parameters
+        ----------
+        max_seconds (float): wall time after which no new block is started, or None
+
+        Returns
+        -------
+        position (int): index of the first key not searched yet (the size of the key space once done)
+        """
+
+        size = self.size
+        progress = self.store.progress(self.name)
+        if progress is not None and progress['size'] != size:
+            raise ValueError("job was started on a key space of a different size")
+        position = progress['position'] if progress is not None else 0
+
+        deadline = time.time() + max_seconds if max_seconds is not None else None
+        while position < size and (deadline is None or time.time() < deadline):
+            block = self.search.keyspace[position:position + self.checkpoint_keys]
+            search = KeySearch(self.search.cipher_factory, block, self.search.crib, self.search.processes,
+                               self.search.chunk_size, self.search.prune_keys)
+            results = [self._result(hit) for hit in search.run(self.ciphertext)]
+            position = min(position + self.checkpoint_keys, size)
+            self.store.checkpoint(self.name, dict(position=position, size=size), results, top_k=self.top_k)
+
+        return position
+
+    def _result(self, hit):
+        score = float(self.scorer.score(hit.plaintext)[0]) if self.scorer is not None else None
+        return Result(self.name, score, hit.params, hit.key, hit.plaintext, self.search.crib.text)
+
+
+class AnnealJob(object):
+    """
+    A trifid annealing search (see trifid_solver.TrifidSearch) checkpointed to a store: its progress (iterations,
+    random state, top-K heap) is saved at the end of the first cycle after every checkpoint_seconds, and its top-K
+    keys replace the job's results, keyed by (period, cube alphabet). Running the job again resumes from the last
+    checkpoint
+    """
+
+    def __init__(self, store, name, search, crib=None, checkpoint_seconds=CHECKPOINT_SECONDS):
+        """
+        Parameters
+        ----------
+        store (JobStore): where progress and results are saved
+        name (string): job name, unique within the store
+        search (trifid_solver.TrifidSearch): search to run (without a checkpoint file of its own); its
+            checkpoint interval is set to checkpoint_seconds
+        crib (search.Crib): results whose plaintext matches it are recorded as crib matches (optional)
+        checkpoint_seconds (float): minimum wall time between checkpoints
+        """
+
+        self.store = store
+        self.name = name
+        self.search = search
+        self.crib = crib
+        self.checkpoint_seconds = checkpoint_seconds
+        search.checkpoint_interval = checkpoint_seconds
+
+    def run(self, max_iterations=None, max_seconds=None, seed=None):
+        """
+        Anneal from the last checkpoint until the budget is spent
+
+        Parameters
+        ----------
+        max_iterations (int): total moves (across resumed runs) to stop after, or None
+        max_seconds (float): wall time of this run to stop after, or None
+        seed (int): random seed (ignored when resuming)
+
+        Returns
+        -------
+        list of Result, best first
+        """
+
+        if max_iterations is None and max_seconds is None:
+            raise ValueError("a search budget (max_iterations or max_seconds) is required")
+
+        progress = self.store.progress(self.name)
+        if progress is not None:
+            self.search.restore(progress)
+
+        # a single run, checkpointed between cycles: cutting it into timed slices would stop cycles part way
+        # through their cooling schedule
+        self.search.run(max_iterations, max_seconds, seed, on_checkpoint=self._checkpoint)
+
+        return self.store.results(job=self.name)
+
+    def _checkpoint(self, search):
+        results = [self._result(*ranked) for ranked in search.results()]
+        self.store.checkpoint(self.name, search.progress(), results, replace=True)
+
+    def _result(self, score, period, cube):
+        plaintext = Trifid(cube).decrypt(self.search.ciphertext, period)
+        crib = None
+        if self.crib is not None and self.crib.matches(engine.to_codes(plaintext)[np.newaxis, :])[0]:
+            crib = self.crib.text
+
+        return Result(self.name, score, None, (period, cube.alphabet), plaintext, crib)
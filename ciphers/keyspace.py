@@ -0,0 +1,278 @@
+from abc import abstractmethod, ABCMeta
+import string
+
+
+class KeySpace(object):
+    """
+    An ordered space of keys generated lazily: each key is computed from its index on access, so a space can be
+    counted, indexed, sliced and split between workers without being built in memory, and a run can resume from
+    any index with space[index:]. Sizes may exceed sys.maxsize, where len() fails but size does not
+    """
+
+    __metaclass__ = ABCMeta
+
+    size = 0  # number of keys
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        """
+        Parameters
+        ----------
+        index (int or slice): key index (negative counts from the end), or a slice with a positive step
+
+        Returns
+        -------
+        the key, or a KeySpace of the sliced keys
+        """
+
+        if isinstance(index, slice):
+            return Range(self, *_slice_range(index, self.size))
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("key space index out of range")
+
+        return self._key(index)
+
+    def __iter__(self):
+        index = 0
+        while index < self.size:
+            yield self._key(index)
+            index += 1
+
+    def shard(self, i, num_shards):
+        """
+        Parameters
+        ----------
+        i (int): shard index, 0 to num_shards - 1
+        num_shards (int): number of shards the space is split into
+
+        Returns
+        -------
+        (KeySpace): the i-th of num_shards contiguous, near equal slices of the space
+        """
+
+        if not 0 <= i < num_shards:
+            raise ValueError("shard index out of range")
+
+        return self[self.size * i // num_shards:self.size * (i + 1) // num_shards]
+
+    @abstractmethod
+    def _key(self, index):
+        """
+        Parameters
+        ----------
+        index (int): key index, 0 to size - 1
+
+        Returns
+        -------
+        the key at the index
+        """
+
+        pass
+
+
+class Range(KeySpace):
+    """
+    Evenly spaced keys of another key space
+    """
+
+    def __init__(self, space, start, size, step=1):
+        """
+        Parameters
+        ----------
+        space (KeySpace): parent key space
+        start (int): index of the first key in the parent
+        size (int): number of keys
+        step (int): index step in the parent
+        """
+
+        self.space = space
+        self.start = start
+        self.size = size
+        self.step = step
+
+    def _key(self, index):
+        return self.space._key(self.start + index * self.step)
+
+
+class Product(KeySpace):
+    """
+    Cartesian product of key spaces (or any sequences), as tuples with the last key varying fastest,
+    like itertools.product
+    """
+
+    def __init__(self, *spaces):
+        """
+        Parameters
+        ----------
+        spaces (KeySpace or sequence): factors of the product
+        """
+
+        self.spaces = spaces
+        self._sizes = [_size(space) for space in spaces]
+        self.size = 1
+        for size in self._sizes:
+            self.size *= size
+
+    def _key(self, index):
+        key = []
+        for space, size in reversed(zip(self.spaces, self._sizes)):
+            index, i = divmod(index, size)
+            key.append(space[i])
+
+        return tuple(reversed(key))
+
+
+class Periods(KeySpace):
+    """
+    Consecutive periods (or any integer keys), like xrange
+    """
+
+    def __init__(self, start, stop=None):
+        """
+        Parameters
+        ----------
+        start (int): first period (or the stop, starting from 1, when stop is not given)
+        stop (int): period to stop before
+        """
+
+        if stop is None:
+            start, stop = 1, start
+        self.start = start
+        self.size = max(stop - start, 0)
+
+    def _key(self, index):
+        return self.start + index
+
+
+class KeywordAlphabets(KeySpace):
+    """
+    Keyword mixed alphabets, one per keyword (see keyword_alphabet)
+    """
+
+    def __init__(self, keywords, alphabet=None):
+        """
+        Parameters
+        ----------
+        keywords (sequence of string): keywords, e.g., a word list (indexed lazily)
+        alphabet (string): characters to mix (default: the lowercase english letters)
+        """
+
+        self.keywords = keywords
+        self.alphabet = alphabet
+        self.size = _size(keywords)
+
+    def _key(self, index):
+        return keyword_alphabet(self.keywords[index], self.alphabet)
+
+
+class PolybiusVariants(KeySpace):
+    """
+    Polybius squares formed from an alphabet one character too long by dropping a character and merging it into a
+    character of the square: keys are (square alphabet, char_map) as taken by PolybiusSquare. The dropped character
+    is never in the square, so it is never mapped to itself
+    """
+
+    def __init__(self, alphabet, droppable=None):
+        """
+        Parameters
+        ----------
+        alphabet (string): characters of the square plus the one to drop, e.g., a 26 letter mixed alphabet
+        droppable (string): characters that may be dropped (default: any), e.g., those outside the keyword
+        """
+
+        if len(set(alphabet)) != len(alphabet):
+            raise ValueError("alphabet has duplicate characters")
+
+        self.alphabet = alphabet
+        self.droppable = [c for c in alphabet if droppable is None or c in droppable]
+        self.size = len(self.droppable) * (len(alphabet) - 1)
+
+    def _key(self, index):
+        i_dropped, i_merged = divmod(index, len(self.alphabet) - 1)
+        dropped = self.droppable[i_dropped]
+        square = self.alphabet.replace(dropped, '')
+
+        return square, (dropped.lower(), square[i_merged].lower())
+
+
+class CubeLayouts(KeySpace):
+    """
+    Trifid cube alphabets formed by inserting a filler character (e.g., '?' to make 27 symbols) at every position
+    of an alphabet
+    """
+
+    def __init__(self, alphabet, fillers='?'):
+        """
+        Parameters
+        ----------
+        alphabet (string): cube characters without the filler, e.g., a 26 letter mixed alphabet
+        fillers (string): filler characters to try
+        """
+
+        self.alphabet = alphabet
+        self.fillers = fillers
+        self.size = len(fillers) * (len(alphabet) + 1)
+
+    def _key(self, index):
+        i_filler, position = divmod(index, len(self.alphabet) + 1)
+
+        return self.alphabet[:position] + self.fillers[i_filler] + self.alphabet[position:]
+
+
+def keyword_alphabet(keyword, alphabet=None):
+    """
+    Parameters:
+        keyword (string): keyword, e.g., "kryptos"
+        alphabet (string): characters to mix (default: the lowercase english letters)
+
+    Returns:
+        alphabet (string): the distinct keyword characters followed by the rest of the alphabet in order,
+            lowercased like the ciphers
+    """
+
+    if alphabet is None:
+        alphabet = str(string.ascii_lowercase)
+    keyword, alphabet = keyword.lower(), alphabet.lower()
+    if any(c not in alphabet for c in keyword):
+        raise ValueError("keyword contains characters outside the alphabet")
+
+    mixed = []
+    for c in keyword + alphabet:
+        if c not in mixed:
+            mixed.append(c)
+
+    return ''.join(mixed)
+
+
+def _size(space):
+    return space.size if isinstance(space, KeySpace) else len(space)
+
+
+def _slice_range(index, size):
+    """
+    Parameters:
+        index (slice): slice of a key space
+        size (int): size of the key space
+
+    Returns:
+        start (int), size (int), step (int): the sliced keys (see Range)
+    """
+
+    step = 1 if index.step is None else index.step
+    if step <= 0:
+        raise ValueError("key spaces only slice with a positive step")
+
+    bounds = []
+    for bound, default in ((index.start, 0), (index.stop, size)):
+        if bound is None:
+            bound = default
+        elif bound < 0:
+            bound += size
+        bounds.append(min(max(bound, 0), size))
+    start, stop = bounds
+
+    return start, max(stop - start + step - 1, 0) // step, step
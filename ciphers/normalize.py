@@ -0,0 +1,80 @@
+from collections import namedtuple
+
+import numpy as np
+
+import engine
+from cache import LRUCache
+from ciphertext import CipherText, IndexedText
+
+MAX_CACHED_CHARS = 1 << 12  # longer texts (e.g., stream chunks) are normalized without caching
+MAX_CACHED_TEXTS = 256  # normalized texts kept by each normalizer
+
+
+class Normalized(namedtuple('Normalized', ['text', 'indices', 'foreign_positions', 'foreign_codes', 'length']),
+                 IndexedText):
+    """
+    A lowercased text split into the characters within an alphabet and the foreign characters
+        text (string): lowercased text with the foreign characters removed
+        indices (np.ndarray): alphabet index of each remaining character
+        foreign_positions (np.ndarray): position of each foreign character in the lowercased text
+        foreign_codes (np.ndarray): character code of each foreign character
+        length (int): length of the lowercased text
+    Arrays are read-only, as normalized texts are cached and shared
+    """
+
+    __slots__ = ()
+
+    @property
+    def like(self):
+        return self.text[:0]
+
+
+class Normalizer(object):
+    """
+    Lowercase texts and filter them to an alphabet with its index lookups (no regular expressions, so any character
+    may be in the alphabet). Short texts are cached, so normalizing the same ciphertext for every key is free
+    """
+
+    def __init__(self, alphabet):
+        """
+        Parameters
+        ----------
+        alphabet (Alphabet): characters to keep; the others are foreign
+        """
+
+        self.alphabet = alphabet
+        self._cache = LRUCache(MAX_CACHED_TEXTS)
+
+    def __call__(self, text):
+        """
+        Parameters
+        ----------
+        text (string or CipherText): text to normalize
+
+        Returns
+        -------
+        (Normalized): or the CipherText itself when it is indexed in the same alphabet
+        """
+
+        if isinstance(text, CipherText):
+            if text.alphabet == self.alphabet:
+                return text
+            text = text.to_text()
+        if len(text) > MAX_CACHED_CHARS:
+            return self._normalize(text)
+        return self._cache.get((type(text), text), lambda: self._normalize(text))
+
+    def _normalize(self, text):
+        text = text.lower()
+        codes = engine.to_codes(text)
+        indices = self.alphabet.indices(codes)
+        foreign = indices == engine.NOT_IN_ALPHABET
+        foreign_positions = np.flatnonzero(foreign)
+        foreign_codes = codes[foreign_positions]
+        if len(foreign_positions):
+            indices = indices[~foreign]
+            text = engine.render(codes[~foreign], text)
+        for array in (indices, foreign_positions, foreign_codes):
+            array.flags.writeable = False
+
+        return Normalized(text, indices, foreign_positions, foreign_codes, len(codes))
@@ -1,8 +1,12 @@
-import string
-from copy import copy
-
+import numpy as np
 import operator
 
+import batch
+import compiled
+import engine
+import normalize
+from alphabet import to_alphabet
+from ciphertext import transformed
 from cipher import Cipher
 
 
@@ -11,57 +15,212 @@ class OneTimePad(Cipher):
     Encipher and decipher using a one time pad
     """
 
-    def __init__(self):
+    def __init__(self, alphabet=None):
+        """
+        Parameters
+        ----------
+        alphabet (string or Alphabet): characters of the text and the pad (default: the lowercase english letters)
+        """
+
         super(OneTimePad, self).__init__()
 
-        self._alphabet = str(string.ascii_lowercase)
+        self._alphabet = to_alphabet(alphabet)
+        self._normalizer = normalize.Normalizer(self._alphabet)
 
     def encrypt(self, text, key, func=operator.add, include_foreign_chars=True):
         """
         Parameters:
-            text (string): plaintext
+            text (string or CipherText): plaintext
             key (string): one time pad
-            func (function): how to combine plaintext and key before modulo
+            func (function): how to combine plaintext and key before modulo (applied to integer arrays)
             include_foreign_chars (boolean): include chars outside the alphabet
 
         Returns:
-            ciphertext (string)
+            ciphertext (string, or CipherText for a CipherText text)
         """
 
-        plaintext = copy(text).lower()
-        ciphertext = list(plaintext)
-        for i, pc in enumerate(plaintext):
-            if pc not in self._alphabet:
-                if include_foreign_chars:
-                    ciphertext[i] = pc
-                continue
-            i_pc = self._alphabet.index(pc)
-            i_kc = self._alphabet.index(key[i % len(key)])
-            ciphertext[i] = self._alphabet[func(i_pc, i_kc) % len(self._alphabet)]
-
-        return ''.join(ciphertext)
+        return self._combine(text, key, func, include_foreign_chars)
 
     def decrypt(self, text, key, func=operator.sub, include_foreign_chars=True):
         """
         Parameters:
-            text (string): ciphertext
+            text (string or CipherText): ciphertext
+            key (string): one time pad
+            func (function): how to combine ciphertext and key before modulo (applied to integer arrays)
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            plaintext (string, or CipherText for a CipherText text)
+        """
+
+        return self._combine(text, key, func, include_foreign_chars)
+
+    def encrypt_batch(self, texts, keys, func=operator.add, include_foreign_chars=True):
+        """
+        Encrypt many texts in one array operation; the pad restarts at each text
+
+        Parameters:
+            texts (iterable of string): plaintexts
+            keys (string or sequence of string): pad shared by every text, or one pad per text
+            func (function): how to combine plaintext and key before modulo (applied to integer arrays)
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            ciphertexts (list of string)
+        """
+
+        return self._combine_batch(texts, keys, func, include_foreign_chars)
+
+    def decrypt_batch(self, texts, keys, func=operator.sub, include_foreign_chars=True):
+        """
+        Decrypt many texts in one array operation; the pad restarts at each text
+
+        Parameters:
+            texts (iterable of string): ciphertexts
+            keys (string or sequence of string): pad shared by every text, or one pad per text
+            func (function): how to combine ciphertext and key before modulo (applied to integer arrays)
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            plaintexts (list of string)
+        """
+
+        return self._combine_batch(texts, keys, func, include_foreign_chars)
+
+    def encrypt_bytes(self, data, key, out=None, text_mode=False):
+        """
+        Add a byte pad to binary data (modulo 256) without decoding or intermediate copies
+
+        Parameters:
+            data (bytes, bytearray, memoryview or mmap): plaintext
+            key (bytes): one time pad, wrapping around when shorter than the data
+            out (writable bytes-like): buffer of the same length to write the ciphertext to; may be data itself
+            text_mode (boolean): lowercase the data and only shift characters in the alphabet by the alphabet
+                index of the pad character (modulo the alphabet size), like encrypt
+
+        Returns:
+            ciphertext (writable bytes-like): out, or a new bytearray
+        """
+
+        return self._combine_bytes(np.add, data, key, out, text_mode)
+
+    def decrypt_bytes(self, data, key, out=None, text_mode=False):
+        """
+        Subtract a byte pad from binary data (modulo 256) without decoding or intermediate copies
+
+        Parameters:
+            data (bytes, bytearray, memoryview or mmap): ciphertext
+            key (bytes): one time pad, wrapping around when shorter than the data
+            out (writable bytes-like): buffer of the same length to write the plaintext to; may be data itself
+            text_mode (boolean): lowercase the data and only shift characters in the alphabet by the alphabet
+                index of the pad character (modulo the alphabet size), like decrypt
+
+        Returns:
+            plaintext (writable bytes-like): out, or a new bytearray
+        """
+
+        return self._combine_bytes(np.subtract, data, key, out, text_mode)
+
+    def _combine_bytes(self, func, data, key, out, text_mode):
+        """
+        Parameters:
+            func (np.ufunc): np.add or np.subtract
+            data (bytes-like): input
+            key (bytes): one time pad
+            out (writable bytes-like or None): output buffer
+            text_mode (boolean): combine alphabet indices of the lowercased data instead of bytes
+
+        Returns:
+            combined data (writable bytes-like)
+        """
+
+        src = engine.buffer_codes(data)
+        if text_mode:
+            if not self._alphabet.is_bytes():
+                raise ValueError("text mode needs an alphabet of byte characters")
+            key_codes = self._alphabet.key_indices(engine.buffer_codes(key).tostring())
+        else:
+            key_codes = engine.buffer_codes(key)
+            if len(key_codes) == 0:
+                raise ValueError("key is empty")
+        out, dst = engine.prepare_output(src, out)
+
+        for src_block, dst_block, key_block in engine.keyed_blocks(src, dst, key_codes):
+            if text_mode:
+                lowered = engine.LOWER_TABLE[src_block]
+                indices = self._alphabet.byte_lookup[lowered]
+                in_alphabet = indices != engine.NOT_IN_ALPHABET
+                combined = func(indices.astype(np.int64), key_block) % len(self._alphabet)
+                dst_block[:] = np.where(in_alphabet, self._alphabet.codes[combined], lowered)
+            else:
+                # uint8 arithmetic wraps modulo 256
+                func(src_block, key_block, out=dst_block)
+
+        return out
+
+    def _stream(self, func, chunks, key, kwargs):
+        """
+        Carry the pad position across chunks; it advances on every character
+        """
+
+        i_key = 0
+        for chunk in chunks:
+            yield func(chunk, engine.rotate(key, i_key), **kwargs)
+            i_key += len(chunk)
+
+    def _translation_tables(self, key):
+        num_alphabet_chars = len(self._alphabet)
+        i_key = self._alphabet.key_indices(key)[:, np.newaxis]
+        return compiled.translation_tables(
+            self._alphabet,
+            lambda indices: self._alphabet.codes[(indices + i_key) % num_alphabet_chars],
+            lambda indices: self._alphabet.codes[(indices - i_key) % num_alphabet_chars],
+            period=len(i_key)
+        )
+
+    def _combine_batch(self, texts, keys, func, include_foreign_chars):
+        """
+        Parameters:
+            texts (iterable of string): texts
+            keys (string or sequence of string): pads
+            func (function): how to combine text and key indices before modulo
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            combined texts (list of string), lowercased
+        """
+
+        texts = batch.Batch(texts, lower=True)
+        indices = self._alphabet.indices(texts.codes)
+        mask = indices != engine.NOT_IN_ALPHABET
+        # the pad is indexed by the position of the character in its text, foreign characters included
+        i_key = batch.key_stream(keys, len(texts), texts.record_ids[mask], texts.positions()[mask],
+                                 lambda key: self._alphabet.key_indices(key))
+        codes = texts.codes
+        codes[mask] = self._alphabet.codes[func(indices[mask].astype(np.int64), i_key) % len(self._alphabet)]
+        if not include_foreign_chars:
+            return texts.unpack(codes[mask], mask)
+
+        return texts.unpack(codes)
+
+    def _combine(self, text, key, func, include_foreign_chars):
+        """
+        Combine every alphabet character of the text with the pad in one array operation.
+        The pad is indexed by the position of the character in the text, foreign characters included
+
+        Parameters:
+            text (string): text
             key (string): one time pad
-            func (function): how to combine ciphertext and key before modulo
+            func (function): how to combine text and key indices before modulo
             include_foreign_chars (boolean): include chars outside the alphabet
 
         Returns:
-            plaintext (string)
+            combined text (string), lowercased
         """
 
-        ciphertext = copy(text).lower()
-        plaintext = list(ciphertext)
-        for i, cc in enumerate(ciphertext):
-            if cc not in self._alphabet:
-                if include_foreign_chars:
-                    plaintext[i] = cc
-                continue
-            i_cc = self._alphabet.index(cc)
-            i_kc = self._alphabet.index(key[i % len(key)])
-            plaintext[i] = self._alphabet[func(i_cc, i_kc) % len(self._alphabet)]
+        normalized = self._normalizer(text)
+        i_key = self._alphabet.key_indices(key)
+        positions = normalized.alphabet_positions()
+        indices = func(normalized.indices.astype(np.int64), i_key[positions % len(i_key)]) % len(self._alphabet)
 
-        return ''.join(plaintext)
+        return transformed(text, normalized, self._alphabet, indices, include_foreign_chars)
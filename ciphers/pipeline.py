@@ -0,0 +1,346 @@
+from collections import OrderedDict
+from fractions import gcd
+
+import numpy as np
+
+import engine
+from cipher import Cipher
+from ciphertext import accepts_ciphertext, as_text
+
+MAX_FUSED_PHASES = 1 << 12  # substitutions are tabulated and fused while their key period stays within this many phases
+
+
+class Pipeline(Cipher):
+    """
+    Stacked ciphers: encrypt runs the stages in order and decrypt undoes them in reverse order.
+    A byte string is converted to character codes once and stays an array between stages: consecutive
+    transpositions are fused into a single gather, consecutive substitutions into one translation table per key
+    phase, and fractionation works on the codes. Stages without an array form, and unicode texts, go through
+    their cipher as text
+    """
+
+    def __init__(self, stages):
+        """
+        Parameters
+        ----------
+        stages (list): ciphers, or (cipher, kwargs) pairs with the extra arguments of the stage's encrypt and
+            decrypt, e.g., [Vigenere(tableau), (Scytale(), {'init_offset': 3})]
+        """
+
+        super(Pipeline, self).__init__()
+        if not stages:
+            raise ValueError("pipeline has no stages")
+        self.stages = [stage if isinstance(stage, tuple) else (stage, {}) for stage in stages]
+
+    @accepts_ciphertext
+    def encrypt(self, text, key):
+        """
+        Parameters:
+            text (string or CipherText): plaintext
+            key (sequence): key of each stage, in stage order
+
+        Returns:
+            ciphertext (string, or CipherText for a CipherText text)
+        """
+
+        return _run(text, _steps(self.stages, key), False)
+
+    @accepts_ciphertext
+    def decrypt(self, text, key):
+        """
+        Parameters:
+            text (string or CipherText): ciphertext
+            key (sequence): key of each stage, in stage order
+
+        Returns:
+            plaintext (string, or CipherText for a CipherText text)
+        """
+
+        return _run(text, _steps(self.stages, key)[::-1], True)
+
+    def decrypt_many(self, text, keys):
+        """
+        Decrypt one ciphertext under many keys. Keys that only differ in the key of the first stage form a group:
+        the later stages are undone once per group, and the first stage decrypts the group with its own
+        decrypt_many, so searching the first stage of a stack costs about as much as searching that cipher alone.
+        Every candidate must have the same length: when the later stages of some keys leave a different number of
+        characters for the first stage to keep (e.g., a first stage that drops characters outside its alphabet,
+        after transpositions that do not keep every character), decrypt those keys in separate calls
+
+        Parameters:
+            text (string or CipherText): ciphertext
+            keys (iterable of sequence): key of each stage for every candidate (stage keys must be hashable)
+
+        Returns:
+            candidates (np.ndarray): num_keys x num_chars array of plaintext character codes
+
+        Raises:
+            ValueError: if the key groups decrypt to candidates of different lengths
+        """
+
+        text = as_text(text)
+        groups = OrderedDict()  # keys of the later stages -> (candidate row, first stage key) pairs
+        num_keys = 0
+        for i_key, key in enumerate(keys):
+            key = tuple(key)
+            if len(key) != len(self.stages):
+                raise ValueError("expected a key for every stage")
+            groups.setdefault(key[1:], []).append((i_key, key[0]))
+            num_keys += 1
+        if not groups:
+            return np.zeros([0, 0], dtype=engine.to_codes(text).dtype)
+
+        cipher, kwargs = self.stages[0]
+        candidates = None
+        for later_keys, members in groups.iteritems():
+            rows, first_keys = zip(*members)
+            intermediate = _run(text, _steps(self.stages[1:], later_keys)[::-1], True)
+            group_candidates = cipher.decrypt_many(intermediate, list(first_keys), **kwargs)
+            if candidates is None:
+                candidates = np.empty([num_keys, group_candidates.shape[1]], dtype=group_candidates.dtype)
+            elif group_candidates.shape[1] != candidates.shape[1]:
+                raise ValueError("key groups decrypt to candidates of different lengths (%d and %d characters)"
+                                 % (candidates.shape[1], group_candidates.shape[1]))
+            candidates[list(rows)] = group_candidates
+
+        return candidates
+
+    def _stream(self, func, chunks, key, kwargs):
+        """
+        Transform the whole text at once, as transpositions and fractionation span chunk boundaries
+        """
+
+        chunks = list(chunks)
+        if chunks:
+            yield func(chunks[0][:0].join(chunks), key, **kwargs)
+
+
+def _steps(stages, keys):
+    """
+    Parameters:
+        stages (list): (cipher, kwargs) pairs
+        keys (sequence): key of each stage
+
+    Returns:
+        steps (list): (cipher, key, kwargs) of each stage, in stage order
+    """
+
+    keys = list(keys)
+    if len(keys) != len(stages):
+        raise ValueError("expected a key for every stage")
+
+    return [(cipher, key, kwargs) for (cipher, kwargs), key in zip(stages, keys)]
+
+
+def _run(text, steps, decrypt):
+    """
+    Parameters:
+        text (string): input
+        steps (list): (cipher, key, kwargs) of each stage, in the order they are applied
+        decrypt (boolean): decrypt rather than encrypt with every stage
+
+    Returns:
+        output (string)
+    """
+
+    if not isinstance(text, bytes):
+        for cipher, key, kwargs in steps:
+            text = (cipher.decrypt if decrypt else cipher.encrypt)(text, key, **kwargs)
+        return text
+
+    return engine.render(_transform(engine.to_codes(text), steps, decrypt), text)
+
+
+def _transform(codes, steps, decrypt):
+    """
+    Run the stages over the character codes of a byte string, fusing consecutive substitutions and
+    transpositions
+
+    Parameters:
+        codes (np.ndarray): character codes
+        steps (list): (cipher, key, kwargs) of each stage, in the order they are applied
+        decrypt (boolean): decrypt rather than encrypt with every stage
+
+    Returns:
+        codes (np.ndarray): character codes of the output
+    """
+
+    lowered = False  # whether the codes are known to be lowercase
+    pending = None  # fused stages not applied yet (they all keep the length of the text)
+    for cipher, key, kwargs in steps:
+        operation = _Substitution.of(cipher, key, kwargs, decrypt)
+        if operation is None:
+            operation = _Transposition.of(cipher, len(codes), key, kwargs, decrypt)
+
+        if operation is not None:
+            fused = pending.fuse(operation) if pending is not None else None
+            if fused is None and pending is not None:
+                codes, lowered = pending.apply(codes, lowered)
+            pending = fused or operation
+            if not pending.keeps_length:
+                codes, lowered = pending.apply(codes, lowered)
+                pending = None
+            continue
+
+        if pending is not None:
+            codes, lowered = pending.apply(codes, lowered)
+            pending = None
+        if not lowered:
+            codes = engine.LOWER_TABLE[codes]
+        output = cipher._transform_codes(codes, key, decrypt, **kwargs)
+        if output is None:
+            func = cipher.decrypt if decrypt else cipher.encrypt
+            output = engine.to_codes(func(engine.render(codes, b''), key, **kwargs))
+        codes, lowered = output, False
+
+    if pending is not None:
+        codes, lowered = pending.apply(codes, lowered)
+
+    return codes
+
+
+class _Substitution(object):
+    """
+    A keyed substitution of bytes through per-phase translation tables (see compiled.TranslationTables)
+    """
+
+    def __init__(self, table, in_alphabet, alphabet_phases, include_foreign_chars=True):
+        """
+        Parameters
+        ----------
+        table (np.ndarray): period x 256 output byte for each input byte at each key phase
+        in_alphabet (np.ndarray): 256 booleans, whether a byte is within the alphabet
+        alphabet_phases (boolean): the key phase only advances on characters within the alphabet
+        include_foreign_chars (boolean): keep the characters outside the alphabet
+        """
+
+        self.table = table
+        self.in_alphabet = in_alphabet
+        self.alphabet_phases = alphabet_phases
+        self.keeps_length = include_foreign_chars
+
+    @classmethod
+    def of(cls, cipher, key, kwargs, decrypt):
+        """
+        Returns:
+            (_Substitution): the stage as a substitution, or None if the cipher has no translation tables or the
+                key is longer than MAX_FUSED_PHASES (the cipher then substitutes the codes itself)
+        """
+
+        if isinstance(key, basestring) and len(key) > MAX_FUSED_PHASES:
+            return None  # e.g., a one time pad as long as the message: not worth a table per phase, nor caching
+        tables = cipher.compile(key, **kwargs)._tables
+        if tables is None:
+            return None
+
+        return cls(tables.decrypt if decrypt else tables.encrypt, tables.in_alphabet, tables.alphabet_phases,
+                   kwargs.get('include_foreign_chars', True))
+
+    def fuse(self, other):
+        """
+        Parameters:
+            other (_Substitution or _Transposition): operation applied after this one
+
+        Returns:
+            (_Substitution): both substitutions as one, or None if they cannot be combined
+        """
+
+        if not isinstance(other, _Substitution) or not (self.keeps_length and other.keeps_length):
+            return None
+
+        period, other_period = len(self.table), len(other.table)
+        if period == 1:
+            # the phases of the other substitution advance on the bytes this one maps into its alphabet
+            in_alphabet, alphabet_phases = other.in_alphabet[self.table[0]], other.alphabet_phases
+        elif other_period == 1 or self.alphabet_phases == other.alphabet_phases:
+            in_alphabet, alphabet_phases = self.in_alphabet, self.alphabet_phases
+            if alphabet_phases and other_period > 1 and not np.all(other.in_alphabet[self.table] == in_alphabet):
+                return None  # the substitutions advance their keys on different characters
+        else:
+            return None
+
+        fused_period = period * other_period // gcd(period, other_period)
+        if fused_period > MAX_FUSED_PHASES:
+            return None
+        phases = np.arange(fused_period)
+        table = other.table[(phases % other_period)[:, np.newaxis], self.table[phases % period]]
+
+        return _Substitution(table, in_alphabet, alphabet_phases)
+
+    def apply(self, codes, lowered):
+        """
+        Parameters:
+            codes (np.ndarray): character codes (any case, as the tables lowercase)
+            lowered (boolean): whether the codes are known to be lowercase
+
+        Returns:
+            codes (np.ndarray): substituted character codes
+            lowered (boolean): whether those are known to be lowercase
+        """
+
+        period = len(self.table)
+        in_alphabet = self.in_alphabet[codes] if period > 1 or not self.keeps_length else None
+        if period == 1:
+            output = self.table[0][codes]
+        elif self.alphabet_phases:
+            output = self.table[(np.cumsum(in_alphabet) - 1) % period, codes]
+        else:
+            output = self.table[np.arange(len(codes)) % period, codes]
+        if not self.keeps_length:
+            output = output[in_alphabet]
+
+        return output, np.array_equal(engine.LOWER_TABLE[self.table], self.table)
+
+
+class _Transposition(object):
+    """
+    A permutation of the characters of the whole text
+    """
+
+    keeps_length = True
+
+    def __init__(self, sources):
+        """
+        Parameters
+        ----------
+        sources (np.ndarray): input index of each output character
+        """
+
+        self.sources = sources
+
+    @classmethod
+    def of(cls, cipher, num_chars, key, kwargs, decrypt):
+        """
+        Returns:
+            (_Transposition): the stage as a transposition, or None if the cipher is not one
+        """
+
+        sources = cipher._permutation(num_chars, key, decrypt, **kwargs)
+        return cls(sources) if sources is not None else None
+
+    def fuse(self, other):
+        """
+        Parameters:
+            other (_Substitution or _Transposition): operation applied after this one
+
+        Returns:
+            (_Transposition): both transpositions as one gather, or None if other is not a transposition
+        """
+
+        if not isinstance(other, _Transposition):
+            return None
+        return _Transposition(self.sources[other.sources])
+
+    def apply(self, codes, lowered):
+        """
+        Parameters:
+            codes (np.ndarray): character codes
+            lowered (boolean): whether the codes are known to be lowercase
+
+        Returns:
+            codes (np.ndarray): permuted, lowercased character codes
+            lowered (boolean): True
+        """
+
+        codes = codes[self.sources]
+        return (codes if lowered else engine.LOWER_TABLE[codes]), True
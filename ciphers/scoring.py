@@ -0,0 +1,297 @@
+import string
+
+import numpy as np
+
+import engine
+
+LETTERS = str(string.ascii_lowercase)
+NUM_LETTERS = len(LETTERS)
+
+# relative frequencies of a-z in english text
+ENGLISH_FREQUENCIES = np.asarray([
+    0.08167, 0.01492, 0.02782, 0.04253, 0.12702, 0.02228, 0.02015, 0.06094, 0.06966, 0.00153, 0.00772, 0.04025,
+    0.02406, 0.06749, 0.07507, 0.01929, 0.00095, 0.05987, 0.06327, 0.09056, 0.02758, 0.00978, 0.02360, 0.00150,
+    0.01974, 0.00074
+])
+
+# maps character codes to letter indices regardless of case
+_LETTER_LOOKUP = engine.build_lookup(LETTERS)[engine.LOWER_TABLE]
+
+
+def letter_indices(candidates):
+    """
+    Parameters:
+        candidates (np.ndarray): num_candidates x num_chars array of character codes (e.g., from decrypt_many),
+            or a single text
+
+    Returns:
+        indices (np.ndarray): uint8 letter indices (a=0, case insensitive), engine.NOT_IN_ALPHABET for other chars
+    """
+
+    if isinstance(candidates, basestring):
+        candidates = engine.to_codes(candidates)[np.newaxis, :]
+    candidates = np.atleast_2d(candidates)
+    indices = np.full(candidates.shape, engine.NOT_IN_ALPHABET, dtype=np.uint8)
+    in_range = candidates < len(_LETTER_LOOKUP)
+    indices[in_range] = _LETTER_LOOKUP[candidates[in_range]]
+
+    return indices
+
+
+def letter_counts(candidates):
+    """
+    Parameters:
+        candidates (np.ndarray): num_candidates x num_chars array of character codes, or a single text
+
+    Returns:
+        counts (np.ndarray): num_candidates x 26 letter histogram of each candidate
+    """
+
+    indices = letter_indices(candidates)
+    num_candidates = indices.shape[0]
+    # one bincount over all rows: offset each row into its own run of bins (the last bin collects other chars)
+    row_offsets = (NUM_LETTERS + 1) * np.arange(num_candidates)[:, np.newaxis]
+    bins = np.minimum(indices, NUM_LETTERS).astype(np.int64) + row_offsets
+    counts = np.bincount(bins.ravel(), minlength=num_candidates * (NUM_LETTERS + 1))
+
+    return counts.reshape([num_candidates, NUM_LETTERS + 1])[:, :NUM_LETTERS]
+
+
+def index_of_coincidence(candidates):
+    """
+    Parameters:
+        candidates (np.ndarray): num_candidates x num_chars array of character codes, or a single text
+
+    Returns:
+        ioc (np.ndarray): index of coincidence of the letters of each candidate (~0.066 for english, ~0.038 random)
+    """
+
+    counts = letter_counts(candidates).astype(np.float64)
+    num_letters = counts.sum(axis=1)
+    pairs = num_letters * (num_letters - 1)
+
+    return np.where(pairs > 0, (counts * (counts - 1)).sum(axis=1) / np.maximum(pairs, 1), 0.)
+
+
+def chi_squared(candidates, frequencies=ENGLISH_FREQUENCIES):
+    """
+    Parameters:
+        candidates (np.ndarray): num_candidates x num_chars array of character codes, or a single text
+        frequencies (np.ndarray): expected relative frequencies of a-z
+
+    Returns:
+        chi2 (np.ndarray): chi-squared statistic of the letter counts of each candidate (lower is more english)
+    """
+
+    counts = letter_counts(candidates).astype(np.float64)
+    expected = counts.sum(axis=1)[:, np.newaxis] * frequencies[np.newaxis, :]
+
+    return (((counts - expected) ** 2) / np.maximum(expected, 1e-12)).sum(axis=1)
+
+
+def accept_move(delta, temperature, rng):
+    """
+    Metropolis criterion of simulated annealing: a move that does not lower the score is always accepted, a worse
+    one with probability exp(delta / temperature)
+
+    Parameters:
+        delta (float): score after the move minus score before (in log10 score units)
+        temperature (float): current temperature (0 accepts no worse move)
+        rng (random.Random): random source
+
+    Returns:
+        (boolean): whether to keep the move
+    """
+
+    if delta >= 0:
+        return True
+    return temperature > 0 and rng.random() < np.exp(delta / temperature)
+
+
+class NgramTable(object):
+    """
+    Log10 probabilities of letter n-grams, stored as a dense float32 array indexed by packed n-gram id
+    (the n-gram read as a base 26 number, a=0)
+    """
+
+    def __init__(self, log_probs, n):
+        """
+        Parameters
+        ----------
+        log_probs (np.ndarray): 26**n log10 probabilities, unseen n-grams set to a floor value
+        n (int): n-gram length
+        """
+
+        if len(log_probs) != NUM_LETTERS ** n:
+            raise ValueError("table size does not match the n-gram length")
+
+        self.n = n
+        self.log_probs = np.asarray(log_probs, dtype=np.float32)
+        self.log_probs.flags.writeable = False
+        self._place_values = NUM_LETTERS ** np.arange(n - 1, -1, -1, dtype=np.int64)
+
+    @classmethod
+    def from_counts(cls, counts, n=None):
+        """
+        Parameters
+        ----------
+        counts (dict or iterable): n-gram -> count, or (n-gram, count) pairs; n-grams are case insensitive
+        n (int): n-gram length (default: length of the first n-gram)
+
+        Returns
+        -------
+        (NgramTable)
+        """
+
+        if isinstance(counts, dict):
+            counts = counts.items()
+        counts = list(counts)
+        if n is None:
+            n = len(counts[0][0])
+
+        table = np.zeros(NUM_LETTERS ** n, dtype=np.float64)
+        place_values = NUM_LETTERS ** np.arange(n - 1, -1, -1, dtype=np.int64)
+        for ngram, count in counts:
+            indices = letter_indices(ngram)[0]
+            if len(indices) != n or np.any(indices == engine.NOT_IN_ALPHABET):
+                raise ValueError("invalid n-gram: %r" % ngram)
+            table[indices.astype(np.int64).dot(place_values)] += count
+
+        return cls(_log_probabilities(table), n)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Parameters
+        ----------
+        path (string): text file with one "<n-gram> <count>" pair per line, e.g., "TION 13168375"
+
+        Returns
+        -------
+        (NgramTable)
+        """
+
+        with open(path) as f:
+            pairs = [line.split() for line in f if line.strip()]
+
+        return cls.from_counts((ngram, float(count)) for ngram, count in pairs)
+
+    @classmethod
+    def from_corpus(cls, text, n=4):
+        """
+        Parameters
+        ----------
+        text (string): english text; n-grams are counted within runs of letters
+        n (int): n-gram length
+
+        Returns
+        -------
+        (NgramTable)
+        """
+
+        table = cls(np.zeros(NUM_LETTERS ** n), n)
+        ids = table.ngram_ids(letter_indices(text))[0]
+        counts = np.bincount(ids[ids >= 0], minlength=NUM_LETTERS ** n)
+
+        return cls(_log_probabilities(counts.astype(np.float64)), n)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Parameters
+        ----------
+        path (string): .npy file written by save
+
+        Returns
+        -------
+        (NgramTable)
+        """
+
+        log_probs = np.load(path)
+        n = int(round(np.log(len(log_probs)) / np.log(NUM_LETTERS)))
+
+        return cls(log_probs, n)
+
+    def save(self, path):
+        """
+        Parameters
+        ----------
+        path (string): .npy file to write the table to
+        """
+
+        np.save(path, self.log_probs)
+
+    def ngram_ids(self, indices):
+        """
+        Parameters
+        ----------
+        indices (np.ndarray): num_candidates x num_chars letter indices (see letter_indices)
+
+        Returns
+        -------
+        ids (np.ndarray): num_candidates x (num_chars - n + 1) packed id of the n-gram starting at each position,
+            -1 where the window contains a character that is not a letter
+        """
+
+        num_candidates, num_chars = indices.shape
+        num_windows = max(num_chars - self.n + 1, 0)
+        ids = np.zeros([num_candidates, num_windows], dtype=np.int64)
+        valid = np.ones([num_candidates, num_windows], dtype=bool)
+        for offset in xrange(self.n):
+            window = indices[:, offset:offset + num_windows]
+            ids += window.astype(np.int64) * self._place_values[offset]
+            valid &= window != engine.NOT_IN_ALPHABET
+        ids[~valid] = -1
+
+        return ids
+
+    @property
+    def floor(self):
+        """
+        (float): log10 probability of the least likely n-gram
+        """
+
+        return float(self.log_probs.min())
+
+    def window_scores(self, indices, invalid_score=0.):
+        """
+        Parameters
+        ----------
+        indices (np.ndarray): num_candidates x num_chars letter indices (see letter_indices)
+        invalid_score (float): score of windows containing a character that is not a letter; 0 ignores them,
+            the floor penalizes them (for searches where the plaintext should be all letters)
+
+        Returns
+        -------
+        scores (np.ndarray): log10 probability of the n-gram starting at each position
+        """
+
+        ids = self.ngram_ids(indices)
+        return np.where(ids >= 0, self.log_probs[np.maximum(ids, 0)], invalid_score)
+
+    def score(self, candidates):
+        """
+        Parameters
+        ----------
+        candidates (np.ndarray): num_candidates x num_chars array of character codes (e.g., from decrypt_many),
+            or a single text
+
+        Returns
+        -------
+        scores (np.ndarray): log10 likelihood of each candidate under the n-gram model (higher is more english)
+        """
+
+        return self.window_scores(letter_indices(candidates)).sum(axis=1)
+
+
+def _log_probabilities(counts):
+    """
+    Parameters:
+        counts (np.ndarray): n-gram counts
+
+    Returns:
+        log_probs (np.ndarray): log10 probabilities, with unseen n-grams floored at a tenth of a count
+    """
+
+    total = max(counts.sum(), 1.)
+    return np.log10(np.maximum(counts, 0.1) / total)
@@ -1,6 +1,15 @@
-from copy import copy
+from contextlib import contextmanager
+import io
+import mmap
+import os
 
-from cipher import Cipher
+import numpy as np
+
+import engine
+from cipher import Cipher, CHUNK_SIZE, read_chunks
+from ciphertext import accepts_ciphertext, as_text
+
+GATHER_BLOCK_SIZE = 4096  # keys gathered at a time by decrypt_many
 
 
 class Scytale(Cipher):
@@ -12,40 +21,230 @@ class Scytale(Cipher):
     def __init__(self):
         super(Scytale, self).__init__()
 
+    @accepts_ciphertext
     def encrypt(self, text, key, init_offset=0):
         """
         Parameters:
-            text (string): plaintext
+            text (string or CipherText): plaintext
             key (int): number of characters to skip (mimics diameter of stick)
             init_offset (int): character offset to start at
 
         Returns:
-            ciphertext (string)
+            ciphertext (string, or CipherText for a CipherText text)
         """
 
-        plaintext = copy(text).lower()
-        ciphertext = list(plaintext)
-        num_chars = len(plaintext)
-        for i in xrange(num_chars):
-            ciphertext[(init_offset + i*key) % num_chars] = plaintext[i]
+        codes = engine.to_codes(text.lower())
+        num_chars = len(codes)
+        if num_chars == 0:
+            return text.lower()
 
-        return ''.join(ciphertext)
+        return engine.render(codes[encrypt_sources(num_chars, key, init_offset)], text)
 
+    @accepts_ciphertext
     def decrypt(self, text, key, init_offset=0):
         """
         Parameters:
-            text (string): ciphertext
+            text (string or CipherText): ciphertext
             key (int): rotation value for alphabet
             init_offset (int): character offset to start at
 
         Returns:
-            plaintext (string)
+            plaintext (string, or CipherText for a CipherText text)
+        """
+
+        codes = engine.to_codes(text.lower())
+        num_chars = len(codes)
+        if num_chars == 0:
+            return text.lower()
+
+        return engine.render(codes[decrypt_sources(num_chars, key, init_offset)], text)
+
+    def decrypt_many(self, text, keys=None, init_offset=0):
+        """
+        Decrypt one ciphertext under many periods and offsets with a single gather
+
+        Parameters:
+            text (string or CipherText): ciphertext
+            keys (iterable): periods (int), or (period, init_offset) pairs
+                (default: every period and offset pair)
+            init_offset (int): character offset for keys given as a bare period
+
+        Returns:
+            candidates (np.ndarray): num_keys x num_chars array of plaintext character codes
+        """
+
+        codes = engine.to_codes(as_text(text).lower())
+        num_chars = len(codes)
+        if keys is None:
+            keys = [(key, offset) for key in xrange(1, num_chars) for offset in xrange(num_chars)]
+        keys = [key if isinstance(key, tuple) else (key, init_offset) for key in keys]
+        if num_chars == 0:
+            return np.zeros([len(keys), 0], dtype=codes.dtype)
+
+        periods, offsets = np.asarray(keys, dtype=np.int64).reshape(-1, 2).T % num_chars
+        i_chars = np.arange(num_chars, dtype=np.int64)
+        candidates = np.empty([len(keys), num_chars], dtype=codes.dtype)
+        for start in xrange(0, len(keys), GATHER_BLOCK_SIZE):
+            # bound the size of the gather index array
+            block = slice(start, start + GATHER_BLOCK_SIZE)
+            gather = (offsets[block, np.newaxis] + i_chars * periods[block, np.newaxis]) % num_chars
+            candidates[block] = codes[gather]
+
+        return candidates
+
+    def _permutation(self, num_chars, key, decrypt, init_offset=0):
+        if num_chars == 0:
+            return np.zeros(0, dtype=np.int64)
+        if decrypt:
+            return decrypt_sources(num_chars, key, init_offset)
+        return encrypt_sources(num_chars, key, init_offset)
+
+    def encrypt_stream(self, reader, writer, key, chunk_size=CHUNK_SIZE, init_offset=0):
+        """
+        Encrypt a whole file, writing the ciphertext chunk by chunk.
+        The transposition depends on the total length, so a file opened in binary mode is memory mapped (from the
+        start of the file) instead of read; any other reader (e.g., a decoding text file) is read whole
+
+        Parameters:
+            reader (file-like or iterable): plaintext
+            writer (file-like): ciphertext is written here
+            key (int): number of characters to skip (mimics diameter of stick)
+            chunk_size (int): number of characters written at a time
+            init_offset (int): character offset to start at
+        """
+
+        with _mapped_codes(reader) as (codes, like):
+            num_chars = len(codes)
+            for start in xrange(0, num_chars, chunk_size):
+                positions = np.arange(start, min(start + chunk_size, num_chars), dtype=np.int64)
+                sources = _encrypt_sources(positions, num_chars, key, init_offset)
+                writer.write(engine.render(codes[sources], like).lower())
+
+    def decrypt_stream(self, reader, writer, key, chunk_size=CHUNK_SIZE, init_offset=0):
+        """
+        Decrypt a whole file, writing the plaintext chunk by chunk.
+        The transposition depends on the total length, so a file opened in binary mode is memory mapped (from the
+        start of the file) instead of read; any other reader (e.g., a decoding text file) is read whole
+
+        Parameters:
+            reader (file-like or iterable): ciphertext
+            writer (file-like): plaintext is written here
+            key (int): rotation value for alphabet
+            chunk_size (int): number of characters written at a time
+            init_offset (int): character offset to start at
         """
 
-        ciphertext = copy(text).lower()
-        plaintext = list(ciphertext)
-        num_chars = len(ciphertext)
-        for i in xrange(num_chars):
-            plaintext[i] = ciphertext[(init_offset + i*key) % num_chars]
+        with _mapped_codes(reader) as (codes, like):
+            num_chars = len(codes)
+            for start in xrange(0, num_chars, chunk_size):
+                positions = np.arange(start, min(start + chunk_size, num_chars), dtype=np.int64)
+                sources = (init_offset + positions * (key % num_chars)) % num_chars
+                writer.write(engine.render(codes[sources], like).lower())
+
+
+@contextmanager
+def _mapped_codes(reader):
+    """
+    Parameters:
+        reader (file-like or iterable): text to map
+
+    Yields:
+        codes (np.ndarray): character codes of the whole text (a read-only view of the file when memory mapped,
+            valid until the context exits)
+        like (string): empty text of the type the codes render to
+    """
+
+    # only the raw bytes of a binary file can be mapped; a text file decodes what it reads
+    binary = 'b' in getattr(reader, 'mode', '') and not isinstance(reader, io.TextIOBase)
+    try:
+        fileno = reader.fileno() if binary else None
+    except (AttributeError, IOError, ValueError):
+        fileno = None
+
+    if fileno is None:
+        text = ''.join(read_chunks(reader, CHUNK_SIZE))
+        yield engine.to_codes(text), text[:0]
+    elif os.fstat(fileno).st_size == 0:
+        yield np.zeros(0, dtype=np.uint8), b''
+    else:
+        mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        try:
+            yield np.frombuffer(mapped, dtype=np.uint8), b''
+        finally:
+            mapped.close()
+
+
+def encrypt_sources(num_chars, key, init_offset=0):
+    """
+    Parameters:
+        num_chars (int): length of the text
+        key (int): number of characters to skip
+        init_offset (int): character offset to start at
+
+    Returns:
+        sources (np.ndarray): plaintext index of each ciphertext character
+    """
+
+    return _encrypt_sources(np.arange(num_chars, dtype=np.int64), num_chars, key, init_offset)
+
+
+def decrypt_sources(num_chars, key, init_offset=0):
+    """
+    Parameters:
+        num_chars (int): length of the text
+        key (int): number of characters to skip
+        init_offset (int): character offset to start at
+
+    Returns:
+        sources (np.ndarray): ciphertext index of each plaintext character
+    """
+
+    return (init_offset + np.arange(num_chars, dtype=np.int64) * (key % num_chars)) % num_chars
+
+
+def _encrypt_sources(positions, num_chars, key, init_offset):
+    """
+    Find the plaintext index that ends up at each ciphertext position.
+    Encryption writes plaintext[i] to (init_offset + i*key) % num_chars in order of i, so a position receives the
+    last i solving i*key = position - init_offset (mod num_chars), and keeps its own character if there is none
+
+    Parameters:
+        positions (np.ndarray): ciphertext positions
+        num_chars (int): length of the text
+        key (int): number of characters to skip
+        init_offset (int): character offset to start at
+
+    Returns:
+        sources (np.ndarray): plaintext index of each position
+    """
+
+    key %= num_chars
+    divisor, inverse = _gcd_inverse(key, num_chars)
+    cycle_len = num_chars // divisor  # solutions for i repeat with this period
+    shifted = positions - init_offset
+    solvable = shifted % divisor == 0
+    first_source = (shifted // divisor * inverse) % cycle_len
+
+    return np.where(solvable, first_source + (divisor - 1) * cycle_len, positions)
+
+
+def _gcd_inverse(a, m):
+    """
+    Parameters:
+        a (int): non-negative integer below m
+        m (int): positive modulus
+
+    Returns:
+        g (int): greatest common divisor of a and m
+        inverse (int): inverse of a/g modulo m/g
+    """
+
+    # extended euclidean algorithm
+    old_r, r = a, m
+    old_s, s = 1, 0
+    while r:
+        quotient = old_r // r
+        old_r, r = r, old_r - quotient * r
+        old_s, s = s, old_s - quotient * s
 
-        return ''.join(plaintext)
+    return old_r, old_s % (m // old_r)
@@ -0,0 +1,183 @@
+from collections import namedtuple
+from itertools import groupby, islice
+import multiprocessing
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+import cribs
+import engine
+
+POLL_SECONDS = 0.01  # wait for a unit of work before checking the others again, when none has completed
+
+Hit = namedtuple('Hit', ['params', 'key', 'plaintext'])
+
+
+class Crib(object):
+    """
+    Known plaintext that a correct decryption must contain
+    """
+
+    def __init__(self, text, position=None):
+        """
+        Parameters
+        ----------
+        text (string): known plaintext (case insensitive)
+        position (int): index of the crib within the plaintext, or None if it may appear anywhere
+        """
+
+        self.text = text.lower()
+        self.position = position
+        self._codes = engine.to_codes(self.text)
+
+    def matches(self, candidates):
+        """
+        Check many candidate plaintexts for the crib at once
+
+        Parameters
+        ----------
+        candidates (np.ndarray): num_candidates x num_chars array of plaintext character codes
+
+        Returns
+        -------
+        (np.ndarray): boolean array, True where the candidate contains the crib
+        """
+
+        num_candidates, num_chars = candidates.shape
+        crib_len = len(self._codes)
+        if self.position is not None:
+            if self.position + crib_len > num_chars:
+                return np.zeros(num_candidates, dtype=bool)
+            window = candidates[:, self.position:self.position + crib_len]
+            return np.all(window == self._codes, axis=1)
+
+        if crib_len > num_chars:
+            return np.zeros(num_candidates, dtype=bool)
+        # view every crib length window of every candidate without copying
+        candidates = np.ascontiguousarray(candidates)
+        row_stride, col_stride = candidates.strides
+        windows = as_strided(candidates, shape=[num_candidates, num_chars - crib_len + 1, crib_len],
+                             strides=[row_stride, col_stride, col_stride])
+        return np.any(np.all(windows == self._codes, axis=2), axis=1)
+
+
+class KeySearch(object):
+    """
+    Search a key space for decryptions containing a crib, sharded across a pool of worker processes
+    """
+
+    def __init__(self, cipher_factory, keyspace, crib, processes=None, chunk_size=256, prune_keys=True):
+        """
+        Parameters
+        ----------
+        cipher_factory (function): builds a cipher from key space parameters, e.g., a tableau definition.
+            Must be picklable (a module level function or a class)
+        keyspace (iterable): (params, key) pairs; params are passed to cipher_factory and key to decrypt.
+            Runs of pairs sharing params are decrypted together with decrypt_many
+        crib (Crib): known plaintext
+        processes (int): number of worker processes (default: every core), 1 searches in this process
+        chunk_size (int): number of (params, key) pairs in each unit of work
+        prune_keys (boolean): reject the keys that cannot produce a crib at a fixed position before decrypting
+            (see cribs.key_constraint)
+        """
+
+        self.cipher_factory = cipher_factory
+        self.keyspace = keyspace
+        self.crib = crib
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.prune_keys = prune_keys
+
+    def run(self, ciphertext, stop_on_first=False):
+        """
+        Parameters
+        ----------
+        ciphertext (string): ciphertext to decrypt
+        stop_on_first (boolean): stop the search after the first hit
+
+        Returns
+        -------
+        generator of Hit, streamed as units of work complete (not in key space order with several processes)
+        """
+
+        units = self._units(ciphertext)
+        if self.processes == 1:
+            results = (_search_unit(unit) for unit in units)
+            for hit in self._hits(results, stop_on_first):
+                yield hit
+            return
+
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            for hit in self._hits(self._imap(pool, units), stop_on_first):
+                yield hit
+        finally:
+            # also reached when the caller stops consuming hits early
+            pool.terminate()
+            pool.join()
+
+    def _units(self, ciphertext):
+        keyspace = iter(self.keyspace)
+        while True:
+            chunk = list(islice(keyspace, self.chunk_size))
+            if not chunk:
+                return
+            yield self.cipher_factory, ciphertext, self.crib, chunk, self.prune_keys
+
+    def _imap(self, pool, units):
+        """
+        Submit units of work to the pool, keeping a bounded number in flight so the key space is consumed lazily,
+        and yield their results as they complete (in any order), so a slow unit does not hold back the others
+        """
+
+        max_pending = 2 * self.processes
+        units = iter(units)
+        pending = []
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_pending:
+                unit = next(units, None)
+                if unit is None:
+                    exhausted = True
+                else:
+                    pending.append(pool.apply_async(_search_unit, (unit,)))
+            if not pending:
+                return
+
+            done = [result for result in pending if result.ready()]
+            if not done:
+                pending[0].wait(POLL_SECONDS)
+                continue
+            for result in done:
+                pending.remove(result)
+                yield result.get()
+
+    @staticmethod
+    def _hits(results, stop_on_first):
+        for hits in results:
+            for hit in hits:
+                yield hit
+                if stop_on_first:
+                    return
+
+
+def _search_unit(unit):
+    """
+    Decrypt one unit of work and return the hits (runs in a worker process)
+    """
+
+    cipher_factory, ciphertext, crib, chunk, prune_keys = unit
+    hits = []
+    for params, pairs in groupby(chunk, key=lambda pair: pair[0]):
+        keys = [key for _, key in pairs]
+        cipher = cipher_factory(params)
+        constraint = cribs.key_constraint(cipher, ciphertext, crib) if prune_keys else None
+        if constraint is not None:
+            keys = constraint.filter(keys)
+            if not keys:
+                continue
+        candidates = cipher.decrypt_many(ciphertext, keys)
+        for i_key in np.flatnonzero(crib.matches(candidates)):
+            hits.append(Hit(params, keys[i_key], engine.render(candidates[i_key], ciphertext)))
+
+    return hits
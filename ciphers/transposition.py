@@ -0,0 +1,122 @@
+import numpy as np
+
+import scoring
+from cache import lru_cache
+from scytale import Scytale
+
+BLOCK_SIZE = 1 << 22  # gathered window scores per key block
+
+
+@lru_cache(maxsize=16)
+def stride_indices(num_chars):
+    """
+    Gather indices of every Scytale period for one message length.
+    The gather for (key, init_offset) is row key plus init_offset, applied to the ciphertext repeated twice, so
+    the num_chars x num_chars x num_chars indices of every pair are never built
+
+    Parameters:
+        num_chars (int): length of the text
+
+    Returns:
+        strides (np.ndarray): read-only num_chars x num_chars array, strides[key, i] = (i*key) % num_chars
+    """
+
+    i_chars = np.arange(num_chars, dtype=np.intp)
+    strides = (i_chars[:, np.newaxis] * i_chars[np.newaxis, :]) % max(num_chars, 1)
+    strides.flags.writeable = False
+
+    return strides
+
+
+class TranspositionSolver(object):
+    """
+    Exhaustive search of Scytale periods and offsets, ranked by n-gram fitness.
+    For a period the n-gram starting at each ciphertext position is fixed (the characters key apart), so each
+    period costs one n-gram lookup per character and every offset is then scored with one gather and sum
+    """
+
+    def __init__(self, scorer):
+        """
+        Parameters
+        ----------
+        scorer (scoring.NgramTable): n-gram fitness (e.g., digraphs for a quick pass, quadgrams to rank)
+        """
+
+        self.scorer = scorer
+
+    def scores(self, text):
+        """
+        Parameters
+        ----------
+        text (string): ciphertext
+
+        Returns
+        -------
+        scores (np.ndarray): num_chars x num_chars fitness of the decryption under each (key, init_offset),
+            equal to scorer.score of that decryption (-inf for the degenerate key 0)
+        """
+
+        letters = scoring.letter_indices(text)[0]
+        num_chars = len(letters)
+        scores = np.full([num_chars, num_chars], -np.inf)
+        n = self.scorer.n
+        if num_chars < 2:
+            return scores
+
+        num_windows = num_chars - n + 1
+        if num_windows <= 0:
+            scores[1:] = 0.
+            return scores
+
+        strides = stride_indices(num_chars)
+        offsets = np.arange(num_chars)[:, np.newaxis]
+        doubled_letters = np.tile(letters, 2)
+        block_size = max(BLOCK_SIZE // (num_chars * num_windows), 1)
+        for start in xrange(1, num_chars, block_size):
+            keys = np.arange(start, min(start + block_size, num_chars))
+            # n-gram read from each ciphertext position with each key: characters at s, s + key, s + 2*key, ...
+            ngrams = doubled_letters[np.arange(num_chars)[np.newaxis, :, np.newaxis] +
+                                     strides[keys][:, np.newaxis, :n]]
+            window_scores = self.scorer.window_scores(ngrams.reshape(-1, n)).reshape(len(keys), num_chars)
+            doubled_scores = np.tile(window_scores, 2)
+            for i_key, key in enumerate(keys):
+                # plaintext window i starts at ciphertext position init_offset + i*key
+                gather = offsets + strides[key, :num_windows]
+                scores[key] = doubled_scores[i_key][gather].sum(axis=1)
+
+        return scores
+
+    def rank(self, text, top=10, distinct_keys=False):
+        """
+        With a key coprime to the length every offset decrypts to a rotation of the same plaintext, so the offsets
+        of the right key score almost the same; distinct_keys ranks periods instead
+
+        Parameters
+        ----------
+        text (string): ciphertext
+        top (int): number of keys to return
+        distinct_keys (bool): keep only the best offset of each key
+
+        Returns
+        -------
+        list of (score, key, init_offset, plaintext), best first
+        """
+
+        scores = self.scores(text)
+        if distinct_keys:
+            best_offsets = np.argmax(scores, axis=1)
+            scores = np.where(np.arange(scores.shape[1]) == best_offsets[:, np.newaxis], scores, -np.inf)
+        flat = scores.ravel()
+        top = min(top, np.count_nonzero(flat > -np.inf))
+        if top <= 0:
+            return []
+
+        best = np.argpartition(-flat, top - 1)[:top]
+        best = best[np.argsort(-flat[best], kind='mergesort')]
+        cipher = Scytale()
+        ranking = []
+        for i_pair in best:
+            key, init_offset = divmod(int(i_pair), scores.shape[1])
+            ranking.append((float(flat[i_pair]), key, init_offset, cipher.decrypt(text, key, init_offset)))
+
+        return ranking
@@ -1,12 +1,11 @@
 import string
-from copy import copy
-import numpy as np
-import re
 
-from cipher import Cipher
+import fractionation
+import normalize
+from alphabet import Alphabet
 
 
-class Trifid(Cipher):
+class Trifid(fractionation.FractionationCipher):
     """
     The trifid cipher is a classical cipher invented by Felix Delastelle and described in 1902. Extending the principles
     of Delastelle's earlier bifid cipher, it combines the techniques of fractionation and transposition to achieve a
@@ -15,87 +14,17 @@ class Trifid(Cipher):
     """
 
     def __init__(self, cube):
-        super(Trifid, self).__init__()
-        self.cube = cube
-
-    def encrypt(self, text, key):
         """
-        Parameters:
-            text (string): plaintext
-            key (int): period for encryption
-
-        Note: foreign characters are removed
-
-        Returns:
-            ciphertext (string)
+        Parameters
+        ----------
+        cube (Cube): tableau of the cipher
         """
 
-        plaintext = copy(text).lower()
-        plaintext = re.sub('[^%s]' % self.cube.alphabet, '', plaintext)
-        ciphertext = list(plaintext)
-
-        block_char_indices = np.zeros([3, key], dtype=np.uint8)
-        block_chars = 0  # intra-block characters
-        for i, pc in enumerate(plaintext):
-            i_cube, j_cube, k_cube = self.cube.get_coordinates(pc)
-            block_char_indices[0, block_chars] = i_cube
-            block_char_indices[1, block_chars] = j_cube
-            block_char_indices[2, block_chars] = k_cube
-            block_chars += 1
-
-            if block_chars == key or i == len(plaintext) - 1:
-                # we're at the end of a block or message; dump the existing buffer to ciphertext
-                i_fractioned = block_char_indices[:,:block_chars].flatten()
-                i_fractioned = np.asarray([i_fractioned[::3], i_fractioned[1::3], i_fractioned[2::3]])
-                for i_block_char in xrange(block_chars):
-                    i_pc = i - block_chars + i_block_char + 1
-                    ciphertext[i_pc] = self.cube.get_character(
-                        i_fractioned[0, i_block_char],
-                        i_fractioned[1, i_block_char],
-                        i_fractioned[2, i_block_char]
-                    )
-            block_chars %= key
-
-        return ''.join(ciphertext)
-
-    def decrypt(self, text, key):
-        """
-        Parameters:
-            text (string): ciphertext
-            key (int): rotation value for alphabet
+        super(Trifid, self).__init__(cube)
 
-        Note: foreign characters are removed
-
-        Returns:
-            plaintext (string)
-        """
-
-        ciphertext = copy(text).lower()
-        ciphertext = re.sub('[^%s]' % self.cube.alphabet, '', ciphertext)
-        plaintext = list(ciphertext)
-
-        block_char_indices = np.zeros(3*key, dtype=np.uint8)
-        block_chars = 0  # intra-block characters
-        for i, cc in enumerate(ciphertext):
-            i_cube, j_cube, k_cube = self.cube.get_coordinates(cc)
-            block_char_indices[3*block_chars] = i_cube
-            block_char_indices[3*block_chars+1] = j_cube
-            block_char_indices[3*block_chars+2] = k_cube
-            block_chars += 1
-
-            if block_chars == key or i == len(plaintext) - 1:
-                i_unfractionated = block_char_indices[:3*block_chars].reshape([3, block_chars])
-                # we're at the end of a block or message; dump the existing buffer to plaintext
-                for i_block_char in xrange(block_chars):
-                    i_cc = i - block_chars + i_block_char + 1
-                    plaintext[i_cc] = self.cube.get_character(
-                        i_unfractionated[0, i_block_char],
-                        i_unfractionated[1, i_block_char],
-                        i_unfractionated[2, i_block_char]
-                    )
-            block_chars %= key
-
-        return ''.join(plaintext)
+    @property
+    def cube(self):
+        return self._tableau
 
 
 class Cube(object):
@@ -107,11 +36,13 @@ class Cube(object):
         """
         Parameters
         ----------
-        alphabet (string): character string (layer-row-column ordered) with length a cube of the size
+        alphabet (string or Alphabet): character string (layer-row-column ordered) with length a cube of the size
             e.g., 2**3 = 8, 3**3 = 27
             Note: by default, forms a cube with the standard lowercase english letters with a ? mark
         """
 
+        if isinstance(alphabet, Alphabet):
+            alphabet = alphabet.characters
         if alphabet is None:
             self.alphabet = string.ascii_lowercase + '?'
         else:
@@ -121,6 +52,37 @@ class Cube(object):
         if self.height**3 != len(self.alphabet):
             raise ValueError("alphabet can not be placed into cube (wrong size)")
 
+        self._alphabet, self._cell_coordinates, self.cell_codes = fractionation.build_cell_lookup(
+            self.alphabet, (self.height, self.height, self.width)
+        )
+        self.normalizer = normalize.Normalizer(self._alphabet)  # lowercases and drops characters outside the cube
+
+    def encode(self, text):
+        """
+        Parameters
+        ----------
+        text (string): characters within the cube
+
+        Returns
+        -------
+        coords (np.ndarray): n x 3 array of (layer, row, col) indices of the characters in the cube
+        """
+
+        return fractionation.encode(text, self._alphabet, self._cell_coordinates)
+
+    def decode(self, coords):
+        """
+        Parameters
+        ----------
+        coords (np.ndarray): n x 3 array of (layer, row, col) indices into the cube
+
+        Returns
+        -------
+        text (string): characters at the coordinates
+        """
+
+        return fractionation.decode(coords, self.cell_codes)
+
     def get_coordinates(self, c):
         """
         Parameters
@@ -133,12 +95,9 @@ class Cube(object):
             k (int): col index of character in cube
         """
 
-        c_id = self.alphabet.index(c)
-        i = int(c_id / (self.width * self.height))
-        j = int((c_id % (self.width * self.height)) / self.width)
-        k = int((c_id % (self.width * self.height)) % self.width)
+        i, j, k = self.encode(c)[0]
 
-        return i, j, k
+        return int(i), int(j), int(k)
 
     def get_character(self, i, j, k):
         """
@@ -0,0 +1,289 @@
+import cPickle as pickle
+import heapq
+import os
+import random
+import time
+
+import numpy as np
+
+import fractionation
+import scoring
+from trifid import Trifid, Cube
+
+
+class TrifidSearch(object):
+    """
+    Search cube layouts and periods together for a Trifid ciphertext.
+    Runs cycles of simulated annealing from random starts; a move swaps two cells of the cube (rescored
+    incrementally against the precomputed coordinate sources of the current period), swaps two whole layers, rows
+    or columns, or jumps to another period.
+    The best distinct keys found are kept in a top-K heap, and progress can be checkpointed and resumed
+    """
+
+    def __init__(self, ciphertext, scorer, periods=None, alphabet=None, top_k=10, cycle_iterations=50000,
+                 start_temperature=20., end_temperature=1., period_probability=0.01, slice_probability=0.05,
+                 checkpoint_path=None, checkpoint_interval=60.):
+        """
+        Parameters
+        ----------
+        ciphertext (string): ciphertext
+        scorer (scoring.NgramTable): n-gram fitness
+        periods (iterable of int): periods to search (default: every period up to the message length)
+        alphabet (string): characters of the cube, in any order (see Cube)
+        top_k (int): number of best keys to keep
+        cycle_iterations (int): moves per annealing cycle
+        start_temperature (float): temperature at the start of each cycle (in log10 score units)
+        end_temperature (float): temperature at the end of each cycle, reached geometrically
+        period_probability (float): probability that a move changes the period instead of swapping cells
+        slice_probability (float): probability that a move swaps two whole layers, rows or columns of the cube
+        checkpoint_path (string): file to save progress to and resume from, or None
+        checkpoint_interval (float): minimum seconds between checkpoints (saved at the end of a cycle)
+        """
+
+        self.scorer = scorer
+        self.top_k = top_k
+        self.cycle_iterations = cycle_iterations
+        self.start_temperature = start_temperature
+        self.end_temperature = end_temperature
+        self.period_probability = period_probability
+        self.slice_probability = slice_probability
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+
+        template = Cube(alphabet=alphabet)
+        self.symbols = template.alphabet
+        self.ciphertext = Trifid(template)._normalize(ciphertext)
+        self.periods = list(periods) if periods is not None else range(1, len(self.ciphertext) + 1)
+        self._symbol_ids = template.encode(self.ciphertext).dot([template.width*template.height, template.width, 1])
+        self._symbol_letters = scoring.letter_indices(self.symbols)[0]
+        self._shape = (template.height, template.height, template.width)
+        self._states = {}  # period -> fractionation.IncrementalDecryption
+
+        self.iterations = 0
+        self.cycles = 0
+        self._heap = []  # (score, period, layout) min-heap of the best keys
+        self._rng_state = None
+        self._cycle_state = None  # (period, layout, score, step, temperature, best) of a cycle cut short
+
+    def run(self, max_iterations=None, max_seconds=None, seed=None, on_checkpoint=None):
+        """
+        Search until the budget is spent, resuming from the checkpoint file if there is one.
+        Checkpoints are taken between cycles, and when the budget is spent with the state of the cycle it cut short,
+        so a search that is checkpointed and resumed makes the same moves as one that is not
+
+        Parameters
+        ----------
+        max_iterations (int): total moves (across resumed runs) to stop after, or None
+        max_seconds (float): wall time of this run to stop after, or None
+        seed (int): random seed (ignored when resuming)
+        on_checkpoint (function): called with the search at each checkpoint, e.g., to save its progress elsewhere
+
+        Returns
+        -------
+        list of (score, period, cube), best first
+        """
+
+        if max_iterations is None and max_seconds is None:
+            raise ValueError("a search budget (max_iterations or max_seconds) is required")
+
+        rng = random.Random(seed)
+        if self.checkpoint_path is not None and os.path.exists(self.checkpoint_path):
+            self.load_checkpoint()
+        if self._rng_state is not None:
+            rng.setstate(self._rng_state)
+
+        start_time = last_checkpoint = time.time()
+        deadline = start_time + max_seconds if max_seconds is not None else None
+        while max_iterations is None or self.iterations < max_iterations:
+            if deadline is not None and time.time() >= deadline:
+                break
+            if self._cycle(rng, max_iterations, deadline):
+                self.cycles += 1
+            self._rng_state = rng.getstate()
+            if time.time() - last_checkpoint >= self.checkpoint_interval:
+                self._checkpoint(on_checkpoint)
+                last_checkpoint = time.time()
+
+        self._checkpoint(on_checkpoint)
+
+        return self.results()
+
+    def results(self):
+        """
+        Returns
+        -------
+        list of (score, period, cube), best first
+        """
+
+        return [(score, period, self.cube(layout)) for score, period, layout in sorted(self._heap, reverse=True)]
+
+    def cube(self, layout):
+        """
+        Parameters
+        ----------
+        layout (sequence of int): symbol id at each cell
+
+        Returns
+        -------
+        (Cube)
+        """
+
+        return Cube(alphabet=''.join(self.symbols[i] for i in layout))
+
+    def progress(self):
+        """
+        Returns
+        -------
+        (dict): picklable search progress: iterations, cycles, top-K heap, random state and the state of a cycle cut
+            short by the budget
+        """
+
+        return dict(iterations=self.iterations, cycles=self.cycles, heap=list(self._heap), rng_state=self._rng_state,
+                    cycle=self._cycle_state)
+
+    def restore(self, progress):
+        """
+        Parameters
+        ----------
+        progress (dict): search progress to resume from (see progress)
+        """
+
+        self.iterations = progress['iterations']
+        self.cycles = progress['cycles']
+        self._heap = list(progress['heap'])
+        self._rng_state = progress['rng_state']
+        self._cycle_state = progress.get('cycle')
+
+    def save_checkpoint(self):
+        """
+        Atomically write the search progress to the checkpoint file
+        """
+
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(self.progress(), f, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, self.checkpoint_path)
+
+    def _checkpoint(self, on_checkpoint):
+        if self.checkpoint_path is not None:
+            self.save_checkpoint()
+        if on_checkpoint is not None:
+            on_checkpoint(self)
+
+    def load_checkpoint(self):
+        """
+        Restore the search progress from the checkpoint file
+        """
+
+        with open(self.checkpoint_path, 'rb') as f:
+            self.restore(pickle.load(f))
+
+    def _state(self, period, layout):
+        """
+        Parameters
+        ----------
+        period (int): period of the cipher
+        layout (sequence of int): symbol id at each cell
+
+        Returns
+        -------
+        (fractionation.IncrementalDecryption): decryption for the period (built once), set to the layout
+        """
+
+        if period not in self._states:
+            self._states[period] = fractionation.IncrementalDecryption(
+                self._symbol_ids, self._shape, period, self.scorer, self._symbol_letters, layout
+            )
+        else:
+            self._states[period].set_layout(layout)
+
+        return self._states[period]
+
+    def _cycle(self, rng, max_iterations, deadline):
+        """
+        Anneal from a random cube and period, recording the best key of the cycle in the top-K heap.
+        A cycle cut short by the budget keeps its state, and the next call continues it
+
+        Returns
+        -------
+        (boolean): whether the cycle ran to its end
+        """
+
+        num_cells = len(self.symbols)
+        num_steps = max(self.cycle_iterations - 1, 1)
+        cooling = (max(self.end_temperature, 1e-9) / self.start_temperature) ** (1. / num_steps)
+        if self._cycle_state is None:
+            layout = range(num_cells)
+            rng.shuffle(layout)
+            state = self._state(rng.choice(self.periods), layout)
+            best = (state.score, state.period, tuple(state.symbol_at))
+            start, temperature = 0, self.start_temperature
+        else:
+            period, layout, score, start, temperature, best = self._cycle_state
+            state = self._state(period, layout)
+            state.score = score  # the score as rescored incrementally, so that moves are accepted alike
+            self._cycle_state = None
+
+        for i in xrange(start, self.cycle_iterations):
+            if ((max_iterations is not None and self.iterations >= max_iterations) or
+                    (deadline is not None and i % 1000 == 0 and time.time() >= deadline)):
+                self._cycle_state = (state.period, state.symbol_at.tolist(), state.score, i, temperature, best)
+                return False
+            self.iterations += 1
+
+            move = rng.random()
+            if len(self.periods) > 1 and move < self.period_probability:
+                candidate = self._state(rng.choice(self.periods), state.symbol_at)
+                if scoring.accept_move(candidate.score - state.score, temperature, rng):
+                    state = candidate
+            elif move < self.period_probability + self.slice_probability:
+                previous_layout, previous_score = state.symbol_at, state.score
+                state.set_layout(self._swap_slices(state.symbol_at, rng))
+                if not scoring.accept_move(state.score - previous_score, temperature, rng):
+                    state.set_layout(previous_layout)
+            else:
+                cell_a, cell_b = rng.sample(xrange(num_cells), 2)
+                score = state.propose_swap(cell_a, cell_b)
+                if scoring.accept_move(score - state.score, temperature, rng):
+                    state.commit()
+
+            if state.score > best[0]:
+                best = (state.score, state.period, tuple(state.symbol_at))
+            temperature *= cooling
+
+        self._push(best)
+        return True
+
+    def _swap_slices(self, layout, rng):
+        """
+        Parameters
+        ----------
+        layout (np.ndarray): symbol id at each cell
+        rng (random.Random): random source
+
+        Returns
+        -------
+        layout (np.ndarray): layout with two layers, two rows or two columns swapped
+        """
+
+        cube = layout.reshape(self._shape).copy()
+        axis = rng.randrange(3)
+        i, j = rng.sample(xrange(self._shape[axis]), 2)
+        cube = np.swapaxes(cube, 0, axis)
+        cube[[i, j]] = cube[[j, i]]
+
+        return np.swapaxes(cube, 0, axis).ravel()
+
+    def _push(self, entry):
+        """
+        Parameters
+        ----------
+        entry (tuple): (score, period, layout) to add to the top-K heap unless already present
+        """
+
+        if any(entry[1:] == kept[1:] for kept in self._heap):
+            return
+        if len(self._heap) < self.top_k:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
@@ -1,7 +1,11 @@
-import string
-from copy import copy
 import numpy as np
 
+import batch
+import compiled
+import engine
+import normalize
+from alphabet import to_alphabet
+from ciphertext import transformed
 from cipher import Cipher
 
 
@@ -14,7 +18,7 @@ class VigenereTableau(object):
         """
         Parameters
         ----------
-        alphabet (string): alphabet characters
+        alphabet (string or Alphabet): alphabet characters
         row_fill (int): number of extra rows to append (cycling through alphabet)
         col_fill (int): number of extra cols to append (cycling through alphabet)
 
@@ -25,19 +29,21 @@ class VigenereTableau(object):
                 VigenereTableau(alphabet="KRYPTOSABCDEFGHIJLMNQUVWXZ", row_fill=0, col_fill=4)
         """
 
-        if alphabet is None:
-            alphabet = str(string.ascii_lowercase)
-        self.alphabet = copy(alphabet).lower()
+        self._alphabet = to_alphabet(alphabet)
+        self.alphabet = self._alphabet.characters
         self._row_fill = row_fill
         self._col_fill = col_fill
 
-        num_alphabet_chars = len(alphabet)
+        num_alphabet_chars = len(self.alphabet)
         num_tableau_cols = num_alphabet_chars + col_fill
         num_tableau_rows = num_alphabet_chars + row_fill
-        self.tableau = np.zeros([num_tableau_rows, num_tableau_cols], dtype=np.uint8)  # indices into alphabet array
-        for i in xrange(num_tableau_rows):
-            for j in xrange(num_tableau_cols):
-                self.tableau[i, j] = (i + j) % num_alphabet_chars
+        # indices into alphabet array
+        rows = np.arange(num_tableau_rows)[:, np.newaxis]
+        self.tableau = ((rows + np.arange(num_tableau_cols)) % num_alphabet_chars).astype(np.uint8)
+
+        self.normalizer = normalize.Normalizer(self._alphabet)  # lowercases and splits off foreign characters
+        # column holding each alphabet index in each row (first occurrence), i.e., the inverse of a tableau row
+        self._inverse = ((np.arange(num_alphabet_chars) - rows) % num_alphabet_chars).astype(np.uint8)
 
     def encrypt_char(self, c, kc):
         """
@@ -53,11 +59,11 @@ class VigenereTableau(object):
         (char): encrypted character
         """
 
-        if c not in self.alphabet or kc not in self.alphabet:
+        if c not in self._alphabet or kc not in self._alphabet:
             return
 
-        j_tableau = self.alphabet.index(c)
-        i_tableau = self.alphabet.index(kc)
+        j_tableau = self._alphabet.index(c)
+        i_tableau = self._alphabet.index(kc)
         return self.alphabet[self.tableau[i_tableau, j_tableau]]
 
     def decrypt_char(self, c, kc):
@@ -74,14 +80,45 @@ class VigenereTableau(object):
         (char): decrypted character
         """
 
-        if c not in self.alphabet or kc not in self.alphabet:
+        if c not in self._alphabet or kc not in self._alphabet:
             return
 
-        i_c = self.alphabet.index(c)
-        i_tableau = self.alphabet.index(kc)
-        j_tableau = np.argwhere(self.tableau[i_tableau,:] == i_c)[0][0]
+        i_c = self._alphabet.index(c)
+        i_tableau = self._alphabet.index(kc)
+        j_tableau = self._inverse[i_tableau, i_c]
         return self.alphabet[j_tableau]
 
+    def encrypt_indices(self, c_ids, k_ids):
+        """
+        Encrypts an array of characters using the tableau
+
+        Parameters
+        ----------
+        c_ids (np.ndarray): alphabet indices of characters to encrypt
+        k_ids (np.ndarray): alphabet indices of key characters guiding each lookup
+
+        Returns
+        -------
+        (np.ndarray): alphabet indices of encrypted characters
+        """
+
+        return self.tableau[k_ids, c_ids]
+
+    def decrypt_indices(self, c_ids, k_ids):
+        """
+        Decrypts an array of characters using the tableau
+
+        Parameters
+        ----------
+        c_ids (np.ndarray): alphabet indices of characters to decrypt
+        k_ids (np.ndarray): alphabet indices of key characters guiding each lookup
+
+        Returns
+        -------
+        (np.ndarray): alphabet indices of decrypted characters
+        """
+
+        return self._inverse[k_ids, c_ids]
 
     def __str__(self):
         tableau_str = ""
@@ -111,52 +148,123 @@ class Vigenere(Cipher):
     def encrypt(self, text, key, include_foreign_chars=True):
         """
         Parameters:
-            text (string): plaintext
+            text (string or CipherText): plaintext
+            key (string)
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            ciphertext (string, or CipherText for a CipherText text)
+        """
+
+        return self._substitute(self.vtableau.encrypt_indices, text, key, include_foreign_chars)
+
+    def decrypt(self, text, key, include_foreign_chars=True):
+        """
+        Parameters:
+            text (string or CipherText): ciphertext
             key (string)
             include_foreign_chars (boolean): include chars outside the alphabet
 
         Returns:
-            ciphertext (string)
+            plaintext (string, or CipherText for a CipherText text)
+        """
+
+        return self._substitute(self.vtableau.decrypt_indices, text, key, include_foreign_chars)
+
+    def encrypt_batch(self, texts, keys, include_foreign_chars=True):
+        """
+        Encrypt many texts in one array operation; the key restarts at each text
+
+        Parameters:
+            texts (iterable of string): plaintexts
+            keys (string or sequence of string): key shared by every text, or one key per text
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            ciphertexts (list of string)
+        """
+
+        return self._substitute_batch(self.vtableau.encrypt_indices, texts, keys, include_foreign_chars)
+
+    def decrypt_batch(self, texts, keys, include_foreign_chars=True):
+        """
+        Decrypt many texts in one array operation; the key restarts at each text
+
+        Parameters:
+            texts (iterable of string): ciphertexts
+            keys (string or sequence of string): key shared by every text, or one key per text
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            plaintexts (list of string)
+        """
+
+        return self._substitute_batch(self.vtableau.decrypt_indices, texts, keys, include_foreign_chars)
+
+    def _stream(self, func, chunks, key, kwargs):
+        """
+        Carry the key position across chunks; it only advances on characters within the alphabet
         """
 
-        plaintext = copy(text).lower()
-        cipherkey = copy(key).lower()
-        ciphertext = list(plaintext)
         i_key = 0
-        for i, pc in enumerate(plaintext):
-            if pc not in self.vtableau.alphabet:
-                if include_foreign_chars:
-                    ciphertext[i] = pc
-                continue
+        for chunk in chunks:
+            yield func(chunk, engine.rotate(key, i_key), **kwargs)
+            i_key += len(self.vtableau.normalizer(chunk).indices)
 
-            kc = cipherkey[i_key % len(cipherkey)]
-            ciphertext[i] = self.vtableau.encrypt_char(pc, kc)
-            i_key += 1
+    def _substitute_batch(self, tableau_func, texts, keys, include_foreign_chars):
+        """
+        Parameters:
+            tableau_func (function): bulk tableau lookup taking character and key indices
+            texts (iterable of string): texts
+            keys (string or sequence of string): keys
+            include_foreign_chars (boolean): include chars outside the alphabet
 
-        return ''.join(ciphertext)
+        Returns:
+            substituted texts (list of string), lowercased
+        """
 
-    def decrypt(self, text, key, include_foreign_chars=True):
+        texts = batch.Batch(texts, lower=True)
+        indices = self.vtableau._alphabet.indices(texts.codes)
+        mask = indices != engine.NOT_IN_ALPHABET
+        # the key only advances on characters within the alphabet
+        k_ids = batch.key_stream(keys, len(texts), texts.record_ids[mask], texts.positions(mask)[mask],
+                                 lambda key: self.vtableau._alphabet.key_indices(key.lower()))
+        codes = texts.codes
+        codes[mask] = self.vtableau._alphabet.codes[tableau_func(indices[mask], k_ids)]
+        if not include_foreign_chars:
+            return texts.unpack(codes[mask], mask)
+
+        return texts.unpack(codes)
+
+    def _translation_tables(self, key):
+        k_ids = self.vtableau._alphabet.key_indices(key.lower())[:, np.newaxis]
+        alphabet_codes = self.vtableau._alphabet.codes
+        return compiled.translation_tables(
+            self.vtableau._alphabet,
+            lambda indices: alphabet_codes[self.vtableau.encrypt_indices(indices, k_ids)],
+            lambda indices: alphabet_codes[self.vtableau.decrypt_indices(indices, k_ids)],
+            alphabet_phases=True,
+            period=len(k_ids)
+        )
+
+    def _substitute(self, tableau_func, text, key, include_foreign_chars):
         """
+        Substitute every alphabet character of the text through the tableau in one array operation.
+        The key only advances on characters within the alphabet
+
         Parameters:
-            text (string): ciphertext
+            tableau_func (function): bulk tableau lookup taking character and key indices
+            text (string): text
             key (string)
             include_foreign_chars (boolean): include chars outside the alphabet
 
         Returns:
-            plaintext (string)
+            substituted text (string), lowercased
         """
 
-        ciphertext = copy(text).lower()
-        cipherkey = copy(key).lower()
-        plaintext = list(ciphertext)
-        i_key = 0
-        for i, cc in enumerate(ciphertext):
-            if cc not in self.vtableau.alphabet:
-                if include_foreign_chars:
-                    plaintext[i] = cc
-                continue
-            kc = cipherkey[i_key % len(cipherkey)]
-            plaintext[i] = self.vtableau.decrypt_char(cc, kc)
-            i_key += 1
-
-        return ''.join(plaintext)
+        normalized = self.vtableau.normalizer(text)
+        i_key = self.vtableau._alphabet.key_indices(key.lower())
+        k_ids = i_key[np.arange(len(normalized.indices)) % len(i_key)]
+        indices = tableau_func(normalized.indices, k_ids)
+
+        return transformed(text, normalized, self.vtableau._alphabet, indices, include_foreign_chars)
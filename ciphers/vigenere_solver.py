@@ -0,0 +1,199 @@
+import numpy as np
+
+import engine
+import scoring
+from vigenere import Vigenere
+
+
+class VigenereSolver(object):
+    """
+    Recover the key of a Vigenere ciphertext: find likely periods with Kasiski examination and the column index of
+    coincidence (Friedman test), then choose each key character by chi-squared over every shift of its column.
+    All statistics are histograms over the whole ciphertext, so no candidate decryptions are made
+    """
+
+    def __init__(self, tableau, frequencies=scoring.ENGLISH_FREQUENCIES):
+        """
+        Parameters
+        ----------
+        tableau (VigenereTableau): tableau the ciphertext was encrypted with (may be keyed, e.g., Kryptos)
+        frequencies (np.ndarray): expected relative frequencies of a-z in the plaintext
+        """
+
+        self.tableau = tableau
+        alphabet_letters = scoring.letter_indices(tableau.alphabet)[0]
+        is_letter = alphabet_letters != engine.NOT_IN_ALPHABET
+        # expected frequency of each tableau alphabet character (0 for symbols that are not letters)
+        self._expected = np.where(is_letter, frequencies[np.minimum(alphabet_letters, scoring.NUM_LETTERS - 1)], 0.)
+
+    def kasiski(self, text, max_period=20, min_length=3):
+        """
+        Parameters
+        ----------
+        text (string): ciphertext
+        max_period (int): largest period to vote for
+        min_length (int): length of the repeated sequences to look for
+
+        Returns
+        -------
+        votes (np.ndarray): votes[p] is the number of distances between repeated sequences divisible by period p
+        """
+
+        indices = self._alphabet_indices(text).astype(np.int64)
+        votes = np.zeros(max_period + 1, dtype=np.int64)
+        num_windows = len(indices) - min_length + 1
+        if num_windows < 2:
+            return votes
+
+        num_symbols = len(self.tableau.alphabet)
+        ids = np.zeros(num_windows, dtype=np.int64)
+        for offset in xrange(min_length):
+            ids = ids * num_symbols + indices[offset:offset + num_windows]
+
+        # distances between consecutive occurrences of each repeated sequence
+        order = np.argsort(ids, kind='mergesort')
+        repeated = ids[order][1:] == ids[order][:-1]
+        distances = (order[1:] - order[:-1])[repeated]
+
+        periods = np.arange(2, max_period + 1)
+        votes[2:] = np.count_nonzero(distances[:, np.newaxis] % periods[np.newaxis, :] == 0, axis=0)
+
+        return votes
+
+    def column_ioc(self, text, max_period=20):
+        """
+        Parameters
+        ----------
+        text (string): ciphertext
+        max_period (int): largest period to test
+
+        Returns
+        -------
+        ioc (np.ndarray): ioc[p] is the mean index of coincidence of the columns for period p
+            (near 0.066 for the correct period of english plaintext)
+        """
+
+        indices = self._alphabet_indices(text)
+        ioc = np.zeros(max_period + 1)
+        for period in xrange(1, max_period + 1):
+            counts = self._column_counts(indices, period).astype(np.float64)
+            column_len = counts.sum(axis=1)
+            pairs = column_len * (column_len - 1)
+            coincidences = (counts * (counts - 1)).sum(axis=1)
+            ioc[period] = coincidences.sum() / max(pairs.sum(), 1.)
+
+        return ioc
+
+    def rank_periods(self, text, max_period=20):
+        """
+        Rank periods by combining both tests: the column index of coincidence is also high for multiples of the
+        period, while Kasiski votes are also high for its small divisors
+
+        Parameters
+        ----------
+        text (string): ciphertext
+        max_period (int): largest period to test
+
+        Returns
+        -------
+        periods (list of int): periods, most likely first
+        """
+
+        ioc = self.column_ioc(text, max_period)[1:]
+        votes = self.kasiski(text, max_period)[1:].astype(np.float64)
+        votes[0] = votes.max()  # every distance is divisible by 1
+        ioc_score = ioc / max(ioc.max(), 1e-12)
+        kasiski_score = (votes + 1) / (votes.max() + 1)
+        ranking = np.argsort(-(ioc_score * kasiski_score), kind='mergesort')
+
+        return [int(i_period) + 1 for i_period in ranking]
+
+    def recover_key(self, text, period):
+        """
+        Parameters
+        ----------
+        text (string): ciphertext
+        period (int): key length
+
+        Returns
+        -------
+        key (string): key character minimizing the chi-squared statistic of each column
+        """
+
+        return self._chi_squared(text, period)[0]
+
+    def solve(self, text, max_period=20):
+        """
+        Parameters
+        ----------
+        text (string): ciphertext
+        max_period (int): largest period to test
+
+        Returns
+        -------
+        key (string): recovered key for the most likely period
+        plaintext (string): decryption with that key
+        """
+
+        key = self.recover_key(text, self.rank_periods(text, max_period)[0])
+        return key, Vigenere(self.tableau).decrypt(text, key)
+
+    def _chi_squared(self, text, period):
+        """
+        Parameters
+        ----------
+        text (string): ciphertext
+        period (int): key length
+
+        Returns
+        -------
+        key (string): best key
+        chi2 (np.ndarray): period x num_alphabet_chars chi-squared statistic of each column under each key character
+        """
+
+        num_alphabet_chars = len(self.tableau.alphabet)
+        counts = self._column_counts(self._alphabet_indices(text), period).astype(np.float64)
+
+        # plaintext histogram of each column under each key character: the tableau row of a key character
+        # maps ciphertext indices to plaintext indices one to one, so the column histogram is just permuted
+        inverse = self.tableau._inverse[:num_alphabet_chars]
+        key_rows = np.arange(num_alphabet_chars)[:, np.newaxis]
+        plain_counts = np.zeros([period, num_alphabet_chars, num_alphabet_chars])
+        plain_counts[:, key_rows, inverse] = counts[:, np.newaxis, :]
+
+        expected = counts.sum(axis=1)[:, np.newaxis, np.newaxis] * self._expected[np.newaxis, np.newaxis, :]
+        chi2 = (((plain_counts - expected) ** 2) / np.maximum(expected, 1e-3)).sum(axis=2)
+        key_ids = np.argmin(chi2, axis=1)
+
+        return engine.render(self.tableau._alphabet.codes[key_ids], self.tableau.alphabet), chi2
+
+    def _alphabet_indices(self, text):
+        """
+        Parameters
+        ----------
+        text (string): ciphertext
+
+        Returns
+        -------
+        indices (np.ndarray): alphabet indices of the characters within the alphabet (the key skips the others)
+        """
+
+        return self.tableau.normalizer(text).indices
+
+    def _column_counts(self, indices, period):
+        """
+        Parameters
+        ----------
+        indices (np.ndarray): alphabet indices of the ciphertext
+        period (int): key length
+
+        Returns
+        -------
+        counts (np.ndarray): period x num_alphabet_chars histogram of each key column
+        """
+
+        num_alphabet_chars = len(self.tableau.alphabet)
+        columns = np.arange(len(indices)) % period
+        counts = np.bincount(columns * num_alphabet_chars + indices, minlength=period * num_alphabet_chars)
+
+        return counts.reshape([period, num_alphabet_chars])
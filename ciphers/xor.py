@@ -1,6 +1,10 @@
-import string
-from copy import copy
+import numpy as np
 
+import batch
+import compiled
+import engine
+from alphabet import to_alphabet
+from ciphertext import accepts_ciphertext
 from cipher import Cipher
 
 
@@ -9,42 +13,153 @@ class Xor(Cipher):
     An XOR symmetric cipher (chars -> ASCII bytes -> XOR)
     """
 
-    def __init__(self):
+    def __init__(self, alphabet=None):
+        """
+        Parameters
+        ----------
+        alphabet (string or Alphabet): characters to XOR; the others are foreign (default: the lowercase english
+            letters)
+        """
+
         super(Xor, self).__init__()
 
-        self._alphabet = str(string.ascii_lowercase)
+        self._alphabet = to_alphabet(alphabet)
 
+    @accepts_ciphertext
     def encrypt(self, text, key, include_foreign_chars=True):
         """
         Parameters:
-            text (string): plaintext
+            text (string or CipherText): plaintext
             key (string): key that wraps around
             include_foreign_chars (boolean): include chars outside the alphabet
 
         Returns:
-            ciphertext (string)
+            ciphertext (string, or CipherText for a CipherText text)
         """
 
-        plaintext = copy(text).lower()
-        ciphertext = list(plaintext)
-        for i, pc in enumerate(plaintext):
-            if pc not in self._alphabet:
-                if include_foreign_chars:
-                    ciphertext[i] = pc
-                continue
-            ciphertext[i] = chr(ord(pc) ^ ord(key[i % len(key)]))
+        codes, indices, mask = self._alphabet.encode(text.lower())
+        key_codes = engine.to_codes(key)
+        if len(key_codes) == 0:
+            raise ValueError("key is empty")
+        # the key is indexed by the position of the character in the text, foreign characters included
+        positions = np.flatnonzero(mask)
+        codes[positions] = codes[positions] ^ key_codes[positions % len(key_codes)]
+        if not include_foreign_chars:
+            codes = codes[mask]
 
-        return ''.join(ciphertext)
+        return engine.render(codes, text)
 
+    @accepts_ciphertext
     def decrypt(self, text, key, include_foreign_chars=True):
         """
         Parameters:
-            text (string): ciphertext
+            text (string or CipherText): ciphertext
             key (string): key that wraps around
             include_foreign_chars (boolean): include chars outside the alphabet
 
         Returns:
-            plaintext (string)
+            plaintext (string, or CipherText for a CipherText text)
         """
 
         return self.encrypt(text, key, include_foreign_chars)
+
+    def encrypt_batch(self, texts, keys, include_foreign_chars=True):
+        """
+        Encrypt many texts in one array operation; the key restarts at each text
+
+        Parameters:
+            texts (iterable of string): plaintexts
+            keys (string or sequence of string): key shared by every text, or one key per text
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            ciphertexts (list of string)
+        """
+
+        texts = batch.Batch(texts, lower=True)
+        mask = self._alphabet.indices(texts.codes) != engine.NOT_IN_ALPHABET
+        # the key is indexed by the position of the character in its text, foreign characters included
+        key_codes = batch.key_stream(keys, len(texts), texts.record_ids[mask], texts.positions()[mask],
+                                     engine.to_codes)
+        codes = texts.codes
+        codes[mask] = codes[mask] ^ key_codes
+        if not include_foreign_chars:
+            return texts.unpack(codes[mask], mask)
+
+        return texts.unpack(codes)
+
+    def decrypt_batch(self, texts, keys, include_foreign_chars=True):
+        """
+        Parameters:
+            texts (iterable of string): ciphertexts
+            keys (string or sequence of string): key shared by every text, or one key per text
+            include_foreign_chars (boolean): include chars outside the alphabet
+
+        Returns:
+            plaintexts (list of string)
+        """
+
+        return self.encrypt_batch(texts, keys, include_foreign_chars)
+
+    def encrypt_bytes(self, data, key, out=None, text_mode=False):
+        """
+        XOR binary data against the repeating key without decoding or intermediate copies
+
+        Parameters:
+            data (bytes, bytearray, memoryview or mmap): plaintext
+            key (bytes): key that wraps around
+            out (writable bytes-like): buffer of the same length to write the ciphertext to; may be data itself
+            text_mode (boolean): lowercase the data and only XOR characters in the alphabet, like encrypt
+
+        Returns:
+            ciphertext (writable bytes-like): out, or a new bytearray
+        """
+
+        src = engine.buffer_codes(data)
+        key_codes = engine.buffer_codes(key)
+        if len(key_codes) == 0:
+            raise ValueError("key is empty")
+        out, dst = engine.prepare_output(src, out)
+
+        for src_block, dst_block, key_block in engine.keyed_blocks(src, dst, key_codes):
+            if text_mode:
+                lowered = engine.LOWER_TABLE[src_block]
+                dst_block[:] = lowered
+                in_alphabet = self._alphabet.byte_lookup[lowered] != engine.NOT_IN_ALPHABET
+                np.bitwise_xor(lowered, key_block, out=dst_block, where=in_alphabet)
+            else:
+                np.bitwise_xor(src_block, key_block, out=dst_block)
+
+        return out
+
+    def decrypt_bytes(self, data, key, out=None, text_mode=False):
+        """
+        Parameters:
+            data (bytes, bytearray, memoryview or mmap): ciphertext
+            key (bytes): key that wraps around
+            out (writable bytes-like): buffer of the same length to write the plaintext to; may be data itself
+            text_mode (boolean): lowercase the data and only XOR characters in the alphabet, like decrypt
+
+        Returns:
+            plaintext (writable bytes-like): out, or a new bytearray
+        """
+
+        return self.encrypt_bytes(data, key, out, text_mode)
+
+    def _stream(self, func, chunks, key, kwargs):
+        """
+        Carry the key offset across chunks; it advances on every character
+        """
+
+        i_key = 0
+        for chunk in chunks:
+            yield func(chunk, engine.rotate(key, i_key), **kwargs)
+            i_key += len(chunk)
+
+    def _translation_tables(self, key):
+        key_codes = engine.to_codes(key)[:, np.newaxis]
+        if len(key_codes) == 0:
+            raise ValueError("key is empty")
+        xor = lambda indices: self._alphabet.codes[indices] ^ key_codes
+
+        return compiled.translation_tables(self._alphabet, xor, xor, period=len(key_codes))
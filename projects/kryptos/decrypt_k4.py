@@ -1,4 +1,19 @@
+from ciphers import cribs
+from ciphers.search import Crib
+from ciphers.vigenere import VigenereTableau, Vigenere
+
 ciphertext = "OBKRUOXOGHULBSOLIFBBWFLRVQQPRNGKSSOTWTQSJQSSEKZZWATJKLUDIAWINFBNYPVTTMZFPKWGDKZXTJCDIGKUHUAUEKCAR"
 
+kryptos_alphabet = "KRYPTOSABCDEFGHIJLMNQUVWXZ"
+cipher = Vigenere(VigenereTableau(alphabet=kryptos_alphabet, row_fill=0, col_fill=4))
+
+# key characters a Vigenere over the K1/K2 tableau would need under the crib, and the key lengths they allow
+constraint = cribs.key_constraint(cipher, ciphertext, Crib("BERLINCLOCK", position=63))
+print "K4 keystream under BERLINCLOCK:", constraint.key_stream
+for period in xrange(1, 27):
+    partial_key = constraint.partial_key(period)
+    if partial_key is not None:
+        print period, partial_key
+
 #NYPVTTMZFPK
 #BERLINCLOCK
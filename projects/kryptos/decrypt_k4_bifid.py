@@ -1,23 +1,40 @@
-from ciphers.bifid import Bifid, PolybiusSquare
+import os
+import sys
+import tempfile
+
+from ciphers import factory
+from ciphers.bifid import Bifid
+from ciphers.jobs import JobStore, SearchJob
+from ciphers.keyspace import Periods, PolybiusVariants, Product, keyword_alphabet
+from ciphers.search import Crib, KeySearch
 
 ciphertext = "OBKRUOXOGHULBSOLIFBBWFLRVQQPRNGKSSOTWTQSJQSSEKZZWATJKLUDIAWINFBNYPVTTMZFPKWGDKZXTJCDIGKUHUAUEKCAR"
 
-remaining_chars = "ABCDEFGHIJLMNQUVWXZ"
-for i_alpha_missing in xrange(len(remaining_chars)):
-    # form alphabet with removed char
-    alpha_missing = remaining_chars[i_alpha_missing]
-    alphabet = "KRYPTOS" + remaining_chars[:i_alpha_missing] + remaining_chars[i_alpha_missing+1:]
-    for map_char in alphabet:
-        # form all mappings between chars
-        char_map = (alpha_missing.lower(), map_char.lower())
-        for period in xrange(1, 98):
-            # test all periods up to cipher length
-            tableau = PolybiusSquare(alphabet=alphabet, char_map=char_map)
-            plaintext = Bifid(tableau).decrypt(ciphertext, period)
-            if plaintext[63:69] == "BERLIN":
-                print "CORRECT"
-                print plaintext
+
+def bifid_cipher(params):
+    alphabet, char_map = params
+    return Bifid(factory.polybius_square(alphabet, char_map))
+
+
+def keyspace():
+    # drop each letter outside the keyword from the kryptos alphabet and merge it into each letter of the square,
+    # then test all periods up to cipher length
+    alphabets = PolybiusVariants(keyword_alphabet("KRYPTOS"), droppable="abcdefghijlmnquvwxz")
+    return Product(alphabets, Periods(1, 98))
+
+
+if __name__ == '__main__':
+    # progress and hits are saved to the store, so an interrupted sweep resumes where it stopped; the store is the
+    # first argument, else $K4_BIFID_STORE, else a file in the temporary directory
+    path = sys.argv[1] if len(sys.argv) > 1 else os.environ.get("K4_BIFID_STORE")
+    store = JobStore(path or os.path.join(tempfile.gettempdir(), "k4_bifid.db"))
+    search = KeySearch(bifid_cipher, keyspace(), Crib("BERLINCLOCK", position=63), chunk_size=97*25)
+    SearchJob(store, "bifid", search, ciphertext).run()
+    for hit in store.results(job="bifid"):
+        print "CORRECT"
+        print hit.params, hit.key
+        print hit.plaintext
 
 
 #NYPVTTMZFPK
-#BERLINCLOCK
\ No newline at end of file
+#BERLINCLOCK
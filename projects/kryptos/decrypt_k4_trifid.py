@@ -1,15 +1,21 @@
+import numpy as np
+
+from ciphers import cribs, engine
+from ciphers.search import Crib
 from ciphers.trifid import Trifid, Cube
 
 ciphertext = "OBKRUOXOGHULBSOLIFBBWFLRVQQPRNGKSSOTWTQSJQSSEKZZWATJKLUDIAWINFBNYPVTTMZFPKWGDKZXTJCDIGKUHUAUEKCAR"
+crib = Crib("BERLINCLOCK", position=63)
 
 cube = Cube(alphabet="KRYPTOSABCDEFGHIJLMNQUVWXZ?")
 cipher = Trifid(cube)
-for period in xrange(1, 98):
-    # test all periods up to cipher length
-    plaintext = cipher.decrypt(ciphertext, period)
-    if plaintext[63:69] == "BERLIN":
+# test all periods up to cipher length, decrypting only those whose coordinates under the crib match it
+periods = cribs.key_constraint(cipher, ciphertext, crib).filter(xrange(1, 98))
+if periods:
+    candidates = cipher.decrypt_many(ciphertext, periods)
+    for i_period in np.flatnonzero(crib.matches(candidates)):
         print "CORRECT"
-        print plaintext
+        print engine.render(candidates[i_period], ciphertext)
 
 #NYPVTTMZFPK
-#BERLINCLOCK
\ No newline at end of file
+#BERLINCLOCK